@@ -0,0 +1,107 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from models import OccupancyEvent, OccupancyRollup
+
+# strftime formats truncating a timestamp to the start of its bucket
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%dT%H:00:00',
+    'day': '%Y-%m-%dT00:00:00',
+}
+DEFAULT_RANGE = timedelta(days=7)
+OccupancyRow = namedtuple('OccupancyRow', ['time', 'section', 'arrivals', 'departures', 'events'])
+
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 timestamp from a query parameter into a naive UTC datetime.
+
+    Parameters:
+    value (str): The timestamp, e.g. '2024-05-18' or '2024-05-18T03:00:00Z'.
+
+    Returns:
+    datetime: The parsed timestamp.
+
+    Raises:
+    ValueError: If the value is not a valid timestamp.
+    """
+    try:
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if timestamp.tzinfo is not None:
+        timestamp = (timestamp - timestamp.utcoffset()).replace(tzinfo=None)
+    return timestamp
+
+def parse_query_args(args):
+    """
+    Validates the parameters of an analytics query.
+
+    Parameters:
+    args (MultiDict): The request's query parameters.
+
+    Returns:
+    dict: The keyword arguments for query_occupancy: start, end, section and bucket.
+
+    Raises:
+    ValueError: If a parameter is invalid.
+    """
+    end = parse_timestamp(args['to']) if args.get('to') else datetime.utcnow()
+    start = parse_timestamp(args['from']) if args.get('from') else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    bucket = args.get('bucket', 'hour')
+    if bucket not in BUCKET_FORMATS:
+        raise ValueError(f"Invalid bucket {bucket!r}, expected one of: {', '.join(BUCKET_FORMATS)}")
+    return {'start': start, 'end': end, 'section': args.get('section') or None, 'bucket': bucket}
+
+def query_occupancy(session, start, end, section=None, bucket='hour'):
+    """
+    Aggregates occupancy history per time bucket and section in SQL. Recent history comes from the raw
+    events and older history from the hourly rollups maintenance leaves behind; both range filters use
+    indexes, so the cost depends on the size of the range rather than the whole history.
+
+    Parameters:
+    session (Session): A session bound to a lot's database.
+    start (datetime): The start of the range (inclusive).
+    end (datetime): The end of the range (exclusive).
+    section (str, optional): Only include this section.
+    bucket (str): 'hour' or 'day'.
+
+    Returns:
+    list: Rows with time, section, arrivals (changes to 'occupied'), departures (changes to 'available') and events, ordered by time and section.
+    """
+    time_bucket = func.strftime(BUCKET_FORMATS[bucket], OccupancyEvent.recorded_at).label('time')
+    query = session.query(
+        time_bucket,
+        OccupancyEvent.section,
+        func.sum(case((OccupancyEvent.status == 'occupied', 1), else_=0)).label('arrivals'),
+        func.sum(case((OccupancyEvent.status == 'available', 1), else_=0)).label('departures'),
+        func.count().label('events'),
+    ).filter(OccupancyEvent.recorded_at >= start, OccupancyEvent.recorded_at < end)
+    if section:
+        query = query.filter(OccupancyEvent.section == section)
+    rows = query.group_by(time_bucket, OccupancyEvent.section).order_by(time_bucket, OccupancyEvent.section).all()
+
+    # Rollups cover whole hours, so an hour is included when it starts inside the range
+    rollup_bucket = func.strftime(BUCKET_FORMATS[bucket], OccupancyRollup.hour).label('time')
+    rollup_query = session.query(
+        rollup_bucket,
+        OccupancyRollup.section,
+        func.sum(OccupancyRollup.arrivals).label('arrivals'),
+        func.sum(OccupancyRollup.departures).label('departures'),
+        func.sum(OccupancyRollup.events).label('events'),
+    ).filter(OccupancyRollup.hour >= start, OccupancyRollup.hour < end)
+    if section:
+        rollup_query = rollup_query.filter(OccupancyRollup.section == section)
+    rollup_rows = rollup_query.group_by(rollup_bucket, OccupancyRollup.section).all()
+    if not rollup_rows:
+        return rows
+
+    # A bucket can have both rollups and raw events when it spans the retention cutoff
+    merged = {}
+    for row in rows + rollup_rows:
+        totals = merged.setdefault((row.time, row.section), [0, 0, 0])
+        totals[0] += int(row.arrivals or 0)
+        totals[1] += int(row.departures or 0)
+        totals[2] += int(row.events or 0)
+    return [OccupancyRow(time, section, *totals) for (time, section), totals in sorted(merged.items())]
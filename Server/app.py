@@ -1,19 +1,54 @@
 import io
-import time
+import os
 import base64
+import concurrent.futures
+import importlib.util
 import matplotlib
 import pandas as pd
 matplotlib.use('Agg')  # Use the Agg backend for non-interactive environments
 from flask_cors import CORS
-from datetime import datetime
 import matplotlib.pyplot as plt
 from models import db, ParkingSpot
-from flask import Flask, request, jsonify, render_template
+from analytics import parse_query_args, parse_timestamp, query_occupancy
+from shards import LotShards, DEFAULT_LOT, is_valid_lot
+from maintenance import MaintenanceJob
+from ingest import IngestQueue
+from snapshot import SpotSnapshot
+from export import EXPORT_TABLES, ARROW_STREAM_MIMETYPE, stream_arrow
+from flask import Flask, Response, request, jsonify, render_template
 
 app = Flask(__name__)
 CORS(app)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parking.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('PARKING_DATABASE_URI', 'sqlite:///parking.db')
+if os.environ.get('PARKING_LOTS_DIR'):
+    app.config['LOTS_DIRECTORY'] = os.environ['PARKING_LOTS_DIR']
 db.init_app(app)
+shards = LotShards(app)
+maintenance = MaintenanceJob(app, shards)
+ingest = IngestQueue(app, shards)
+snapshot = SpotSnapshot(app, shards)
+ingest.on_prepare(snapshot.prepare)
+ingest.on_commit(snapshot.apply)
+
+SPOT_STATUSES = ('occupied', 'available')  # Statuses a unit may report for a spot
+
+def load_spots(lot=None):
+    """
+    Loads parking spots from one lot or from every lot shard.
+
+    Parameters:
+    lot (str, optional): The lot to load. If None, spots from all lots are returned.
+
+    Returns:
+    list: A list of ParkingSpot instances (empty for a lot without a database).
+    """
+    spots = []
+    for lot_id in ([lot] if lot else shards.lots()):
+        if not shards.exists(lot_id):
+            continue
+        with shards.session(lot_id) as session:
+            spots.extend(session.query(ParkingSpot).all())
+    return spots
 
 @app.route('/')
 def home():
@@ -38,23 +73,59 @@ def analysis_page():
 @app.route('/spots', methods=['GET'])
 def get_spots():
     """
-    Retrieves all parking spots from the database and returns them as JSON.
+    Returns parking spots as JSON from the in-memory snapshot (see snapshot.py).
+    An optional 'lot' query parameter restricts the result to a single lot. Responses carry an ETag;
+    a request whose If-None-Match matches the current version gets 304 Not Modified.
 
     Returns:
-    Response: A JSON response containing a list of parking spots.
+    Response: A JSON response containing a list of parking spots, or an empty 304 response.
     """
-    spots = ParkingSpot.query.all()
-    spot_list = [{
-        'section': spot.section,
-        'spot_number': spot.spot_number,
-        'status': spot.status
-    } for spot in spots]
-    return jsonify(spot_list)
+    lot = request.args.get('lot')
+    if lot is not None and not is_valid_lot(lot):
+        return jsonify({'error': 'Invalid lot identifier'}), 400
+
+    etag, body = snapshot.get(lot)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Browsers revalidate every poll instead of reusing a stale copy
+    return response
+
+def parse_spot_number(value):
+    """
+    Parses a spot number sent by a unit.
+
+    Parameters:
+    value: The 'spot_number' field of an update.
+
+    Returns:
+    int: The spot number, or None if the value is not an integer (e.g. 1.9, 'A' or true).
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
 
 @app.route('/spots', methods=['POST'])
 def update_spots():
     """
-    Updates the status of parking spots based on the received JSON data.
+    Updates the status of parking spots based on the received JSON data. The updates are validated and
+    queued for the lot's writer; depending on INGEST_ACK the response is sent once they are committed
+    (200) or as soon as they are journaled (202).
+
+    Each lot is committed by its own writer, so a request that spans several lots is not atomic: if one
+    lot fails, the others may already be committed. The error response reports the outcome of every lot
+    ('committed', 'pending' or the error) so the unit can tell what to resend.
 
     Returns:
     Response: A JSON response indicating the success or failure of the update operation.
@@ -63,33 +134,41 @@ def update_spots():
     if not isinstance(data, list):
         return jsonify({'error': 'Invalid data format, expected a list of spot updates'}), 400
 
-    retries = 5
+    # Group the updates by lot; each lot's writer coalesces them with other requests and commits them together
+    updates_by_lot = {}
     for spot_data in data:
+        if not isinstance(spot_data, dict):
+            return jsonify({'error': 'Invalid data format, expected a list of spot updates'}), 400
+        lot = spot_data.get('lot') or DEFAULT_LOT
+        camera = spot_data.get('camera') or ''
         section = spot_data.get('section')
         spot_number = spot_data.get('spot_number')
         status = spot_data.get('status')
 
         if not section or not spot_number or not status:
             return jsonify({'error': 'Missing data fields'}), 400
+        if not isinstance(camera, str) or not isinstance(section, str):
+            return jsonify({'error': 'Camera and section must be strings'}), 400
+        if status not in SPOT_STATUSES:
+            return jsonify({'error': f"Invalid status, expected one of: {', '.join(SPOT_STATUSES)}"}), 400
+        spot_number = parse_spot_number(spot_number)
+        if spot_number is None:
+            return jsonify({'error': 'Invalid spot number'}), 400
+        if not is_valid_lot(lot):
+            return jsonify({'error': 'Invalid lot identifier'}), 400
 
-        while retries > 0:
-            try:
-                spot = ParkingSpot.query.filter_by(section=section, spot_number=spot_number).first()
-                if spot:
-                    spot.status = status
-                    spot.updated_at = datetime.utcnow()
-                else:
-                    new_spot = ParkingSpot(section=section, spot_number=spot_number, status=status)
-                    db.session.add(new_spot)
-                db.session.commit()
-                break
-            except Exception as e:
-                db.session.rollback()
-                retries -= 1
-                if "database is locked" in str(e):
-                    time.sleep(0.5)
-                else:
-                    return jsonify({'error': str(e)}), 500
+        updates_by_lot.setdefault(lot, {})[(camera, section, spot_number)] = status
+
+    futures = {lot: ingest.submit(lot, updates) for lot, updates in updates_by_lot.items()}
+    if ingest.ack == 'enqueue':
+        return jsonify({'message': 'Spot updates accepted'}), 202
+    try:
+        ingest.wait(futures.values())
+    except Exception as e:
+        results = {lot: 'pending' if not future.done() else str(future.exception() or 'committed') for lot, future in futures.items()}
+        if isinstance(e, concurrent.futures.TimeoutError):
+            return jsonify({'error': 'Timed out waiting for the database', 'lots': results}), 503
+        return jsonify({'error': str(e), 'lots': results}), 500
 
     return jsonify({'message': 'Spots updated successfully'})
 
@@ -101,8 +180,10 @@ def analyze_data():
     Returns:
     Response: A JSON response containing the analysis results, including base64-encoded charts.
     """
-    spots = ParkingSpot.query.all()
+    spots = load_spots()
     df = pd.DataFrame([{
+        'lot': spot.lot,
+        'camera': spot.camera,
         'section': spot.section,
         'spot_number': spot.spot_number,
         'status': spot.status,
@@ -156,7 +237,7 @@ def analyze_data():
 
     # Histogram for duration of occupancy
     plt.figure(figsize=(10, 5))
-    df['duration'] = (df['updated_at'] - df.groupby('spot_number')['updated_at'].transform('min')).dt.total_seconds() / 60
+    df['duration'] = (df['updated_at'] - df.groupby(['lot', 'camera', 'section', 'spot_number'])['updated_at'].transform('min')).dt.total_seconds() / 60
     df['duration'].plot(kind='hist', bins=20, title='Duration of Occupancy', xlabel='Minutes')
     buf = io.BytesIO()
     plt.savefig(buf, format='png')
@@ -192,5 +273,95 @@ def analyze_data():
 
     return jsonify(analysis_results)
 
+@app.route('/analysis/query', methods=['GET'])
+def query_analysis():
+    """
+    Returns occupancy history aggregated in SQL over a time range, optionally restricted to a lot and section.
+
+    Query parameters:
+    from (str): Start of the range (ISO 8601, UTC). Defaults to seven days before 'to'.
+    to (str): End of the range, exclusive (ISO 8601, UTC). Defaults to now.
+    section (str, optional): Only include this section.
+    lot (str, optional): Only include this lot. Defaults to all lots.
+    bucket (str): 'hour' or 'day'. Defaults to 'hour'.
+
+    Returns:
+    Response: A JSON response with one array per column (time, lot, section, arrivals, departures, events), one entry per bucket and section.
+    """
+    try:
+        query = parse_query_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    lot = request.args.get('lot')
+    if lot is not None and not is_valid_lot(lot):
+        return jsonify({'error': 'Invalid lot identifier'}), 400
+
+    columns = {'time': [], 'lot': [], 'section': [], 'arrivals': [], 'departures': [], 'events': []}
+    for lot_id in ([lot] if lot else shards.lots()):
+        if not shards.exists(lot_id):
+            continue  # Unknown lots have no history; do not create a shard for them
+        with shards.session(lot_id) as session:
+            for row in query_occupancy(session, **query):
+                columns['time'].append(row.time)
+                columns['lot'].append(lot_id)
+                columns['section'].append(row.section)
+                columns['arrivals'].append(int(row.arrivals or 0))
+                columns['departures'].append(int(row.departures or 0))
+                columns['events'].append(int(row.events))
+
+    return jsonify({
+        'from': query['start'].isoformat(),
+        'to': query['end'].isoformat(),
+        'bucket': query['bucket'],
+        'columns': columns
+    })
+
+@app.route('/export/<table>', methods=['GET'])
+def export_table(table):
+    """
+    Streams a table in the Arrow IPC streaming format for offline analysis (e.g. pyarrow.ipc.open_stream
+    or pandas.read_feather-compatible tooling). Rows are read and sent in chunks, so large exports use
+    bounded memory and do not block ingest. For partitioned Parquet files use 'python export.py'.
+
+    Parameters:
+    table (str): 'events' (occupancy history), 'rollups' (hourly history older than the retention window)
+                 or 'spots' (current state).
+
+    Query parameters:
+    from (str, optional): Start of the history to export (ISO 8601, UTC).
+    to (str, optional): End of the history to export, exclusive (ISO 8601, UTC).
+    lot (str, optional): Only export this lot. Defaults to all lots.
+
+    Returns:
+    Response: A streamed Arrow IPC response.
+    """
+    if table not in EXPORT_TABLES:
+        return jsonify({'error': f"Unknown table, expected one of: {', '.join(EXPORT_TABLES)}"}), 404
+    lot = request.args.get('lot')
+    if lot is not None and not is_valid_lot(lot):
+        return jsonify({'error': 'Invalid lot identifier'}), 400
+    try:
+        start = parse_timestamp(request.args['from']) if request.args.get('from') else None
+        end = parse_timestamp(request.args['to']) if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if importlib.util.find_spec('pyarrow') is None:
+        return jsonify({'error': 'Exports require pyarrow to be installed on the server'}), 501
+
+    return Response(stream_arrow(shards, table, [lot] if lot else None, start, end), mimetype=ARROW_STREAM_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename={table}.arrows'})
+
+def start_services():
+    """
+    Starts the background work of the serving process: replays ingest updates that were journaled but not
+    committed, and starts the maintenance job. Only the entry points that serve requests call this (the
+    block below and wsgi.py), so scripts that import the app, such as create_db.py, start no threads.
+    """
+    ingest.recover()
+    maintenance.start()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()  # With the reloader, only in the child process that serves requests
+    app.run(host='0.0.0.0', port=5000, debug=debug)
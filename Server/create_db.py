@@ -1,7 +1,11 @@
 # create_db.py
-from app import app
+from app import app, shards
 from models import db
 
 # Create all database tables within the application context
 with app.app_context():
     db.create_all()
+
+# Create (or upgrade) the primary database and every existing lot shard
+for lot in shards.lots():
+    shards.engine(lot)
@@ -0,0 +1,243 @@
+import os
+import time
+import shutil
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from models import ParkingSpot, OccupancyEvent, OccupancyRollup
+from analytics import parse_timestamp
+
+EXPORT_CHUNK_SIZE = 50000  # Rows fetched per database round trip and written per Arrow record batch
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Exported tables: model, exported columns, the time column used for the date partition and range filters
+# (None for current state, which is not filtered), and the columns the Parquet files are partitioned by.
+# Every exported column that selects the rows of an export (lot and date) is a partition column, so an
+# export only ever replaces partitions it wrote in full.
+EXPORT_TABLES = {
+    'events': (OccupancyEvent, ('lot', 'camera', 'section', 'spot_number', 'status', 'recorded_at'), 'recorded_at', ('lot', 'date', 'section')),
+    'rollups': (OccupancyRollup, ('lot', 'camera', 'section', 'hour', 'arrivals', 'departures', 'events'), 'hour', ('lot', 'date', 'section')),
+    'spots': (ParkingSpot, ('lot', 'camera', 'section', 'spot_number', 'status', 'updated_at'), None, ('lot', 'section')),
+}
+
+def table_schema(table):
+    """
+    Returns the Arrow schema of an exported table.
+
+    Parameters:
+    table (str): The table name, a key of EXPORT_TABLES.
+
+    Returns:
+    pyarrow.Schema: The schema of the table's record batches.
+    """
+    import pyarrow as pa  # Optional dependency, only needed for exports
+
+    types = {'lot': pa.string(), 'camera': pa.string(), 'section': pa.string(), 'spot_number': pa.int32(), 'status': pa.string(),
+             'recorded_at': pa.timestamp('us'), 'updated_at': pa.timestamp('us'), 'hour': pa.timestamp('us'),
+             'arrivals': pa.int32(), 'departures': pa.int32(), 'events': pa.int32()}
+    model, columns, time_column, partitions = EXPORT_TABLES[table]
+    fields = [pa.field(column, types[column]) for column in columns]
+    if time_column is not None:
+        fields.append(pa.field('date', pa.string()))
+    return pa.schema(fields)
+
+def iter_batches(shards, table, lots=None, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Reads a table from the lot shards as Arrow record batches. Rows are fetched in chunks from a
+    server-side cursor, so memory stays bounded by the chunk size. Reads run in their own WAL snapshot
+    without taking the lot's writer lock, so ingest continues while the export runs.
+
+    Parameters:
+    shards (LotShards): The lot shards to read from.
+    table (str): The table name, a key of EXPORT_TABLES.
+    lots (list, optional): The lots to read. Defaults to every lot. Lots without a database are skipped.
+    start (datetime, optional): Only include history from this time (inclusive).
+    end (datetime, optional): Only include history before this time (exclusive).
+    chunk_size (int): The number of rows per batch.
+
+    Yields:
+    pyarrow.RecordBatch: The next chunk of rows.
+    """
+    import pyarrow as pa
+
+    schema = table_schema(table)
+    model, columns, time_column, partitions = EXPORT_TABLES[table]
+    selected = [getattr(model, column) for column in columns]
+    query = select(*selected)
+    if time_column is not None:
+        timestamp = getattr(model, time_column)
+        query = select(*selected, func.date(timestamp).label('date'))
+        if start is not None:
+            query = query.where(timestamp >= start)
+        if end is not None:
+            query = query.where(timestamp < end)
+        query = query.order_by(timestamp)
+    else:
+        query = query.order_by(model.id)
+
+    for lot in (lots if lots is not None else shards.lots()):
+        if not shards.exists(lot):
+            continue
+        with shards.engine(lot).connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+            for rows in result.partitions():
+                yield pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema)
+
+def whole_days(start, end):
+    """
+    Widens a time range to whole days, so that it covers every date partition it touches in full.
+
+    Parameters:
+    start (datetime): The start of the range (inclusive), or None.
+    end (datetime): The end of the range (exclusive), or None.
+
+    Returns:
+    tuple: The start moved back to midnight and the end moved forward to the next midnight.
+    """
+    if start is not None:
+        start = datetime.combine(start.date(), datetime.min.time())
+    if end is not None and end != datetime.combine(end.date(), datetime.min.time()):
+        end = datetime.combine(end.date() + timedelta(days=1), datetime.min.time())
+    return start, end
+
+def export_parquet(shards, output, tables=tuple(EXPORT_TABLES), lots=None, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Writes tables as Parquet datasets, one directory per table, partitioned by lot, date and section in Hive
+    layout (e.g. events/lot=north/date=2024-05-18/section=A/part-0.parquet). Batches are written as they are
+    read, so the export never holds a whole table in memory.
+
+    Re-exporting replaces what an earlier export wrote for the same lots and dates and leaves other lots and
+    dates alone. The range is widened to whole days (see whole_days), since a date partition is replaced as a
+    whole, and the current state of every exported lot is replaced entirely.
+
+    Parameters:
+    shards (LotShards): The lot shards to read from.
+    output (str): The directory to write to.
+    tables (iterable): The tables to export.
+    lots (list, optional): The lots to export. Defaults to every lot.
+    start (datetime, optional): Only include history from this day (inclusive).
+    end (datetime, optional): Only include history before this time, rounded up to the next midnight.
+    chunk_size (int): The number of rows per batch.
+
+    Returns:
+    dict: The number of rows written per table.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    start, end = whole_days(start, end)
+    lots = [lot for lot in (lots if lots is not None else shards.lots()) if shards.exists(lot)]
+    counts = {}
+    for table in tables:
+        if EXPORT_TABLES[table][2] is None:
+            for lot in lots:  # Sections that no longer exist would otherwise keep their old partitions
+                shutil.rmtree(os.path.join(output, table, f'lot={lot}'), ignore_errors=True)
+        schema = table_schema(table)
+        partitions = EXPORT_TABLES[table][3]
+        counts[table] = 0
+
+        def counted(batches, table=table):
+            for batch in batches:
+                counts[table] += batch.num_rows
+                yield batch
+
+        ds.write_dataset(counted(iter_batches(shards, table, lots, start, end, chunk_size)), os.path.join(output, table),
+                         schema=schema, format='parquet',
+                         partitioning=ds.partitioning(pa.schema([schema.field(column) for column in partitions]), flavor='hive'),
+                         basename_template='part-{i}.parquet', existing_data_behavior='delete_matching')
+    return counts
+
+class _Chunks:
+    """
+    A write-only file object that collects what the Arrow stream writer writes, so it can be yielded in pieces.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_arrow(shards, table, lots=None, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Serializes a table in the Arrow IPC streaming format, one record batch per chunk of rows.
+
+    Parameters:
+    See iter_batches.
+
+    Yields:
+    bytes: The next part of the stream.
+    """
+    import pyarrow as pa
+
+    sink = _Chunks()
+    writer = pa.ipc.new_stream(sink, table_schema(table))
+    yield sink.take()
+    for batch in iter_batches(shards, table, lots, start, end, chunk_size):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+def open_shards(database_uri, lots_directory=None):
+    """
+    Opens the lot shards without the web application, so that exporting does not start its ingest writers or
+    maintenance job, and databases are read as they are instead of being upgraded.
+
+    Parameters:
+    database_uri (str): The URI of the primary database, which holds the default lot.
+    lots_directory (str, optional): The directory of the other lots' databases.
+
+    Returns:
+    LotShards: The lot shards.
+    """
+    from flask import Flask
+    from models import db
+    from shards import LotShards
+
+    app = Flask(__name__)  # Same root as app.py, so relative paths resolve to the same instance folder
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    if lots_directory:
+        app.config['LOTS_DIRECTORY'] = lots_directory
+    db.init_app(app)
+    return LotShards(app, upgrade=False)
+
+def main():
+    """
+    Command-line entry point: exports occupancy history and current spot state from the configured
+    databases as partitioned Parquet.
+    """
+    parser = argparse.ArgumentParser(description="Export occupancy history and current spot state as Parquet, partitioned by lot, date and section.")
+    parser.add_argument('output', help="Directory to write one dataset per table to")
+    parser.add_argument('--table', choices=list(EXPORT_TABLES), nargs='+', default=list(EXPORT_TABLES), help="Tables to export (default: all)")
+    parser.add_argument('--lot', nargs='+', help="Lots to export (default: all)")
+    parser.add_argument('--from', dest='start', type=parse_timestamp, help="Start of the history to export, widened to midnight (ISO 8601, UTC)")
+    parser.add_argument('--to', dest='end', type=parse_timestamp, help="End of the history to export, exclusive, widened to the next midnight (ISO 8601, UTC)")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows per batch")
+    parser.add_argument('--database', default=os.environ.get('PARKING_DATABASE_URI', 'sqlite:///parking.db'), help="URI of the primary database (default: PARKING_DATABASE_URI or the server's default)")
+    parser.add_argument('--lots-dir', default=os.environ.get('PARKING_LOTS_DIR'), help="Directory of the lot databases (default: PARKING_LOTS_DIR or the server's default)")
+    args = parser.parse_args()
+
+    shards = open_shards(args.database, args.lots_dir)
+
+    started = time.perf_counter()
+    counts = export_parquet(shards, args.output, args.table, args.lot, args.start, args.end, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+    print(f"Exported to {args.output} in {elapsed:.2f} s")
+
+if __name__ == '__main__':
+    main()
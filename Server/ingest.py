@@ -0,0 +1,401 @@
+import os
+import json
+import time
+import queue
+import threading
+from datetime import datetime
+from concurrent.futures import Future
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from models import ParkingSpot, OccupancyEvent, IngestCheckpoint
+from shards import is_valid_lot
+
+INGEST_ACK = 'commit'  # 'commit' acknowledges updates once written, 'enqueue' once they are journaled
+INGEST_WINDOW = 0.05  # Seconds the writer keeps collecting updates before committing them together
+INGEST_MAX_BATCH = 5000  # Maximum number of queued spot updates per commit
+INGEST_TIMEOUT = 10.0  # Seconds a request waits for its commit in 'commit' mode
+INGEST_RETRY_DELAY = 0.5  # Seconds before journaled updates that failed to commit are retried; doubles per attempt
+INGEST_MAX_RETRY_DELAY = 30.0  # Longest wait between retries of journaled updates
+ACK_MODES = ('commit', 'enqueue')
+KEY_CHUNK_SIZE = 300  # Spots per IN clause, keeping statements under SQLite's bound parameter limit
+
+def chunked(items, size=KEY_CHUNK_SIZE):
+    """
+    Splits items into lists of at most size items.
+    """
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+class IngestJournal:
+    """
+    The write-ahead log of one lot in 'enqueue' mode: every accepted request is appended and fsynced before
+    it is acknowledged, and replayed after a restart unless the lot's IngestCheckpoint shows it was committed.
+    The file is emptied whenever everything appended so far has been committed, so it only ever holds the
+    updates of the last few commit windows.
+
+    Attributes:
+    path (str): The journal file, one JSON entry per line.
+    seq (int): The sequence number of the last appended entry.
+    """
+    def __init__(self, path, committed=0):
+        self.path = path
+        self.seq = committed
+        self._file = None  # Opened on the first append, so lots that never journal get no file
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sync_directory(directory):
+        # Makes the new file's directory entry durable, so the file survives a crash along with its contents
+        if hasattr(os, 'O_DIRECTORY'):
+            descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def _open(self):
+        # Called with self._lock held
+        if self._file is None:
+            created = not os.path.exists(self.path)
+            self._file = open(self.path, 'ab')
+            if created:
+                self._sync_directory(os.path.dirname(self.path))
+
+    def pending(self, committed):
+        """
+        Reads the entries that were appended after the committed one. A torn last line, left by a crash
+        during an append that was therefore never acknowledged, is ignored.
+
+        Parameters:
+        committed (int): The sequence number of the last committed entry.
+
+        Returns:
+        list: (seq, updates) of each pending entry, in order.
+        """
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'rb') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.seq = max(self.seq, entry['seq'])
+                if entry['seq'] > committed:
+                    entries.append((entry['seq'], {(camera, section, spot_number): status for camera, section, spot_number, status in entry['updates']}))
+        return entries
+
+    def append(self, updates, then=None):
+        """
+        Appends updates and waits until they are on disk.
+
+        Parameters:
+        updates (dict): The new status of each spot, keyed by (camera, section, spot_number).
+        then (callable, optional): Called with the entry's sequence number while the journal is still locked,
+                                   so entries reach the writer in sequence order.
+
+        Returns:
+        int: The sequence number of the entry.
+        """
+        with self._lock:
+            self._open()
+            seq = self.seq + 1
+            entry = {'seq': seq, 'updates': [[camera, section, spot_number, status] for (camera, section, spot_number), status in updates.items()]}
+            self._file.write(json.dumps(entry, separators=(',', ':')).encode() + b'\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.seq = seq
+            if then is not None:
+                then(seq)
+        return seq
+
+    def committed(self, seq):
+        """
+        Empties the journal if the entry just committed is the last one appended.
+
+        Parameters:
+        seq (int): The sequence number of the last committed entry.
+        """
+        with self._lock:
+            if seq >= self.seq and (self._file is not None or os.path.exists(self.path)):
+                self._open()
+                self._file.truncate(0)
+                os.fsync(self._file.fileno())
+
+class IngestQueue:
+    """
+    Funnels all spot updates of a lot through a single writer thread. Requests only validate and enqueue
+    their updates; the writer drains the queue, coalesces updates of the same spot down to the latest
+    status, and commits each time window in one transaction, so requests never contend for the SQLite
+    write lock. If a window fails to commit, its requests are committed one by one, so one request that
+    cannot be written does not fail the others.
+
+    In 'enqueue' mode requests are acknowledged before their commit, so each one is first appended to the
+    lot's IngestJournal. Entries a crash left uncommitted are replayed when the lot's writer starts, which
+    recover() does for every lot at startup. A journaled request that fails to commit has already been
+    acknowledged, so it is retried, in order and with a growing delay, until it commits; the checkpoint
+    and the journal therefore never move past an uncommitted entry.
+
+    Configuration (app.config):
+    INGEST_ACK (str): 'commit' or 'enqueue'.
+    INGEST_WINDOW (float): Seconds per commit window.
+    INGEST_MAX_BATCH (int): Maximum number of updates per commit.
+    INGEST_TIMEOUT (float): Seconds to wait for a commit in 'commit' mode.
+    INGEST_RETRY_DELAY (float): Seconds before the first retry of journaled updates that failed to commit.
+    INGEST_MAX_RETRY_DELAY (float): Longest wait between retries.
+    INGEST_JOURNAL_DIRECTORY (str): The directory of the journals (default: 'journal' in the instance folder).
+    """
+    def __init__(self, app=None, shards=None):
+        self.app = None
+        self.shards = None
+        self._queues = {}
+        self._journals = {}
+        self._listeners = []
+        self._preparers = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, shards)
+
+    def init_app(self, app, shards):
+        """
+        Registers the ingest queue with a Flask application.
+
+        Parameters:
+        app (Flask): The application to register with.
+        shards (LotShards): The lot shards updates are written to.
+
+        Raises:
+        ValueError: If INGEST_ACK is not a known acknowledgement mode.
+        """
+        self.app = app
+        self.shards = shards
+        app.config.setdefault('INGEST_ACK', INGEST_ACK)
+        app.config.setdefault('INGEST_WINDOW', INGEST_WINDOW)
+        app.config.setdefault('INGEST_MAX_BATCH', INGEST_MAX_BATCH)
+        app.config.setdefault('INGEST_TIMEOUT', INGEST_TIMEOUT)
+        app.config.setdefault('INGEST_RETRY_DELAY', INGEST_RETRY_DELAY)
+        app.config.setdefault('INGEST_MAX_RETRY_DELAY', INGEST_MAX_RETRY_DELAY)
+        app.config.setdefault('INGEST_JOURNAL_DIRECTORY', os.path.join(app.instance_path, 'journal'))
+        if app.config['INGEST_ACK'] not in ACK_MODES:
+            raise ValueError(f"Invalid INGEST_ACK {app.config['INGEST_ACK']!r}, expected one of: {', '.join(ACK_MODES)}")
+        app.extensions['ingest'] = self
+
+    @property
+    def ack(self):
+        """
+        str: The acknowledgement mode, 'commit' or 'enqueue'.
+        """
+        return self.app.config['INGEST_ACK']
+
+    def on_commit(self, listener):
+        """
+        Registers a function called with (lot, updates) after each successful commit, before the
+        requests it includes are acknowledged. It runs while the lot's writer lock is still held, so
+        no other commit of this process comes between. Errors raised by listeners are logged and ignored.
+
+        Parameters:
+        listener (callable): The function to call.
+        """
+        self._listeners.append(listener)
+
+    def on_prepare(self, listener):
+        """
+        Registers a function called with the lot inside each write transaction, once it holds the
+        database's write lock and just before it commits, so no other connection can commit between
+        the call and the commit. Errors raised by listeners are logged and ignored.
+
+        Parameters:
+        listener (callable): The function to call.
+        """
+        self._preparers.append(listener)
+
+    def submit(self, lot, updates):
+        """
+        Queues spot updates for a lot's writer, starting the writer on first use. In 'enqueue' mode the
+        updates are journaled first, so they are on disk when this returns.
+
+        Parameters:
+        lot (str): The lot identifier.
+        updates (dict): The new status of each spot, keyed by (camera, section, spot_number).
+
+        Returns:
+        Future: Resolves to the number of spots written by the commit that included the updates,
+                or raises the error that made that commit fail.
+        """
+        future = Future()
+        updates = dict(updates)
+        pending = self._queue(lot)
+        if self.ack == 'enqueue':
+            self._journals[lot].append(updates, lambda seq: pending.put((updates, future, seq)))
+        else:
+            pending.put((updates, future, None))
+        return future
+
+    def recover(self):
+        """
+        Replays the journaled updates of every lot that a previous run acknowledged but did not commit.
+        Call once at startup, before serving requests.
+
+        Returns:
+        int: The number of lots whose writer was started.
+        """
+        directory = self.app.config['INGEST_JOURNAL_DIRECTORY']
+        if not os.path.isdir(directory):
+            return 0
+        lots = [name[:-len('.jsonl')] for name in sorted(os.listdir(directory))
+                if name.endswith('.jsonl') and is_valid_lot(name[:-len('.jsonl')]) and os.path.getsize(os.path.join(directory, name)) > 0]
+        for lot in lots:
+            self._queue(lot)
+        return len(lots)
+
+    def wait(self, futures):
+        """
+        Waits for submitted updates to be committed.
+
+        Parameters:
+        futures (list): The futures returned by submit.
+
+        Raises:
+        concurrent.futures.TimeoutError: If a commit takes longer than INGEST_TIMEOUT.
+        Exception: The error of a failed commit.
+        """
+        deadline = time.monotonic() + self.app.config['INGEST_TIMEOUT']
+        for future in futures:
+            future.result(timeout=max(deadline - time.monotonic(), 0))
+
+    def _open_journal(self, lot):
+        # Called with self._lock held, before the lot's writer starts
+        directory = self.app.config['INGEST_JOURNAL_DIRECTORY']
+        os.makedirs(directory, exist_ok=True)
+        with self.shards.engine(lot).connect() as connection:
+            committed = connection.execute(select(IngestCheckpoint.seq).where(IngestCheckpoint.lot == lot)).scalar() or 0
+        journal = self._journals[lot] = IngestJournal(os.path.join(directory, f'{lot}.jsonl'), committed)
+        return [(updates, Future(), seq) for seq, updates in journal.pending(committed)]
+
+    def _queue(self, lot):
+        with self._lock:
+            updates = self._queues.get(lot)
+            if updates is None:
+                self.shards.engine(lot)  # Create the shard here so errors surface in the request
+                replay = self._open_journal(lot)
+                updates = self._queues[lot] = queue.Queue()
+                for item in replay:
+                    updates.put(item)
+                if replay:
+                    print(f"Replaying {len(replay)} journaled requests for lot '{lot}'")
+                threading.Thread(target=self._run, args=(lot, updates), name=f'ingest-{lot}', daemon=True).start()
+        return updates
+
+    def _run(self, lot, updates):
+        while True:
+            batch = [updates.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.app.config['INGEST_WINDOW']
+            while size < self.app.config['INGEST_MAX_BATCH']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(updates.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][0])
+
+            error = self._commit(lot, batch)
+            if error is None:
+                continue
+            print(f"Failed to write {len(batch)} requests for lot '{lot}': {error}")
+            if len(batch) == 1:
+                self._commit_request(lot, batch[0], error)
+            else:
+                for item in batch:  # In order, so later requests still win
+                    self._commit_request(lot, item)
+
+    def _commit(self, lot, batch):
+        # Writes the coalesced updates of queued requests in one transaction and resolves their futures
+        coalesced = {}
+        for spot_updates, _, _ in batch:
+            coalesced.update(spot_updates)  # Later requests win
+        seq = max((seq for _, _, seq in batch if seq is not None), default=None)
+        try:
+            self.write(lot, coalesced, seq)
+        except Exception as e:
+            return e
+        if seq is not None:
+            self._journals[lot].committed(seq)
+        for _, future, _ in batch:
+            future.set_result(len(coalesced))
+        return None
+
+    def _commit_request(self, lot, item, error=None):
+        # Commits one request on its own. A request answered at commit time fails with the error; a journaled
+        # request was already acknowledged, so it is retried until it commits, holding back later entries.
+        delay = self.app.config['INGEST_RETRY_DELAY']
+        while True:
+            if error is None:
+                error = self._commit(lot, [item])
+                if error is None:
+                    return
+                print(f"Failed to write a request for lot '{lot}': {error}")
+            _, future, seq = item
+            if seq is None:
+                future.set_exception(error)
+                return
+            print(f"Retrying journal entry {seq} of lot '{lot}' in {delay:g} s")
+            time.sleep(delay)
+            delay = min(delay * 2, self.app.config['INGEST_MAX_RETRY_DELAY'])
+            error = None
+
+    def write(self, lot, updates, seq=None):
+        """
+        Writes coalesced updates to a lot's database in one transaction: an occupancy event for every spot
+        whose status changed, and an upsert of every updated spot. The prepare and commit listeners are
+        called around the commit, under the lot's writer lock.
+
+        Parameters:
+        lot (str): The lot identifier.
+        updates (dict): The new status of each spot, keyed by (camera, section, spot_number).
+        seq (int, optional): The last journal entry included in the updates, recorded as the lot's checkpoint.
+        """
+        now = datetime.utcnow()
+        with self.shards.writer(lot):
+            self._write(lot, updates, seq, now)
+            for listener in self._listeners:
+                try:
+                    listener(lot, updates)
+                except Exception as e:
+                    print(f"Commit listener failed for lot '{lot}': {e}")
+
+    def _write(self, lot, updates, seq, now):
+        # Called with the lot's writer lock held
+        with self.shards.engine(lot).begin() as connection:
+            key = tuple_(ParkingSpot.camera, ParkingSpot.section, ParkingSpot.spot_number)
+            current = {}
+            for keys in chunked(updates):  # Only the updated spots, not the whole lot
+                current.update(((camera, section, spot_number), status) for camera, section, spot_number, status in connection.execute(
+                    select(ParkingSpot.camera, ParkingSpot.section, ParkingSpot.spot_number, ParkingSpot.status)
+                    .where(ParkingSpot.lot == lot, key.in_(keys))))
+            spots = [{'lot': lot, 'camera': camera, 'section': section, 'spot_number': spot_number, 'status': status, 'updated_at': now}
+                     for (camera, section, spot_number), status in updates.items()]
+            events = [dict(spot, recorded_at=now) for spot in spots
+                      if current.get((spot['camera'], spot['section'], spot['spot_number'])) != spot['status']]  # Only changes are kept in the history
+            if events:
+                connection.execute(insert(OccupancyEvent), [{key: event[key] for key in ('lot', 'camera', 'section', 'spot_number', 'status', 'recorded_at')} for event in events])
+            upsert = insert(ParkingSpot)
+            connection.execute(upsert.on_conflict_do_update(
+                index_elements=['lot', 'camera', 'section', 'spot_number'],
+                set_={'status': upsert.excluded.status, 'updated_at': upsert.excluded.updated_at}), spots)
+            superseded = {(section, spot_number) for camera, section, spot_number in updates if camera}
+            for keys in chunked(superseded):
+                # Rows from before spots were keyed by camera are replaced by the camera that now reports them
+                connection.execute(delete(ParkingSpot).where(ParkingSpot.lot == lot, ParkingSpot.camera == '',
+                                                             tuple_(ParkingSpot.section, ParkingSpot.spot_number).in_(keys)))
+            if seq is not None:
+                upsert = insert(IngestCheckpoint).values(lot=lot, seq=seq)
+                connection.execute(upsert.on_conflict_do_update(index_elements=['lot'], set_={'seq': upsert.excluded.seq}))
+            for listener in self._preparers:
+                try:
+                    listener(lot)
+                except Exception as e:
+                    print(f"Prepare listener failed for lot '{lot}': {e}")
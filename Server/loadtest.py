@@ -0,0 +1,260 @@
+# loadtest.py
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+
+DEFAULT_UNITS = 10  # Simulated units posting occupancy updates
+DEFAULT_SPOTS = 40  # Spots observed by each unit
+DEFAULT_SECTION_SIZE = 10  # Spots per section
+DEFAULT_UNIT_INTERVAL = 0.5  # Seconds between posts of a unit; camera_thread processes a frame about every 0.5 s
+DEFAULT_CHURN = 0.05  # Probability that a spot changes status between two posts
+DEFAULT_BROWSERS = 5  # Simulated dashboards polling /spots
+DEFAULT_ANALYSIS_BROWSERS = 1  # Simulated analysis pages polling /analysis
+DEFAULT_POLL_INTERVAL = 5.0  # Seconds between polls; index.js and analysis.js poll every 5 s
+DEFAULT_DURATION = 30.0  # Seconds the load is applied
+DEFAULT_LOTS = 1  # Lots the units are spread over
+
+def percentile(values, fraction):
+    """
+    Computes a percentile of some values using the nearest-rank method.
+
+    Parameters:
+    values (list): The values, sorted in ascending order.
+    fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+    float: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+def database_size(directory):
+    """
+    Computes the size of every SQLite file (including WAL and shared-memory files) under a directory.
+
+    Parameters:
+    directory (str): The directory holding the databases.
+
+    Returns:
+    int: The total size in bytes.
+    """
+    total = 0
+    for root, _, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if '.db' in name)
+    return total
+
+class Recorder:
+    """
+    Collects the outcome of every request made during a load test, grouped by endpoint.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # Endpoint -> list of (latency in seconds, status code or None, error message or None)
+
+    def record(self, endpoint, latency, status, error=None):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency, status, error))
+
+    def summary(self, duration):
+        """
+        Summarizes the recorded requests.
+
+        Parameters:
+        duration (float): The length of the measurement in seconds.
+
+        Returns:
+        dict: Per endpoint: requests, throughput, latency percentiles in milliseconds, and error and lock rates.
+        """
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(latency * 1000 for latency, _, _ in samples)
+            errors = [sample for sample in samples if sample[1] is None or sample[1] >= 400]
+            # The server reports SQLite lock contention as 'database is locked' errors or commit timeouts (503)
+            locks = [sample for sample in errors if sample[1] == 503 or 'locked' in (sample[2] or '')]
+            report[endpoint] = {
+                'requests': len(samples),
+                'throughput_rps': round(len(samples) / duration, 2),
+                'latency_ms': {name: round(percentile(latencies, fraction), 2) for name, fraction in
+                               (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+                'errors': len(errors),
+                'error_rate': round(len(errors) / len(samples), 4),
+                'lock_errors': len(locks),
+                'lock_rate': round(len(locks) / len(samples), 4),
+            }
+        return report
+
+def timed_request(session, recorder, endpoint, method, url, **kwargs):
+    """
+    Makes one request and records its latency and outcome.
+    """
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=30, **kwargs)
+    except Exception as e:
+        recorder.record(endpoint, time.perf_counter() - start, None, str(e))
+        return
+    latency = time.perf_counter() - start
+    recorder.record(endpoint, latency, response.status_code, response.text if response.status_code >= 400 else None)
+
+def run_at_rate(interval, stop, action, offset=0.0):
+    """
+    Calls an action every interval seconds until stopped. A late call is made immediately rather than
+    skipped, so a slow server shows up as latency instead of as reduced load.
+    """
+    deadline = time.monotonic() + offset
+    while not stop.wait(max(0.0, deadline - time.monotonic())):
+        action()
+        deadline += interval
+
+def simulate_unit(base_url, recorder, stop, unit, args):
+    """
+    Posts send_parking_info-shaped payloads for one unit, flipping spots at the configured churn.
+    """
+    import requests
+
+    rng = random.Random(unit)
+    session = requests.Session()
+    lot = 'default' if unit % args.lots == 0 else f'lot_{unit % args.lots}'
+    occupied = [rng.random() < 0.5 for _ in range(args.spots)]
+
+    def post():
+        for index in range(args.spots):
+            if rng.random() < args.churn:
+                occupied[index] = not occupied[index]
+        updates = [{
+            'lot': lot,
+            'camera': f"camera_{unit}",
+            'section': f"section_{chr(ord('A') + index // args.section_size)}",
+            'spot_number': index % args.section_size + 1,
+            'status': 'occupied' if occupied[index] else 'available'
+        } for index in range(args.spots)]
+        timed_request(session, recorder, 'POST /spots', 'POST', f'{base_url}/spots', json=updates)
+
+    run_at_rate(args.unit_interval, stop, post, offset=rng.uniform(0, args.unit_interval))
+
+def simulate_browser(base_url, recorder, stop, path, seed, args):
+    """
+    Polls a page's data endpoint the way index.js and analysis.js do.
+    """
+    import requests
+
+    session = requests.Session()
+    offset = random.Random(seed).uniform(0, args.poll_interval)
+    run_at_rate(args.poll_interval, stop, lambda: timed_request(session, recorder, f'GET {path}', 'GET', base_url + path), offset=offset)
+
+def git_commit():
+    """
+    Returns the commit being tested, so reports from different commits can be compared.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_load_test(args):
+    """
+    Starts the server against a temporary database, applies the configured load and measures it.
+
+    Parameters:
+    args (Namespace): The parsed command line arguments.
+
+    Returns:
+    dict: The report: configuration, per-endpoint statistics and database growth.
+    """
+    directory = tempfile.mkdtemp(prefix='parking-loadtest-')
+    os.environ['PARKING_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'parking.db')
+    os.environ['PARKING_LOTS_DIR'] = os.path.join(directory, 'lots')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        from werkzeug.serving import make_server
+        from app import app, shards
+        from models import db, ParkingSpot, OccupancyEvent
+
+        app.config['INGEST_ACK'] = args.ack
+        app.config['INGEST_JOURNAL_DIRECTORY'] = os.path.join(directory, 'journal')  # Never touch the server's own journal
+        with app.app_context():
+            db.create_all()
+        for lot in ['default'] + [f'lot_{index}' for index in range(1, args.lots)]:
+            shards.engine(lot)
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Keep per-request logs out of the report
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        start_size = database_size(directory)
+
+        recorder = Recorder()
+        stop = threading.Event()
+        workers = [threading.Thread(target=simulate_unit, args=(base_url, recorder, stop, unit, args), daemon=True) for unit in range(args.units)]
+        workers += [threading.Thread(target=simulate_browser, args=(base_url, recorder, stop, '/spots', index, args), daemon=True) for index in range(args.browsers)]
+        workers += [threading.Thread(target=simulate_browser, args=(base_url, recorder, stop, '/analysis', -1 - index, args), daemon=True) for index in range(args.analysis_browsers)]
+        print(f"Load testing {base_url} with {args.units} units, {args.browsers} dashboards and {args.analysis_browsers} analysis pages for {args.duration:g} s")
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        time.sleep(args.duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        duration = time.monotonic() - started
+        server.shutdown()
+
+        spots = events = 0
+        for lot in shards.lots():
+            with shards.session(lot) as session:
+                spots += session.query(ParkingSpot).count()
+                events += session.query(OccupancyEvent).count()
+        end_size = database_size(directory)
+        return {
+            'commit': git_commit(),
+            'config': {name: value for name, value in vars(args).items() if name != 'output'},
+            'duration_s': round(duration, 2),
+            'endpoints': recorder.summary(duration),
+            'database': {
+                'start_bytes': start_size,
+                'end_bytes': end_size,
+                'growth_bytes': end_size - start_size,
+                'growth_bytes_per_s': round((end_size - start_size) / duration, 1),
+                'spots': spots,
+                'events': events,
+            },
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate units and dashboards against the server and report throughput, latency, errors and database growth as JSON.")
+    parser.add_argument('--units', type=int, default=DEFAULT_UNITS, help="Number of simulated units")
+    parser.add_argument('--spots', type=int, default=DEFAULT_SPOTS, help="Spots per unit")
+    parser.add_argument('--section-size', type=int, default=DEFAULT_SECTION_SIZE, help="Spots per section")
+    parser.add_argument('--unit-interval', type=float, default=DEFAULT_UNIT_INTERVAL, help="Seconds between posts of each unit")
+    parser.add_argument('--churn', type=float, default=DEFAULT_CHURN, help="Probability that a spot changes status between posts")
+    parser.add_argument('--browsers', type=int, default=DEFAULT_BROWSERS, help="Number of dashboards polling /spots")
+    parser.add_argument('--analysis-browsers', type=int, default=DEFAULT_ANALYSIS_BROWSERS, help="Number of analysis pages polling /analysis")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between polls of each browser")
+    parser.add_argument('--lots', type=int, default=DEFAULT_LOTS, help="Number of lots the units are spread over")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds to apply the load")
+    parser.add_argument('--ack', choices=['commit', 'enqueue'], default='commit', help="Ingest acknowledgement mode")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run_load_test(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report + '\n')
+        print(f"Report written to {args.output}")
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
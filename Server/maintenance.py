@@ -0,0 +1,185 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, case, text
+from sqlalchemy.dialects.sqlite import insert
+from models import OccupancyEvent, OccupancyRollup
+
+EVENT_RETENTION_DAYS = 30  # Raw occupancy events younger than this are kept; older ones are rolled up per hour
+MAINTENANCE_INTERVAL = 3600  # Seconds between maintenance runs; 0 disables the background job
+MAINTENANCE_BATCH_SIZE = 1000  # Events rolled up and deleted per transaction, bounding how long ingest waits
+VACUUM_PAGES = 1000  # Free pages returned to the filesystem per batch by incremental vacuum
+
+# Same text format SQLAlchemy uses for DateTime columns on SQLite, so rollup hours compare with bound datetimes
+ROLLUP_HOUR_FORMAT = '%Y-%m-%d %H:00:00.000000'
+
+def retention_cutoff(retention_days, now=None):
+    """
+    Computes the time before which raw events are rolled up, aligned to the start of an hour
+    so no hour is ever split between raw events and its rollup.
+
+    Parameters:
+    retention_days (float): The number of days of raw events to keep.
+    now (datetime, optional): The current UTC time. Defaults to now.
+
+    Returns:
+    datetime: The cutoff.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    return cutoff.replace(minute=0, second=0, microsecond=0)
+
+def compact_batch(connection, cutoff, batch_size=MAINTENANCE_BATCH_SIZE):
+    """
+    Folds the oldest events recorded before the cutoff into their hourly rollups and deletes them, in the
+    caller's transaction. Adding to the rollups and deleting the same rows together keeps the history
+    consistent if maintenance is interrupted.
+
+    Parameters:
+    connection (Connection): A connection with an open transaction on a lot's database.
+    cutoff (datetime): Events recorded before this time are compacted.
+    batch_size (int): The maximum number of events to compact.
+
+    Returns:
+    int: The number of events compacted.
+    """
+    ids = connection.execute(select(OccupancyEvent.id).where(OccupancyEvent.recorded_at < cutoff)
+                             .order_by(OccupancyEvent.recorded_at).limit(batch_size)).scalars().all()
+    if not ids:
+        return 0
+
+    hour = func.strftime(ROLLUP_HOUR_FORMAT, OccupancyEvent.recorded_at)
+    totals = select(
+        OccupancyEvent.lot,
+        OccupancyEvent.camera,
+        OccupancyEvent.section,
+        hour,
+        func.sum(case((OccupancyEvent.status == 'occupied', 1), else_=0)),
+        func.sum(case((OccupancyEvent.status == 'available', 1), else_=0)),
+        func.count(),
+    ).where(OccupancyEvent.id.in_(ids)).group_by(OccupancyEvent.lot, OccupancyEvent.camera, OccupancyEvent.section, hour)
+    upsert = insert(OccupancyRollup).from_select(['lot', 'camera', 'section', 'hour', 'arrivals', 'departures', 'events'], totals)
+    connection.execute(upsert.on_conflict_do_update(
+        index_elements=['lot', 'camera', 'section', 'hour'],
+        set_={
+            'arrivals': OccupancyRollup.arrivals + upsert.excluded.arrivals,
+            'departures': OccupancyRollup.departures + upsert.excluded.departures,
+            'events': OccupancyRollup.events + upsert.excluded.events,
+        }))
+    connection.execute(delete(OccupancyEvent).where(OccupancyEvent.id.in_(ids)))
+    return len(ids)
+
+def compact_lot(shards, lot, cutoff, batch_size=MAINTENANCE_BATCH_SIZE, vacuum_pages=VACUUM_PAGES):
+    """
+    Compacts all events of a lot recorded before the cutoff. Each batch holds the lot's writer lock only
+    for its own short transaction, so ingest interleaves with maintenance instead of waiting for all of it.
+
+    Parameters:
+    shards (LotShards): The lot shards.
+    lot (str): The lot identifier.
+    cutoff (datetime): Events recorded before this time are compacted.
+    batch_size (int): The number of events per transaction.
+    vacuum_pages (int): The number of free pages to release after each batch.
+
+    Returns:
+    int: The number of events compacted.
+    """
+    engine = shards.engine(lot)
+    compacted = 0
+    while True:
+        with shards.writer(lot):
+            with engine.begin() as connection:
+                count = compact_batch(connection, cutoff, batch_size)
+            if count and vacuum_pages:
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text(f'PRAGMA incremental_vacuum({int(vacuum_pages)})'))
+        compacted += count
+        if count < batch_size:
+            return compacted
+
+def run_maintenance(shards, retention_days=EVENT_RETENTION_DAYS, batch_size=MAINTENANCE_BATCH_SIZE, vacuum_pages=VACUUM_PAGES):
+    """
+    Runs one maintenance pass over every lot shard.
+
+    Parameters:
+    shards (LotShards): The lot shards.
+    retention_days (float): The number of days of raw events to keep.
+    batch_size (int): The number of events per transaction.
+    vacuum_pages (int): The number of free pages to release after each batch.
+
+    Returns:
+    dict: The number of events compacted per lot.
+    """
+    cutoff = retention_cutoff(retention_days)
+    return {lot: compact_lot(shards, lot, cutoff, batch_size, vacuum_pages) for lot in shards.lots()}
+
+class MaintenanceJob:
+    """
+    Background thread that periodically rolls up occupancy events older than the retention window,
+    deletes them and returns the freed space to the filesystem. Registering the job does not start it;
+    the server's entry points call start() (see app.start_services), so scripts importing the app do not
+    run maintenance.
+
+    Configuration (app.config):
+    EVENT_RETENTION_DAYS (float): Days of raw events to keep.
+    MAINTENANCE_INTERVAL (float): Seconds between runs; 0 disables the job.
+    MAINTENANCE_BATCH_SIZE (int): Events per transaction.
+    VACUUM_PAGES (int): Free pages released per batch.
+    """
+    def __init__(self, app=None, shards=None):
+        self.app = None
+        self.shards = None
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app, shards)
+
+    def init_app(self, app, shards):
+        """
+        Registers the job with a Flask application.
+
+        Parameters:
+        app (Flask): The application to register with.
+        shards (LotShards): The lot shards to maintain.
+        """
+        self.app = app
+        self.shards = shards
+        app.config.setdefault('EVENT_RETENTION_DAYS', EVENT_RETENTION_DAYS)
+        app.config.setdefault('MAINTENANCE_INTERVAL', MAINTENANCE_INTERVAL)
+        app.config.setdefault('MAINTENANCE_BATCH_SIZE', MAINTENANCE_BATCH_SIZE)
+        app.config.setdefault('VACUUM_PAGES', VACUUM_PAGES)
+        app.extensions['maintenance'] = self
+
+    def run_once(self):
+        """
+        Runs one maintenance pass with the application's configuration.
+
+        Returns:
+        dict: The number of events compacted per lot.
+        """
+        config = self.app.config
+        return run_maintenance(self.shards, config['EVENT_RETENTION_DAYS'], config['MAINTENANCE_BATCH_SIZE'], config['VACUUM_PAGES'])
+
+    def start(self):
+        """
+        Starts the background thread if it is not already running and not disabled by MAINTENANCE_INTERVAL.
+        """
+        if not self.app.config['MAINTENANCE_INTERVAL']:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread after its current batch.
+        """
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.app.config['MAINTENANCE_INTERVAL']):
+            try:
+                compacted = self.run_once()
+                if any(compacted.values()):
+                    print(f"Maintenance compacted occupancy events: {compacted}")
+            except Exception as e:
+                print(f"Maintenance failed: {e}")
@@ -7,15 +7,93 @@ class ParkingSpot(db.Model):
     """
     ParkingSpot model represents a parking spot within a section.
 
+    A spot is identified by the lot and camera reporting it together with its section and number,
+    so several cameras (or several lots) can report a section with the same name without overwriting each other.
+
     Attributes:
     id (int): The unique identifier for the parking spot.
+    lot (str): The parking lot the spot belongs to; each lot is stored in its own database shard.
+    camera (str): The camera that observes the spot (e.g., 'camera_1').
     section (str): The section to which the parking spot belongs.
     spot_number (int): The number assigned to the parking spot within its section.
     status (str): The current status of the parking spot (e.g., 'occupied', 'available').
     updated_at (datetime): The timestamp of the last update to the parking spot's status.
     """
+    __table_args__ = (
+        db.Index('ix_parking_spot_key', 'lot', 'camera', 'section', 'spot_number', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    lot = db.Column(db.String(50), nullable=False, default='default', server_default='default')
+    camera = db.Column(db.String(50), nullable=False, default='', server_default='')
     section = db.Column(db.String(50), nullable=False)
     spot_number = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(50), nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OccupancyEvent(db.Model):
+    """
+    OccupancyEvent records a change in the status of a parking spot; together the events form the occupancy history.
+
+    Attributes:
+    id (int): The unique identifier for the event.
+    lot (str): The parking lot of the spot.
+    camera (str): The camera that observes the spot.
+    section (str): The section of the spot.
+    spot_number (int): The number of the spot within its section.
+    status (str): The new status of the spot (e.g., 'occupied', 'available').
+    recorded_at (datetime): The time the change was received.
+    """
+    __table_args__ = (
+        db.Index('ix_occupancy_event_recorded_at', 'recorded_at'),
+        db.Index('ix_occupancy_event_section_recorded_at', 'section', 'recorded_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lot = db.Column(db.String(50), nullable=False, default='default')
+    camera = db.Column(db.String(50), nullable=False, default='')
+    section = db.Column(db.String(50), nullable=False)
+    spot_number = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class OccupancyRollup(db.Model):
+    """
+    OccupancyRollup summarizes the occupancy events of one camera's section over one hour. Events older than
+    the retention window are folded into rollups and deleted, so the history stays compact.
+
+    Attributes:
+    id (int): The unique identifier for the rollup.
+    lot (str): The parking lot of the section.
+    camera (str): The camera that observes the section.
+    section (str): The section the events belong to.
+    hour (datetime): The start of the hour.
+    arrivals (int): The number of changes to 'occupied' during the hour.
+    departures (int): The number of changes to 'available' during the hour.
+    events (int): The total number of status changes during the hour.
+    """
+    __table_args__ = (
+        db.Index('ix_occupancy_rollup_camera_key', 'lot', 'camera', 'section', 'hour', unique=True),
+        db.Index('ix_occupancy_rollup_hour', 'hour'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lot = db.Column(db.String(50), nullable=False, default='default')
+    camera = db.Column(db.String(50), nullable=False, default='', server_default='')
+    section = db.Column(db.String(50), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)
+    arrivals = db.Column(db.Integer, nullable=False, default=0)
+    departures = db.Column(db.Integer, nullable=False, default=0)
+    events = db.Column(db.Integer, nullable=False, default=0)
+
+class IngestCheckpoint(db.Model):
+    """
+    IngestCheckpoint records how far a lot's ingest journal has been committed. It is written in the same
+    transaction as the updates, so journal entries up to the checkpoint are never applied twice.
+
+    Attributes:
+    lot (str): The parking lot.
+    seq (int): The sequence number of the last committed journal entry.
+    """
+    lot = db.Column(db.String(50), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
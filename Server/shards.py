@@ -0,0 +1,193 @@
+import os
+import re
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+from models import db, ParkingSpot, OccupancyRollup
+
+DEFAULT_LOT = 'default'  # Lot used by units that do not report one; stored in the primary database
+LOT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,50}$')
+
+def is_valid_lot(lot):
+    """
+    Checks whether a lot identifier is safe to use as a shard name.
+
+    Parameters:
+    lot (str): The lot identifier to check.
+
+    Returns:
+    bool: True if the identifier only contains letters, digits, '_' or '-', False otherwise.
+    """
+    return isinstance(lot, str) and LOT_ID_PATTERN.match(lot) is not None
+
+def configure_sqlite(dbapi_connection, connection_record):
+    """
+    Configures every new SQLite connection for concurrent readers and a single writer.
+
+    Parameters:
+    dbapi_connection: The raw DB-API connection.
+    connection_record: The SQLAlchemy connection record (unused).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+def upgrade_schema(engine):
+    """
+    Creates missing tables, adds the lot/camera columns to databases created before spots and rollups were
+    namespaced, and switches the database to incremental auto-vacuum so space freed by maintenance can be reclaimed.
+
+    Parameters:
+    engine (Engine): The engine of the database to upgrade.
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+            connection.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+            connection.exec_driver_sql('VACUUM')  # Required once for the mode to apply to an existing database
+    db.metadata.create_all(engine)
+    columns = {column['name'] for column in inspect(engine).get_columns(ParkingSpot.__tablename__)}
+    with engine.begin() as connection:
+        if 'lot' not in columns:
+            connection.execute(text(f"ALTER TABLE {ParkingSpot.__tablename__} ADD COLUMN lot VARCHAR(50) NOT NULL DEFAULT '{DEFAULT_LOT}'"))
+        if 'camera' not in columns:
+            connection.execute(text(f"ALTER TABLE {ParkingSpot.__tablename__} ADD COLUMN camera VARCHAR(50) NOT NULL DEFAULT ''"))
+    rollup_columns = {column['name'] for column in inspect(engine).get_columns(OccupancyRollup.__tablename__)}
+    with engine.begin() as connection:
+        if 'camera' not in rollup_columns:
+            # Rollups made before then cover all cameras of their section and are kept under camera ''
+            connection.execute(text(f"ALTER TABLE {OccupancyRollup.__tablename__} ADD COLUMN camera VARCHAR(50) NOT NULL DEFAULT ''"))
+        connection.execute(text("DROP INDEX IF EXISTS ix_occupancy_rollup_key"))  # Unique per section, superseded by the camera key
+    for index in list(ParkingSpot.__table__.indexes) + list(OccupancyRollup.__table__.indexes):
+        index.create(engine, checkfirst=True)
+
+class LotShards:
+    """
+    Partitions parking data by lot: every lot is stored in its own SQLite file and has its own writer lock,
+    so ingest for one lot never waits on the database lock of another. The default lot lives in the
+    application's primary database; other lots are created on demand under LOTS_DIRECTORY.
+
+    Attributes:
+    app (Flask): The application the shards belong to.
+    directory (str): The directory holding one '<lot>.db' file per lot.
+    upgrade (bool): Whether databases are upgraded (see upgrade_schema) when first opened. Tools that only
+                    read, such as the export command, leave them as the server left them.
+    """
+    def __init__(self, app=None, upgrade=True):
+        self.app = None
+        self.directory = None
+        self.upgrade = upgrade
+        self._engines = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the shards with a Flask application.
+
+        Parameters:
+        app (Flask): The application to register with.
+        """
+        self.app = app
+        self.directory = app.config.setdefault('LOTS_DIRECTORY', os.path.join(app.instance_path, 'lots'))
+        app.extensions['lot_shards'] = self
+
+    def engine(self, lot=DEFAULT_LOT):
+        """
+        Returns the engine of a lot's database, creating and upgrading the database on first use.
+
+        Parameters:
+        lot (str): The lot identifier.
+
+        Returns:
+        Engine: The SQLAlchemy engine for the lot.
+
+        Raises:
+        ValueError: If the lot identifier is invalid.
+        """
+        engine = self._engines.get(lot)
+        if engine is not None:
+            return engine
+        if not is_valid_lot(lot):
+            raise ValueError(f"Invalid lot identifier: {lot!r}")
+        with self._lock:
+            engine = self._engines.get(lot)
+            if engine is None:
+                if lot == DEFAULT_LOT:
+                    with self.app.app_context():
+                        engine = db.engine
+                else:
+                    os.makedirs(self.directory, exist_ok=True)
+                    engine = create_engine('sqlite:///' + os.path.join(self.directory, f'{lot}.db'))
+                event.listen(engine, 'connect', configure_sqlite)
+                engine.dispose()  # Reconnect so existing pooled connections pick up the pragmas
+                if self.upgrade:
+                    upgrade_schema(engine)
+                self._engines[lot] = engine
+                self._writers[lot] = threading.Lock()
+        return engine
+
+    def writer(self, lot=DEFAULT_LOT):
+        """
+        Returns the lock that serializes writes to a lot's database.
+
+        Parameters:
+        lot (str): The lot identifier.
+
+        Returns:
+        threading.Lock: The writer lock for the lot.
+        """
+        self.engine(lot)
+        return self._writers[lot]
+
+    @contextmanager
+    def session(self, lot=DEFAULT_LOT):
+        """
+        Opens a session bound to a lot's database.
+
+        Parameters:
+        lot (str): The lot identifier.
+
+        Yields:
+        Session: A SQLAlchemy session that is closed when the block exits.
+        """
+        session = Session(bind=self.engine(lot))
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def exists(self, lot):
+        """
+        Checks whether a lot has a database, without creating one. Read paths use this so that
+        looking up an unknown lot does not create its shard; only ingest creates shards.
+
+        Parameters:
+        lot (str): The lot identifier.
+
+        Returns:
+        bool: True if the lot's database exists.
+        """
+        if lot in self._engines:
+            return True
+        if lot == DEFAULT_LOT:
+            with self.app.app_context():
+                path = db.engine.url.database  # Creating the engine does not create the file
+            return not path or path == ':memory:' or os.path.isfile(path)
+        return is_valid_lot(lot) and os.path.isfile(os.path.join(self.directory, f'{lot}.db'))
+
+    def lots(self):
+        """
+        Lists the lots that currently have a database.
+
+        Returns:
+        list: The default lot followed by every lot found in the shard directory, sorted by name.
+        """
+        found = set(self._engines)
+        if os.path.isdir(self.directory):
+            found.update(name[:-3] for name in os.listdir(self.directory) if name.endswith('.db') and is_valid_lot(name[:-3]))
+        found.discard(DEFAULT_LOT)
+        return [DEFAULT_LOT] + sorted(found)
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from models import ParkingSpot
+
+SPOTS_QUERY = f"SELECT camera, section, spot_number, status FROM {ParkingSpot.__tablename__} WHERE lot = ? ORDER BY id"
+LOTS_REFRESH_INTERVAL = 5.0  # Seconds between listings of the lot shards for lots created by other processes
+
+class LotSnapshot:
+    """
+    The current spot states of one lot.
+
+    Attributes:
+    spots (dict): The status of each spot, keyed by (camera, section, spot_number), in database order.
+    version (int): Incremented whenever a status changes.
+    body (bytes): The serialized spots without the enclosing brackets, or None until serialized.
+    connection (sqlite3.Connection): The connection the lot is read and revalidated with, or None.
+    data_version (int): The lot database's PRAGMA data_version as of the spots held, or None to reread them.
+    """
+    __slots__ = ('spots', 'version', 'body', 'connection', 'data_version')
+
+    def __init__(self, connection):
+        self.spots = {}
+        self.version = 0
+        self.body = None
+        self.connection = connection
+        self.data_version = None
+
+class SpotSnapshot:
+    """
+    Keeps the current state of every spot in memory for GET /spots. A lot is loaded from its database
+    on first use and afterwards kept up to date by the ingest writer after each commit, so polls do not
+    query the spots. Responses are serialized once per version and carry a version-based ETag, so a
+    poll with a matching If-None-Match costs only a lookup.
+
+    Writes from other processes (e.g. a second server worker or a script) are picked up as well: each
+    poll checks the lot's PRAGMA data_version, which SQLite changes whenever another connection commits,
+    and reloads the lot when it changed. The ingest writer's own commits change it too, so the snapshot
+    records the new data version as part of each of those commits (see prepare and apply); only writes
+    from elsewhere make a poll reread the lot. The version only moves if the spots actually differ.
+    Lots without a database are reported as empty and are not loaded.
+
+    Polls of all lots list the shards at most every LOTS_REFRESH_INTERVAL seconds; lots this process
+    creates are seen at once.
+    """
+    def __init__(self, app=None, shards=None):
+        self.app = None
+        self.shards = None
+        self._lots = {}
+        self._version = 0
+        self._body = None  # Serialized spots of all lots at _version
+        self._lot_ids = None  # The lots with a database, or None to list them again
+        self._listed_at = 0.0
+        self._lock = threading.Lock()
+        self._instance = os.urandom(4).hex()  # Keeps ETags from a previous run from matching
+        if app is not None:
+            self.init_app(app, shards)
+
+    def init_app(self, app, shards):
+        """
+        Registers the snapshot with a Flask application.
+
+        Parameters:
+        app (Flask): The application to register with.
+        shards (LotShards): The lot shards the spots are stored in.
+        """
+        self.app = app
+        self.shards = shards
+        app.extensions['spot_snapshot'] = self
+
+    def _connect(self, lot):
+        path = self.shards.engine(lot).url.database
+        if not path or path == ':memory:':
+            return None  # Nothing to revalidate against; only the ingest writer's updates are seen
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)  # Only used under self._lock
+        connection.execute('PRAGMA busy_timeout=5000')
+        return connection
+
+    @staticmethod
+    def _data_version(snapshot):
+        return snapshot.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def _stale(self, snapshot):
+        # Called with self._lock held
+        return snapshot is None or (snapshot.connection is not None and self._data_version(snapshot) != snapshot.data_version)
+
+    def _read(self, lot, snapshot):
+        # Called with the lot's writer lock and self._lock held. Reads the spots and the data version in one
+        # read transaction, so the version matches what was read and no commit of this process comes between.
+        if snapshot.connection is None:
+            with self.shards.engine(lot).connect() as connection:
+                rows = connection.exec_driver_sql(SPOTS_QUERY, (lot,)).fetchall()
+        else:
+            connection = snapshot.connection
+            connection.execute('BEGIN')
+            try:
+                rows = connection.execute(SPOTS_QUERY, (lot,)).fetchall()
+                snapshot.data_version = self._data_version(snapshot)
+            finally:
+                connection.execute('COMMIT')
+        return {(camera, section, spot_number): status for camera, section, spot_number, status in rows}
+
+    def _load(self, lot):
+        # An unchanged lot only costs a PRAGMA under self._lock. Reading takes the writer lock first, the
+        # order in which prepare() and apply() take the two locks.
+        with self._lock:
+            snapshot = self._lots.get(lot)
+            if not self._stale(snapshot):
+                return snapshot
+        with self.shards.writer(lot), self._lock:
+            snapshot = self._lots.get(lot)
+            if snapshot is None:
+                snapshot = LotSnapshot(self._connect(lot))
+                snapshot.spots = self._read(lot, snapshot)
+                self._lots[lot] = snapshot
+                self._version += 1
+            elif self._stale(snapshot):
+                spots = self._read(lot, snapshot)
+                if spots != snapshot.spots:
+                    snapshot.spots = spots
+                    snapshot.version += 1
+                    snapshot.body = None
+                    self._version += 1
+            return snapshot
+
+    def _lots_with_database(self):
+        with self._lock:
+            if self._lot_ids is None or time.monotonic() - self._listed_at >= LOTS_REFRESH_INTERVAL:
+                self._lot_ids = self.shards.lots()
+                self._listed_at = time.monotonic()
+            return self._lot_ids
+
+    def prepare(self, lot):
+        """
+        Checks, just before the ingest writer commits, whether another process has written to the lot
+        since it was read; if so the lot is reread on the next poll. Registered with the ingest queue as a
+        prepare listener, which runs while the writer holds the database's write lock.
+
+        Parameters:
+        lot (str): The lot identifier.
+        """
+        with self._lock:
+            snapshot = self._lots.get(lot)
+            if snapshot is not None and self._stale(snapshot):
+                snapshot.data_version = None
+
+    def apply(self, lot, updates):
+        """
+        Applies committed spot updates and records the data version they leave behind, so the commit does
+        not make the next poll reread the lot. Registered with the ingest queue as a commit listener, which
+        runs under the lot's writer lock.
+
+        Parameters:
+        lot (str): The lot identifier.
+        updates (dict): The new status of each spot, keyed by (camera, section, spot_number).
+        """
+        with self._lock:
+            snapshot = self._lots.get(lot)
+            if snapshot is None:
+                if self._lot_ids is not None and lot not in self._lot_ids:
+                    self._lot_ids = None  # A new lot; list the shards again on the next poll
+                return  # Loaded from the database, commit included, when first requested
+            changed = False
+            for key, status in updates.items():
+                if snapshot.spots.get(key) != status:
+                    snapshot.spots[key] = status
+                    changed = True
+                if key[0] and snapshot.spots.pop(('',) + key[1:], None) is not None:
+                    changed = True  # The ingest writer deleted the legacy row without a camera
+            if changed:
+                snapshot.version += 1
+                snapshot.body = None
+                self._version += 1
+            if snapshot.connection is not None and snapshot.data_version is not None:
+                # A commit by another process in the instant since this one is only seen with the next change
+                snapshot.data_version = self._data_version(snapshot)
+
+    def _serialize(self, lot, snapshot):
+        if snapshot.body is None:
+            snapshot.body = b','.join(json.dumps({
+                'lot': lot,
+                'camera': camera,
+                'section': section,
+                'spot_number': spot_number,
+                'status': status
+            }, sort_keys=True, separators=(',', ':')).encode() for (camera, section, spot_number), status in snapshot.spots.items())
+        return snapshot.body
+
+    def get(self, lot=None):
+        """
+        Returns the current spots of one lot or of every lot.
+
+        Parameters:
+        lot (str, optional): The lot to return. If None, spots from all lots are returned.
+
+        Returns:
+        tuple: The ETag of the current version, and the spots serialized as a JSON list
+               (empty for a lot without a database).
+        """
+        if lot is not None:
+            if not self.shards.exists(lot):
+                return f"{self._instance}-{lot}-missing", b'[]'
+            snapshot = self._load(lot)
+            with self._lock:
+                return f"{self._instance}-{lot}-{snapshot.version}", b'[' + self._serialize(lot, snapshot) + b']'
+        snapshots = [(lot_id, self._load(lot_id)) for lot_id in self._lots_with_database()]
+        with self._lock:
+            if self._body is None or self._body[0] != self._version:
+                bodies = [self._serialize(lot_id, snapshot) for lot_id, snapshot in snapshots]
+                self._body = (self._version, b'[' + b','.join(body for body in bodies if body) + b']')
+            return f"{self._instance}-{self._version}", self._body[1]
@@ -14,19 +14,48 @@ document.addEventListener("DOMContentLoaded", function () {
 });
 
 /**
- * Fetches spot data from the server and updates the spot colors and paths.
+ * Fetches spot data of the displayed lot from the server and updates the spot colors and paths.
+ * The lot comes from the page's "lot" query parameter (default "default"); a "camera" parameter
+ * restricts the map to the spots reported by one camera.
  */
 function fetchSpotsData() {
-  fetch("/spots")
+  const params = new URLSearchParams(window.location.search);
+  const lot = params.get("lot") || "default";
+  fetch(`/spots?lot=${encodeURIComponent(lot)}`)
     .then((response) => response.json())
     .then((data) => {
       console.log("Fetched data:", data);
-      updateSpotColors(data);
-      updatePathForOccupiedSpots(data);
+      const spots = selectSpots(data, params.get("camera"));
+      updateSpotColors(spots);
+      updatePathForOccupiedSpots(spots);
     })
     .catch((error) => console.error("Error fetching spots data:", error));
 }
 
+/**
+ * Reduces the spots of a lot to one entry per map spot. Spots are keyed by camera, section and
+ * spot number on the server, so cameras that overlap report the same map spot; a spot counts as
+ * occupied if any camera sees it occupied.
+ *
+ * @param {Array} data - The array of spot data from the server.
+ * @param {string|null} camera - Only use the spots of this camera, or null for all cameras.
+ * @returns {Array} - One spot per section and spot number.
+ */
+function selectSpots(data, camera) {
+  const spots = new Map();
+  data.forEach((spot) => {
+    if (camera && spot.camera !== camera) {
+      return;
+    }
+    const key = `${spot.section}/${spot.spot_number}`;
+    const current = spots.get(key);
+    if (!current || (spot.status === "occupied" && current.status !== "occupied")) {
+      spots.set(key, spot);
+    }
+  });
+  return Array.from(spots.values());
+}
+
 /**
  * Positions spots within a section and optionally rotates them.
  *
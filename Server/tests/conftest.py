@@ -0,0 +1,43 @@
+import os
+import sys
+import types
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+from shards import LotShards
+from ingest import IngestQueue
+from snapshot import SpotSnapshot
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    A minimal application with its own databases, lot shards, ingest queue and snapshot under tmp_path.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'parking.db')
+    app.config['LOTS_DIRECTORY'] = str(tmp_path / 'lots')
+    app.config['INGEST_JOURNAL_DIRECTORY'] = str(tmp_path / 'journal')
+    app.config['INGEST_WINDOW'] = 0.01
+    db.init_app(app)
+    shards = LotShards(app)
+    ingest = IngestQueue(app, shards)
+    snapshot = SpotSnapshot(app, shards)
+    ingest.on_prepare(snapshot.prepare)
+    ingest.on_commit(snapshot.apply)
+    return types.SimpleNamespace(app=app, shards=shards, ingest=ingest, snapshot=snapshot, path=tmp_path)
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    """
+    A test client of the real application (app.py), with its databases in a temporary directory.
+    The application is shared by the whole session, so tests use lots of their own.
+    """
+    path = tmp_path_factory.mktemp('app')
+    os.environ['PARKING_DATABASE_URI'] = 'sqlite:///' + str(path / 'parking.db')
+    os.environ['PARKING_LOTS_DIR'] = str(path / 'lots')
+    import app
+    app.app.config['INGEST_JOURNAL_DIRECTORY'] = str(path / 'journal')
+    return app.app.test_client()
@@ -0,0 +1,69 @@
+import os
+import pytest
+from datetime import datetime
+from models import OccupancyEvent, ParkingSpot
+from export import export_parquet, stream_arrow, whole_days, open_shards
+
+def add_events(server, lot, events):
+    with server.shards.engine(lot).begin() as connection:
+        connection.execute(OccupancyEvent.__table__.insert(), [
+            {'lot': lot, 'camera': 'camera_1', 'section': section, 'spot_number': 1, 'status': 'occupied', 'recorded_at': recorded_at}
+            for section, recorded_at in events])
+
+def partitions(path):
+    return sorted(os.path.relpath(root, path) for root, directories, files in os.walk(path) if files)
+
+def test_whole_days():
+    assert whole_days(datetime(2024, 5, 1, 13, 30), datetime(2024, 5, 2, 8)) == (datetime(2024, 5, 1), datetime(2024, 5, 3))
+    assert whole_days(datetime(2024, 5, 1), datetime(2024, 5, 2)) == (datetime(2024, 5, 1), datetime(2024, 5, 2))
+    assert whole_days(None, None) == (None, None)
+
+def test_export_is_partitioned_by_lot_date_and_section(server, tmp_path):
+    pytest.importorskip('pyarrow')
+    add_events(server, 'north', [('A', datetime(2024, 5, 1, 9)), ('B', datetime(2024, 5, 2, 9))])
+    add_events(server, 'south', [('A', datetime(2024, 5, 1, 10))])
+    with server.shards.engine('north').begin() as connection:
+        connection.execute(ParkingSpot.__table__.insert(), {'lot': 'north', 'camera': 'camera_1', 'section': 'A', 'spot_number': 1, 'status': 'occupied'})
+    output = str(tmp_path / 'export')
+
+    counts = export_parquet(server.shards, output, tables=('events', 'spots'), lots=['north', 'south'])
+    assert counts == {'events': 3, 'spots': 1}
+    assert partitions(os.path.join(output, 'events')) == [
+        'lot=north/date=2024-05-01/section=A', 'lot=north/date=2024-05-02/section=B', 'lot=south/date=2024-05-01/section=A']
+    assert partitions(os.path.join(output, 'spots')) == ['lot=north/section=A']
+
+def test_reexporting_one_lot_keeps_the_others(server, tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.dataset as ds
+    add_events(server, 'north', [('A', datetime(2024, 5, 1, 9))])
+    add_events(server, 'south', [('A', datetime(2024, 5, 1, 10))])
+    output = str(tmp_path / 'export')
+    export_parquet(server.shards, output, tables=('events',), lots=['north', 'south'])
+
+    add_events(server, 'north', [('A', datetime(2024, 5, 1, 11))])
+    assert export_parquet(server.shards, output, tables=('events',), lots=['north'],
+                          start=datetime(2024, 5, 1, 10), end=datetime(2024, 5, 1, 12)) == {'events': 2}
+    table = ds.dataset(os.path.join(output, 'events'), format='parquet', partitioning='hive').to_table()
+    assert sorted(table.column('lot').to_pylist()) == ['north', 'north', 'south']
+
+def test_missing_lots_are_not_exported_or_created(server, tmp_path):
+    pytest.importorskip('pyarrow')
+    assert export_parquet(server.shards, str(tmp_path / 'export'), tables=('events',), lots=['nowhere']) == {'events': 0}
+    assert not os.path.exists(server.path / 'lots' / 'nowhere.db')
+
+def test_arrow_stream_round_trip(server):
+    pa = pytest.importorskip('pyarrow')
+    add_events(server, 'north', [('A', datetime(2024, 5, 1, 9)), ('B', datetime(2024, 5, 1, 10)), ('A', datetime(2024, 5, 2, 9))])
+    data = b''.join(stream_arrow(server.shards, 'events', lots=['north'], chunk_size=2))
+    reader = pa.ipc.open_stream(data)
+    batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    table = pa.Table.from_batches(batches)
+    assert table.column('section').to_pylist() == ['A', 'B', 'A']
+    assert table.column('date').to_pylist() == ['2024-05-01', '2024-05-01', '2024-05-02']
+
+def test_open_shards_reads_without_the_app(server):
+    add_events(server, 'north', [('A', datetime(2024, 5, 1, 9))])
+    shards = open_shards(server.app.config['SQLALCHEMY_DATABASE_URI'], str(server.path / 'lots'))
+    assert shards.exists('north')
+    assert not shards.exists('nowhere')
@@ -0,0 +1,126 @@
+import os
+import json
+import pytest
+from sqlalchemy import select, func
+from models import ParkingSpot, OccupancyEvent, IngestCheckpoint
+from ingest import IngestJournal, chunked
+
+def spots(server, lot):
+    with server.shards.engine(lot).connect() as connection:
+        return {(camera, section, spot_number): status for camera, section, spot_number, status in connection.execute(
+            select(ParkingSpot.camera, ParkingSpot.section, ParkingSpot.spot_number, ParkingSpot.status))}
+
+def event_count(server, lot):
+    with server.shards.engine(lot).connect() as connection:
+        return connection.execute(select(func.count()).select_from(OccupancyEvent)).scalar()
+
+def test_updates_are_written_to_their_lot(server):
+    server.ingest.wait([server.ingest.submit('north', {('camera_1', 'A', 1): 'occupied'})])
+    assert spots(server, 'north') == {('camera_1', 'A', 1): 'occupied'}
+    assert os.path.exists(server.path / 'lots' / 'north.db')
+
+def test_updates_in_one_window_are_coalesced(server):
+    server.app.config['INGEST_WINDOW'] = 0.5
+    futures = [server.ingest.submit('north', {('camera_1', 'A', 1): status}) for status in ('occupied', 'available', 'occupied')]
+    server.ingest.wait(futures)
+    assert [future.result() for future in futures] == [1, 1, 1]  # One commit with one coalesced spot
+    assert spots(server, 'north') == {('camera_1', 'A', 1): 'occupied'}
+    assert event_count(server, 'north') == 1
+
+def test_only_status_changes_are_recorded(server):
+    for status in ('occupied', 'occupied', 'available'):
+        server.ingest.wait([server.ingest.submit('north', {('camera_1', 'A', 1): status, ('camera_1', 'A', 2): 'available'})])
+    assert event_count(server, 'north') == 3  # A/1 occupied, A/2 available, A/1 available
+
+def test_camera_update_replaces_legacy_row(server):
+    with server.shards.engine('north').begin() as connection:
+        connection.execute(ParkingSpot.__table__.insert(), [{'lot': 'north', 'camera': '', 'section': 'A', 'spot_number': n, 'status': 'available'} for n in (1, 2)])
+    server.ingest.wait([server.ingest.submit('north', {('camera_1', 'A', 1): 'occupied'})])
+    assert spots(server, 'north') == {('', 'A', 2): 'available', ('camera_1', 'A', 1): 'occupied'}
+
+def test_chunked_splits_keys():
+    assert chunked(range(7), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert chunked([], 3) == []
+
+def test_enqueue_journals_and_empties_after_commit(server):
+    server.app.config['INGEST_ACK'] = 'enqueue'
+    server.ingest.wait([server.ingest.submit('north', {('camera_1', 'A', 1): 'occupied'})])
+    assert spots(server, 'north') == {('camera_1', 'A', 1): 'occupied'}
+    assert os.path.getsize(server.path / 'journal' / 'north.jsonl') == 0
+    with server.shards.engine('north').connect() as connection:
+        assert connection.execute(select(IngestCheckpoint.seq).where(IngestCheckpoint.lot == 'north')).scalar() == 1
+
+def test_recover_replays_uncommitted_entries(server):
+    os.makedirs(server.path / 'journal')
+    journal = IngestJournal(str(server.path / 'journal' / 'north.jsonl'))
+    journal.append({('camera_1', 'A', 1): 'occupied'})
+    journal.append({('camera_1', 'A', 2): 'occupied'})
+    with open(journal.path, 'ab') as file:
+        file.write(b'{"seq":3,"upd')  # Torn by a crash before it was acknowledged
+
+    # Entry 1 was committed before the crash; only entry 2 must be replayed
+    server.shards.engine('north')
+    with server.shards.engine('north').begin() as connection:
+        connection.execute(IngestCheckpoint.__table__.insert(), {'lot': 'north', 'seq': 1})
+
+    assert server.ingest.recover() == 1
+    server.ingest.wait([server.ingest.submit('north', {})])  # Queued behind the replayed entries
+    assert spots(server, 'north') == {('camera_1', 'A', 2): 'occupied'}
+    assert os.path.getsize(journal.path) == 0
+
+def test_failing_request_does_not_fail_its_window(server):
+    server.app.config['INGEST_WINDOW'] = 0.5
+    good = server.ingest.submit('north', {('camera_1', 'A', 1): 'occupied'})
+    bad = server.ingest.submit('north', {('camera_2', 'A', 1): {'a': 1}})  # Cannot be bound as a column value
+    later = server.ingest.submit('north', {('camera_1', 'A', 2): 'occupied'})
+    server.ingest.wait([good, later])
+    with pytest.raises(Exception):
+        bad.result(timeout=1)
+    assert spots(server, 'north') == {('camera_1', 'A', 1): 'occupied', ('camera_1', 'A', 2): 'occupied'}
+
+def test_failed_journal_entries_are_retried_until_committed(server):
+    server.app.config['INGEST_ACK'] = 'enqueue'
+    server.app.config['INGEST_WINDOW'] = 0.5
+    server.app.config['INGEST_RETRY_DELAY'] = 0.01
+    write = server.ingest.write
+    failures = []
+
+    def flaky_write(lot, updates, seq=None):
+        if len(failures) < 2:  # The window, then the first entry on its own
+            failures.append(seq)
+            raise RuntimeError('database is locked')
+        return write(lot, updates, seq)
+
+    server.ingest.write = flaky_write
+    first = server.ingest.submit('north', {('camera_1', 'A', 1): 'occupied'})
+    second = server.ingest.submit('north', {('camera_1', 'A', 2): 'occupied'})
+    server.ingest.wait([first, second])
+    assert failures == [2, 1]
+    assert spots(server, 'north') == {('camera_1', 'A', 1): 'occupied', ('camera_1', 'A', 2): 'occupied'}
+    assert os.path.getsize(server.path / 'journal' / 'north.jsonl') == 0
+    with server.shards.engine('north').connect() as connection:
+        assert connection.execute(select(IngestCheckpoint.seq).where(IngestCheckpoint.lot == 'north')).scalar() == 2
+
+def test_recover_without_journal(server):
+    assert server.ingest.recover() == 0
+
+def test_spot_numbers_must_be_integers(client):
+    def post(spot_number):
+        return client.post('/spots', json=[{'lot': 'validation', 'camera': 'camera_1', 'section': 'A', 'spot_number': spot_number, 'status': 'occupied'}])
+    assert post(1.9).status_code == 400
+    assert post(True).status_code == 400
+    assert post('x').status_code == 400
+    assert post(2.0).status_code == 200
+    assert post('3').status_code == 200
+    assert sorted(spot['spot_number'] for spot in json.loads(client.get('/spots?lot=validation').data)) == [2, 3]
+
+@pytest.mark.parametrize('update', [
+    {'status': {'a': 1}},
+    {'status': 'parked'},
+    {'camera': 7},
+    {'section': ['A']},
+])
+def test_malformed_updates_are_rejected(client, update):
+    spot = dict({'lot': 'validation', 'camera': 'camera_1', 'section': 'A', 'spot_number': 1, 'status': 'occupied'}, **update)
+    assert client.post('/spots', json=[spot]).status_code == 400
+    assert client.post('/spots', json=['not an update']).status_code == 400
@@ -0,0 +1,61 @@
+from datetime import datetime
+from sqlalchemy import select, func
+from models import OccupancyEvent, OccupancyRollup
+from maintenance import MaintenanceJob, compact_lot, retention_cutoff
+from analytics import query_occupancy
+
+def add_events(server, lot, events):
+    with server.shards.engine(lot).begin() as connection:
+        connection.execute(OccupancyEvent.__table__.insert(), [
+            {'lot': lot, 'camera': camera, 'section': section, 'spot_number': 1, 'status': status, 'recorded_at': recorded_at}
+            for camera, section, status, recorded_at in events])
+
+def test_retention_cutoff_is_aligned_to_the_hour():
+    assert retention_cutoff(1, datetime(2024, 5, 2, 10, 45, 12)) == datetime(2024, 5, 1, 10, 0)
+
+def test_compact_lot_rolls_up_per_camera(server):
+    add_events(server, 'north', [
+        ('camera_1', 'A', 'occupied', datetime(2024, 5, 1, 9, 5)),
+        ('camera_1', 'A', 'available', datetime(2024, 5, 1, 9, 40)),
+        ('camera_2', 'A', 'occupied', datetime(2024, 5, 1, 9, 50)),
+        ('camera_1', 'A', 'occupied', datetime(2024, 5, 1, 10, 15)),  # After the cutoff; kept as an event
+    ])
+    assert compact_lot(server.shards, 'north', datetime(2024, 5, 1, 10), batch_size=2) == 3
+
+    with server.shards.engine('north').connect() as connection:
+        rollups = connection.execute(select(OccupancyRollup.camera, OccupancyRollup.arrivals, OccupancyRollup.departures, OccupancyRollup.events)
+                                     .order_by(OccupancyRollup.camera)).all()
+        remaining = connection.execute(select(func.count()).select_from(OccupancyEvent)).scalar()
+    assert [tuple(row) for row in rollups] == [('camera_1', 1, 1, 2), ('camera_2', 1, 0, 1)]
+    assert remaining == 1
+
+def test_compaction_is_idempotent(server):
+    add_events(server, 'north', [('camera_1', 'A', 'occupied', datetime(2024, 5, 1, 9, 5))])
+    cutoff = datetime(2024, 5, 1, 10)
+    assert compact_lot(server.shards, 'north', cutoff) == 1
+    assert compact_lot(server.shards, 'north', cutoff) == 0
+
+def test_query_merges_rollups_and_events(server):
+    add_events(server, 'north', [
+        ('camera_1', 'A', 'occupied', datetime(2024, 5, 1, 9, 5)),
+        ('camera_2', 'A', 'occupied', datetime(2024, 5, 1, 9, 50)),
+        ('camera_1', 'B', 'available', datetime(2024, 5, 1, 9, 55)),
+    ])
+    with server.shards.session('north') as session:
+        before = query_occupancy(session, datetime(2024, 5, 1), datetime(2024, 5, 2), bucket='day')
+    compact_lot(server.shards, 'north', datetime(2024, 5, 1, 10))
+    add_events(server, 'north', [('camera_1', 'A', 'available', datetime(2024, 5, 1, 11, 0))])
+
+    with server.shards.session('north') as session:
+        by_day = query_occupancy(session, datetime(2024, 5, 1), datetime(2024, 5, 2), bucket='day')
+        by_hour = query_occupancy(session, datetime(2024, 5, 1), datetime(2024, 5, 2), section='A')
+    assert [tuple(row) for row in before] == [('2024-05-01T00:00:00', 'A', 2, 0, 2), ('2024-05-01T00:00:00', 'B', 0, 1, 1)]
+    assert [tuple(row) for row in by_day] == [('2024-05-01T00:00:00', 'A', 2, 1, 3), ('2024-05-01T00:00:00', 'B', 0, 1, 1)]
+    assert [(row.time, row.events) for row in by_hour] == [('2024-05-01T09:00:00', 2), ('2024-05-01T11:00:00', 1)]
+
+def test_job_does_not_start_on_registration(server):
+    job = MaintenanceJob(server.app, server.shards)
+    assert job._thread is None
+    server.app.config['MAINTENANCE_INTERVAL'] = 0
+    job.start()
+    assert job._thread is None
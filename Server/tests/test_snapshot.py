@@ -0,0 +1,94 @@
+import os
+import json
+import sqlite3
+
+def submit(server, lot, updates):
+    server.ingest.wait([server.ingest.submit(lot, updates)])
+
+def test_etag_changes_only_with_the_spots(server):
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    etag, body = server.snapshot.get('north')
+    assert json.loads(body) == [{'lot': 'north', 'camera': 'camera_1', 'section': 'A', 'spot_number': 1, 'status': 'occupied'}]
+
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    assert server.snapshot.get('north') == (etag, body)
+
+    submit(server, 'north', {('camera_1', 'A', 1): 'available'})
+    new_etag, new_body = server.snapshot.get('north')
+    assert new_etag != etag
+    assert json.loads(new_body)[0]['status'] == 'available'
+
+def test_all_lots_are_combined(server):
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    submit(server, 'south', {('camera_1', 'A', 1): 'available'})
+    etag, body = server.snapshot.get()
+    assert sorted(spot['lot'] for spot in json.loads(body)) == ['north', 'south']
+    submit(server, 'south', {('camera_1', 'A', 1): 'occupied'})
+    assert server.snapshot.get()[0] != etag
+
+def test_external_writes_are_seen(server):
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    etag, _ = server.snapshot.get('north')
+    with sqlite3.connect(str(server.path / 'lots' / 'north.db')) as connection:
+        connection.execute("UPDATE parking_spot SET status = 'available'")
+    new_etag, body = server.snapshot.get('north')
+    assert new_etag != etag
+    assert json.loads(body)[0]['status'] == 'available'
+
+def count_reads(server, monkeypatch):
+    reads = []
+    read = server.snapshot._read
+    monkeypatch.setattr(server.snapshot, '_read', lambda lot, snapshot: reads.append(lot) or read(lot, snapshot))
+    return reads
+
+def test_own_commits_do_not_reread_the_lot(server, monkeypatch):
+    reads = count_reads(server, monkeypatch)
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    server.snapshot.get('north')
+    for number in range(2, 7):
+        submit(server, 'north', {('camera_1', 'A', number): 'occupied'})
+        assert len(json.loads(server.snapshot.get('north')[1])) == number
+    assert reads == ['north']
+
+def test_external_write_before_a_commit_is_not_missed(server):
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    server.snapshot.get('north')
+    with sqlite3.connect(str(server.path / 'lots' / 'north.db')) as connection:
+        connection.execute("UPDATE parking_spot SET status = 'available'")
+    submit(server, 'north', {('camera_1', 'A', 2): 'occupied'})
+    assert [spot['status'] for spot in json.loads(server.snapshot.get('north')[1])] == ['available', 'occupied']
+
+def test_polls_of_all_lots_do_not_list_the_shards(server, monkeypatch):
+    submit(server, 'north', {('camera_1', 'A', 1): 'occupied'})
+    listings = []
+    lots = server.shards.lots
+    monkeypatch.setattr(server.shards, 'lots', lambda: listings.append(1) or lots())
+    for _ in range(3):
+        server.snapshot.get()
+    assert len(listings) == 1
+    submit(server, 'south', {('camera_1', 'A', 1): 'occupied'})  # A new lot is listed on the next poll
+    assert sorted(spot['lot'] for spot in json.loads(server.snapshot.get()[1])) == ['north', 'south']
+    assert len(listings) == 2
+
+def test_missing_lot_is_empty_and_not_created(server):
+    etag, body = server.snapshot.get('nowhere')
+    assert body == b'[]'
+    assert etag.endswith('-nowhere-missing')
+    assert not os.path.exists(server.path / 'lots' / 'nowhere.db')
+
+def test_conditional_get_returns_304(client):
+    client.post('/spots', json=[{'lot': 'etag', 'camera': 'camera_1', 'section': 'A', 'spot_number': 1, 'status': 'occupied'}])
+    response = client.get('/spots?lot=etag')
+    assert response.status_code == 200 and response.headers['ETag']
+    assert client.get('/spots?lot=etag', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    client.post('/spots', json=[{'lot': 'etag', 'camera': 'camera_1', 'section': 'A', 'spot_number': 1, 'status': 'available'}])
+    response = client.get('/spots?lot=etag', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 200
+    assert json.loads(response.data)[0]['status'] == 'available'
+
+def test_reading_an_unknown_lot_creates_no_shard(client):
+    import app
+    assert client.get('/spots?lot=unknown').data == b'[]'
+    assert client.get('/analysis/query?lot=unknown').status_code == 200
+    assert not os.path.exists(os.path.join(app.app.config['LOTS_DIRECTORY'], 'unknown.db'))
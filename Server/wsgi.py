@@ -0,0 +1,6 @@
+# wsgi.py
+# Entry point for `flask run` (FLASK_APP=wsgi.py) and WSGI servers, e.g. `gunicorn --workers 1 --threads 8 wsgi:app`.
+# Each lot has a single ingest writer per process, so run one worker process and scale with threads.
+from app import app, start_services
+
+start_services()
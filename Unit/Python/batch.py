@@ -0,0 +1,191 @@
+import os
+import cv2
+import argparse
+import multiprocessing
+import pandas as pd
+from module import process_frame, DEFAULT_FRAME_SIZE
+from detectors import create_detector
+from utils import read_class_list, fetch_parking_occupancy
+from layout import CameraLayout
+from traces import TraceWriter, merge_traces
+
+SEEK_THRESHOLD = 30  # Seek instead of grabbing when the next sampled frame is further away than this
+
+def plan_chunks(frame_count, fps, interval, workers):
+    """
+    Splits the sampled frames of a video into contiguous chunks, one per worker.
+    Every chunk starts on a sampled frame so a worker can seek straight to it.
+
+    Parameters:
+    frame_count (int): The number of frames in the video.
+    fps (float): The frame rate of the video.
+    interval (float): The sampling interval in seconds.
+    workers (int): The number of worker processes.
+
+    Returns:
+    tuple: The step between sampled frames, and a list of (start, stop) frame ranges.
+    """
+    step = max(1, int(round(fps * interval)))
+    samples = (frame_count + step - 1) // step
+    per_worker = max(1, -(-samples // max(1, workers)))
+    chunks = []
+    for first in range(0, samples, per_worker):
+        start = first * step
+        stop = min(frame_count, (first + per_worker) * step)
+        chunks.append((start, stop))
+    return step, chunks
+
+def process_chunk(video_path, start, stop, step, fps, sections, detector_config=None, frame_size=DEFAULT_FRAME_SIZE, trace_path=None, camera_id=1):
+    """
+    Runs detection and spot matching on the sampled frames of one chunk of a video.
+
+    Parameters:
+    video_path (str): The path to the video file.
+    start (int): The first frame of the chunk (a sampled frame).
+    stop (int): The frame index the chunk ends before.
+    step (int): The number of frames between samples.
+    fps (float): The frame rate of the video.
+    sections (list): The layout of the camera, as stored in parking_info.json.
+    detector_config (dict, optional): The detector backend and its options (see detectors.create_detector).
+    frame_size (tuple): The (width, height) frames are resized to before processing.
+    trace_path (str, optional): A detection trace file to record the chunk's raw detections to.
+    camera_id (int): The camera ID recorded in the trace.
+
+    Returns:
+    list: One row per sampled frame: [timestamp, frame index, occupancy of each spot (0 or 1)].
+    """
+    cv2.setNumThreads(1)  # Parallelism comes from the worker processes
+    detector = create_detector(**(detector_config or {}))
+    class_list = read_class_list()
+    layout = CameraLayout.from_json(sections)
+    trace = TraceWriter(trace_path) if trace_path else None
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    rows = []
+    position = start
+    try:
+        for index in range(start, stop, step):
+            if index - position > SEEK_THRESHOLD:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            while position < index:  # Advance to the next sample; grab() still decodes, but skips the conversion to BGR
+                if not cap.grab():
+                    return rows
+                position += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position += 1
+            frame = cv2.resize(frame, tuple(frame_size))
+            detections = detector.detect(frame)
+            if trace is not None:
+                trace.write(camera_id, index, round(index / fps, 3), frame_size, detections)
+            _, layout = process_frame(frame, layout, class_list, detector, draw=False, detections=detections)
+            rows.append([round(index / fps, 3), index] + layout.occupied.astype(int).tolist())
+    finally:
+        cap.release()
+        if trace is not None:
+            trace.close()
+    return rows
+
+def build_timeline(video_path, sections, interval=1.0, workers=None, detector_config=None, frame_size=DEFAULT_FRAME_SIZE, trace_path=None, camera_id=1):
+    """
+    Builds the occupancy timeline of a recorded video using several worker processes.
+
+    Parameters:
+    video_path (str): The path to the video file.
+    sections (list): The layout of the camera, as stored in parking_info.json.
+    interval (float): The sampling interval in seconds.
+    workers (int, optional): The number of worker processes (defaults to the number of CPUs).
+    detector_config (dict, optional): The detector backend and its options (see detectors.create_detector).
+    frame_size (tuple): The (width, height) frames are resized to before processing.
+    trace_path (str, optional): A detection trace file to append the raw detections of all sampled frames to, in frame order.
+    camera_id (int): The camera ID recorded in the trace.
+
+    Returns:
+    pandas.DataFrame: One row per sampled frame with 'timestamp' and 'frame' columns
+                      and one uint8 column per spot named '<section>/<spot number>'.
+
+    Raises:
+    OSError: If the video cannot be opened.
+    ValueError: If the source does not report a frame count, e.g. because it is a stream rather than a file.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise OSError("Failed to open video source: " + video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    cap.release()
+    if frame_count <= 0:
+        raise ValueError(f"{video_path} does not report a frame count; batch mode needs a recorded video file, not a stream")
+
+    workers = workers or os.cpu_count() or 1
+    spot_keys = [f"{section['id']}/{i + 1}" for section in sections for i in range(len(section['parking_areas']))]
+    step, chunks = plan_chunks(frame_count, fps, interval, workers)
+
+    # Spawn rather than fork so every worker initializes its own model runtime
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=min(workers, len(chunks)) or 1) as pool:
+        # Every worker records its chunk to its own part file; the parts are appended in frame order afterwards
+        parts = [f"{trace_path}.{start}.part" if trace_path else None for start, _ in chunks]
+        results = pool.starmap(process_chunk, [(video_path, start, stop, step, fps, sections, detector_config, frame_size, part, camera_id)
+                                               for (start, stop), part in zip(chunks, parts)])
+    if trace_path:
+        merge_traces(trace_path, parts)
+
+    timeline = pd.DataFrame([row for rows in results for row in rows], columns=['timestamp', 'frame'] + spot_keys)
+    return timeline.astype({key: 'uint8' for key in spot_keys})
+
+def write_timeline(timeline, output):
+    """
+    Writes an occupancy timeline to CSV, or to Parquet when the output path ends with '.parquet'.
+
+    Parameters:
+    timeline (pandas.DataFrame): The timeline to write.
+    output (str): The output file path.
+    """
+    if output.endswith('.parquet'):
+        timeline.to_parquet(output, index=False)
+    else:
+        timeline.to_csv(output, index=False)
+
+def main():
+    """
+    Command-line entry point for offline processing of recorded video.
+    Reads the camera layout from parking_info.json without modifying it and never contacts the backend.
+    """
+    parser = argparse.ArgumentParser(description="Build an occupancy timeline from a recorded video as fast as the CPU allows.")
+    parser.add_argument('video', help="Path to the recorded video file.")
+    parser.add_argument('--camera-id', type=int, default=1, help="Camera whose layout is used (default: 1).")
+    parser.add_argument('--interval', type=float, default=1.0, help="Sampling interval in seconds of video (default: 1.0).")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument('--output', default='timeline.csv', help="Output file, .csv or .parquet (default: timeline.csv).")
+    parser.add_argument('--backend', default='ultralytics', help="Detector backend: ultralytics, onnxruntime, opencv or fake (default: ultralytics).")
+    parser.add_argument('--weights', default=None, help="Model weights for the backend (default: the backend's default).")
+    parser.add_argument('--input-size', type=int, default=None, help="Square inference input size in pixels (default: 640).")
+    parser.add_argument('--frame-size', type=int, nargs=2, default=list(DEFAULT_FRAME_SIZE), metavar=('WIDTH', 'HEIGHT'), help="Processing resolution (default: 1020 500).")
+    parser.add_argument('--quantized', action='store_true', help="Use int8 quantized weights (onnxruntime backend only).")
+    parser.add_argument('--trace', default=None, help="Also record the raw detections to this trace file, to replay with traces.py.")
+    args = parser.parse_args()
+
+    sections = fetch_parking_occupancy(args.camera_id)
+    if not sections:
+        parser.error(f"No layout found for camera {args.camera_id}")
+
+    detector_config = {'backend': args.backend}
+    if args.weights:
+        detector_config['weights'] = args.weights
+    if args.input_size:
+        detector_config['input_size'] = args.input_size
+    if args.quantized:
+        detector_config['quantized'] = True
+
+    try:
+        timeline = build_timeline(args.video, sections, args.interval, args.workers, detector_config, tuple(args.frame_size), args.trace, args.camera_id)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    write_timeline(timeline, args.output)
+    print(f"Wrote {len(timeline)} samples for {len(timeline.columns) - 2} spots to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-import requests
 import os
 import time
 from utils import fetch_parking_occupancy
 
 GLOBAL_URL = None  # Replace with your actual backend URL
 BACKEND_URL = GLOBAL_URL if GLOBAL_URL is not None else 'http://127.0.0.1:5000/spots'  
+LOT_ID = 'default'  # Replace with the identifier of the parking lot this unit monitors
 
 def send_updates(updates):
     """
@@ -16,6 +16,8 @@ def send_updates(updates):
     Raises:
     requests.exceptions.RequestException: If the request to the backend server fails.
     """
+    import requests  # Imported on first use to keep unit startup fast
+
     try:
         response = requests.post(BACKEND_URL, json=updates)
         response.raise_for_status()
@@ -36,6 +38,8 @@ def send_parking_info(camera_id):
         for i, area in enumerate(section.get('parking_areas', [])):
             status = 'occupied' if area.get('occupied') else 'available'
             updates.append({
+                'lot': LOT_ID,
+                'camera': f"camera_{camera_id}",
                 'section': section_id,
                 'spot_number': i + 1,
                 'status': status
@@ -0,0 +1,300 @@
+import os
+import abc
+import cv2
+import threading
+import numpy as np
+from collections import namedtuple
+from startup import phase
+
+# Boxes are float32 (N, 4) arrays of (x1, y1, x2, y2) in frame pixels, classes int32 (N,) indices into coco.json, scores float32 (N,)
+Detections = namedtuple('Detections', ['boxes', 'classes', 'scores'])
+
+DEFAULT_INPUT_SIZE = 640
+DEFAULT_CONFIDENCE = 0.25
+NMS_THRESHOLD = 0.45
+WARMUP_FRAME_SIZE = (1020, 500)  # Width and height of the warm-up frame when the caller does not give its frame size
+
+_detectors = {}  # Loaded detectors by configuration, and also by camera for backends that are not thread-safe
+_detector_users = {}  # The cameras using each loaded detector
+_detectors_lock = threading.Lock()
+
+def empty_detections():
+    """
+    Creates an empty set of detections.
+
+    Returns:
+    Detections: Detections with zero boxes.
+    """
+    return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32))
+
+class Detector(abc.ABC):
+    """
+    Base class of the object detector backends. Backends implement _detect; callers use detect,
+    which serializes calls on backends that are not thread-safe so an instance can still be shared.
+
+    Attributes:
+    thread_safe (bool): Whether _detect may run in several threads at once on the same instance.
+    """
+    thread_safe = False
+
+    def __init__(self):
+        self._lock = None if self.thread_safe else threading.Lock()
+
+    def detect(self, frame):
+        """
+        Detects objects in a frame.
+
+        Parameters:
+        frame (numpy.ndarray): A BGR frame.
+
+        Returns:
+        Detections: The detected boxes, class indices and scores as NumPy arrays.
+        """
+        if self._lock is None:
+            return self._detect(frame)
+        with self._lock:
+            return self._detect(frame)
+
+    @abc.abstractmethod
+    def _detect(self, frame):
+        """
+        Detects objects in a frame; see detect.
+        """
+
+    def warm_up(self, frame_size=WARMUP_FRAME_SIZE):
+        """
+        Runs one inference on a blank frame so the first real frame does not pay for lazy initialization.
+
+        Parameters:
+        frame_size (tuple): The (width, height) of the frames the detector will be fed.
+        """
+        width, height = frame_size
+        self.detect(np.zeros((int(height), int(width), 3), dtype=np.uint8))
+
+class UltralyticsDetector(Detector):
+    """
+    Detector backed by ultralytics (PyTorch, or any exported format ultralytics can load).
+    """
+    def __init__(self, weights='yolov8s.pt', input_size=DEFAULT_INPUT_SIZE, confidence=DEFAULT_CONFIDENCE):
+        super().__init__()
+        from ultralytics import YOLO  # Imported here so other backends never load PyTorch
+        self.model = YOLO(weights)
+        self.input_size = input_size
+        self.confidence = confidence
+
+    def _detect(self, frame):
+        results = self.model.predict(frame, imgsz=self.input_size, conf=self.confidence, verbose=False)
+        data = results[0].boxes.data
+        data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+        return Detections(data[:, :4].astype(np.float32), data[:, 5].astype(np.int32), data[:, 4].astype(np.float32))
+
+def letterbox(frame, input_size):
+    """
+    Scales a frame to fit a square network input while keeping its aspect ratio, padding the remainder.
+
+    Parameters:
+    frame (numpy.ndarray): A BGR frame.
+    input_size (int): The side of the square network input.
+
+    Returns:
+    tuple: The NCHW float32 RGB blob scaled to [0, 1], the scale factor, and the (x, y) padding in input pixels.
+    """
+    height, width = frame.shape[:2]
+    scale = min(input_size / width, input_size / height)
+    resized_width, resized_height = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (input_size - resized_width) // 2, (input_size - resized_height) // 2
+    canvas = np.full((input_size, input_size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+    blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+    return blob, scale, (pad_x, pad_y)
+
+def decode_yolov8(output, scale, pad, confidence, frame_shape):
+    """
+    Decodes the raw output of a YOLOv8 ONNX model into detections in frame pixels, applying class-wise NMS.
+
+    Parameters:
+    output (numpy.ndarray): The (1, 4 + classes, N) network output.
+    scale (float): The letterbox scale factor.
+    pad (tuple): The letterbox (x, y) padding.
+    confidence (float): The minimum class score to keep.
+    frame_shape (tuple): The shape of the original frame, used to clip boxes.
+
+    Returns:
+    Detections: The decoded detections.
+    """
+    predictions = np.squeeze(output, 0).T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    keep = scores >= confidence
+    if not keep.any():
+        return empty_detections()
+    predictions, classes, scores = predictions[keep], classes[keep], scores[keep]
+
+    centers_x, centers_y, widths, heights = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+    boxes = np.stack([centers_x - widths / 2 - pad[0], centers_y - heights / 2 - pad[1],
+                      centers_x + widths / 2 - pad[0], centers_y + heights / 2 - pad[1]], axis=1) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1] - 1)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0] - 1)
+
+    xywh = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+    indices = np.array(cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), classes.tolist(), confidence, NMS_THRESHOLD), dtype=np.int64).reshape(-1)
+    return Detections(boxes[indices].astype(np.float32), classes[indices].astype(np.int32), scores[indices].astype(np.float32))
+
+def quantized_weights(weights):
+    """
+    Returns the path of the int8 version of an ONNX model, quantizing it with ONNX Runtime if it does not exist yet.
+
+    Parameters:
+    weights (str): The path to the float ONNX model.
+
+    Returns:
+    str: The path to the '<name>.int8.onnx' model.
+    """
+    root, extension = os.path.splitext(weights)
+    if root.endswith('.int8'):
+        return weights
+    int8_weights = f"{root}.int8{extension}"
+    if not os.path.exists(int8_weights):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(weights, int8_weights, weight_type=QuantType.QUInt8)
+    return int8_weights
+
+class OnnxRuntimeDetector(Detector):
+    """
+    Detector running an exported YOLOv8 ONNX model on the ONNX Runtime CPU provider, without PyTorch.
+    """
+    thread_safe = True  # InferenceSession.run may be called concurrently
+
+    def __init__(self, weights='yolov8s.onnx', input_size=DEFAULT_INPUT_SIZE, confidence=DEFAULT_CONFIDENCE, quantized=False):
+        super().__init__()
+        import onnxruntime
+        if quantized:
+            weights = quantized_weights(weights)
+        self.session = onnxruntime.InferenceSession(weights, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_size = input_size
+        self.confidence = confidence
+
+    def _detect(self, frame):
+        blob, scale, pad = letterbox(frame, self.input_size)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return decode_yolov8(output, scale, pad, self.confidence, frame.shape)
+
+class OpenCVDnnDetector(Detector):
+    """
+    Detector running an exported YOLOv8 ONNX model with OpenCV's DNN module, which needs no extra dependencies.
+    """
+    def __init__(self, weights='yolov8s.onnx', input_size=DEFAULT_INPUT_SIZE, confidence=DEFAULT_CONFIDENCE, quantized=False):
+        super().__init__()
+        if quantized:
+            # Dynamically quantized models use ConvInteger/MatMulInteger, which OpenCV DNN cannot load
+            raise ValueError("The opencv backend does not support quantized weights; use the onnxruntime backend")
+        self.net = cv2.dnn.readNetFromONNX(weights)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.confidence = confidence
+
+    def _detect(self, frame):
+        blob, scale, pad = letterbox(frame, self.input_size)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        return decode_yolov8(output, scale, pad, self.confidence, frame.shape)
+
+class FakeDetector(Detector):
+    """
+    Deterministic detector for tests and pipeline benchmarks: returns scripted detections without any model.
+
+    Parameters:
+    script (list, optional): A list of (boxes, classes, scores) tuples returned on successive calls, cycling
+                             when exhausted. Defaults to no detections on every frame.
+    """
+    def __init__(self, script=None, **ignored):
+        super().__init__()
+        self.script = [Detections(np.asarray(boxes, np.float32).reshape(-1, 4), np.asarray(classes, np.int32).reshape(-1),
+                                  np.asarray(scores, np.float32).reshape(-1)) for boxes, classes, scores in (script or [])]
+        self.calls = 0
+
+    def _detect(self, frame):
+        if not self.script:
+            return empty_detections()
+        detections = self.script[self.calls % len(self.script)]
+        self.calls += 1
+        return detections
+
+BACKENDS = {
+    'ultralytics': UltralyticsDetector,
+    'onnxruntime': OnnxRuntimeDetector,
+    'opencv': OpenCVDnnDetector,
+    'fake': FakeDetector,
+}
+
+def create_detector(backend='ultralytics', **options):
+    """
+    Creates a detector for the given backend.
+
+    Parameters:
+    backend (str): One of 'ultralytics', 'onnxruntime', 'opencv' or 'fake'.
+    **options: Backend options such as weights, input_size, confidence and quantized (onnxruntime only).
+
+    Returns:
+    Detector: The created detector.
+
+    Raises:
+    ValueError: If the backend is unknown or does not support an option.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}'. Expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](**options)
+
+def _detector_key(config, camera_id):
+    config = dict(config or {})
+    backend = BACKENDS.get(config.get('backend', 'ultralytics'))
+    shared = backend is not None and backend.thread_safe
+    return None if shared else camera_id, tuple(sorted((name, repr(value)) for name, value in config.items()))
+
+def load_detector(config=None, camera_id=None, frame_size=WARMUP_FRAME_SIZE):
+    """
+    Returns a camera's detector for a configuration, creating and warming it up the first time.
+    Backends that are thread-safe (onnxruntime) load the weights once per configuration and serve all
+    cameras from that instance. The others give every camera its own instance, so cameras never wait on
+    each other's inference. A camera restarted with the same configuration reuses its instance.
+
+    Parameters:
+    config (dict, optional): The detector configuration: 'backend' plus backend options. Defaults to ultralytics.
+    camera_id (int, optional): The camera the detector is for. Callers without a camera share one instance.
+    frame_size (tuple): The (width, height) of the camera's frames, used for the warm-up inference.
+
+    Returns:
+    Detector: The loaded and warmed-up detector.
+    """
+    config = dict(config or {})
+    key = _detector_key(config, camera_id)
+    with _detectors_lock:
+        detector = _detectors.get(key)
+        if detector is None:
+            with phase("model load"):
+                detector = create_detector(**config)
+            with phase("model warm-up"):
+                detector.warm_up(frame_size)
+            _detectors[key] = detector
+        _detector_users.setdefault(key, set()).add(camera_id)
+    return detector
+
+def unload_detector(config=None, camera_id=None):
+    """
+    Releases a camera's detector, e.g. once the camera was removed or its detector reconfigured.
+    A shared detector is dropped once no camera uses it any more.
+
+    Parameters:
+    config (dict, optional): The detector configuration the camera used.
+    camera_id (int, optional): The camera the detector was loaded for.
+    """
+    key = _detector_key(config, camera_id)
+    with _detectors_lock:
+        users = _detector_users.get(key, set())
+        users.discard(camera_id)
+        if not users:
+            _detectors.pop(key, None)
+            _detector_users.pop(key, None)
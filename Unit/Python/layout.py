@@ -0,0 +1,211 @@
+import numpy as np
+
+SECTION_FIELDS = ('id', 'coordinates', 'total', 'occupied', 'free', 'details', 'parking_areas')  # Keys of a section in parking_info.json, in file order
+AREA_FIELDS = ('coordinates', 'occupied')  # Keys of a parking area in parking_info.json, in file order
+
+def _pack(polygons):
+    """
+    Packs polygons into one contiguous (V, 2) vertex array and an (N + 1,) array of offsets into it.
+    """
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+    vertices = np.array([point for polygon in polygons for point in polygon], dtype=np.float64).reshape(-1, 2)
+    return vertices, offsets
+
+def _unpack(vertices, offsets):
+    """
+    Splits a packed vertex array back into per-polygon arrays (views, no copies).
+    """
+    return [vertices[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+class Section:
+    """
+    A section of a camera layout. Its geometry and spots live in the arrays of the owning CameraLayout;
+    the section only records which part of them it owns.
+
+    Attributes:
+    id (str): The section ID (e.g., 'section_A').
+    index (int): The position of the section in the layout.
+    spots (slice): The indices of the section's spots in the layout's spot arrays.
+    extra (dict): Any keys of the stored section this model does not know about, kept for round-tripping.
+    """
+    __slots__ = ('id', 'index', 'spots', 'extra')
+
+    def __init__(self, id, index, spots, extra=None):
+        self.id = id
+        self.index = index
+        self.spots = spots
+        self.extra = extra or {}
+
+class CameraLayout:
+    """
+    Compiled layout and occupancy of one camera. Polygon vertices of all sections and spots are stored in
+    contiguous NumPy arrays with offsets, every spot knows its section through an index array, and the
+    occupancy of all spots is a single boolean array, so comparing two states is an array comparison.
+
+    Coordinates are normalized like in parking_info.json. The per-section counters (total, occupied, free,
+    details) are not stored; they are derived from the occupancy array when converting back to JSON.
+
+    Attributes:
+    sections (tuple): The Section objects, in stored order.
+    section_vertices (numpy.ndarray): float64 (V, 2) vertices of all section polygons.
+    section_offsets (numpy.ndarray): int32 (S + 1,) offsets of each section's polygon in section_vertices.
+    vertices (numpy.ndarray): float64 (W, 2) vertices of all spot polygons.
+    offsets (numpy.ndarray): int32 (N + 1,) offsets of each spot's polygon in vertices.
+    spot_section (numpy.ndarray): int32 (N,) index of the section of each spot.
+    occupied (numpy.ndarray): bool (N,) occupancy of each spot.
+    """
+    __slots__ = ('sections', 'section_vertices', 'section_offsets', 'vertices', 'offsets', 'spot_section', 'occupied', 'area_extras', '_pixels')
+
+    def __init__(self, sections, section_vertices, section_offsets, vertices, offsets, spot_section, occupied, area_extras=None):
+        self.sections = tuple(sections)
+        self.section_vertices = section_vertices
+        self.section_offsets = section_offsets
+        self.vertices = vertices
+        self.offsets = offsets
+        self.spot_section = spot_section
+        self.occupied = occupied
+        self.area_extras = area_extras  # Unknown keys per spot, or None when no spot has any
+        self._pixels = {}  # Pixel geometry by frame size
+
+    @classmethod
+    def from_json(cls, sections):
+        """
+        Compiles the sections of a camera as stored in parking_info.json.
+
+        Parameters:
+        sections (list): The camera's sections, with normalized coordinates.
+
+        Returns:
+        CameraLayout: The compiled layout.
+        """
+        compiled, section_polygons, spot_polygons, spot_section, occupied, area_extras = [], [], [], [], [], []
+        for index, section in enumerate(sections):
+            areas = section.get('parking_areas', [])
+            first = len(spot_polygons)
+            compiled.append(Section(section['id'], index, slice(first, first + len(areas)),
+                                    {key: value for key, value in section.items() if key not in SECTION_FIELDS}))
+            section_polygons.append(section['coordinates'])
+            for area in areas:
+                spot_polygons.append(area['coordinates'])
+                spot_section.append(index)
+                occupied.append(bool(area.get('occupied', False)))
+                area_extras.append({key: value for key, value in area.items() if key not in AREA_FIELDS})
+        section_vertices, section_offsets = _pack(section_polygons)
+        vertices, offsets = _pack(spot_polygons)
+        return cls(compiled, section_vertices, section_offsets, vertices, offsets,
+                   np.array(spot_section, dtype=np.int32), np.array(occupied, dtype=bool),
+                   area_extras if any(area_extras) else None)
+
+    def to_json(self):
+        """
+        Converts the layout back to the parking_info.json representation of a camera's sections.
+
+        Returns:
+        list: The sections, with normalized coordinates and counters derived from the occupancy.
+        """
+        section_polygons = _unpack(self.section_vertices, self.section_offsets)
+        spot_polygons = _unpack(self.vertices, self.offsets)
+        occupied = self.occupied.tolist()
+        sections = []
+        for section in self.sections:
+            details = [int(value) for value in occupied[section.spots]]
+            areas = []
+            for spot in range(section.spots.start, section.spots.stop):
+                area = {'coordinates': spot_polygons[spot].tolist(), 'occupied': occupied[spot]}
+                if self.area_extras:
+                    area.update(self.area_extras[spot])
+                areas.append(area)
+            sections.append(dict({
+                'id': section.id,
+                'coordinates': section_polygons[section.index].tolist(),
+                'total': len(details),
+                'occupied': sum(details),
+                'free': len(details) - sum(details),
+                'details': details,
+                'parking_areas': areas
+            }, **section.extra))
+        return sections
+
+    @property
+    def spot_count(self):
+        """
+        int: The number of spots in the layout.
+        """
+        return len(self.spot_section)
+
+    def same_geometry(self, other):
+        """
+        Checks whether another layout has the same sections and polygons, ignoring occupancy.
+
+        Parameters:
+        other (CameraLayout): The layout to compare with.
+
+        Returns:
+        bool: True if both layouts describe the same sections and spots.
+        """
+        return ([section.id for section in self.sections] == [section.id for section in other.sections]
+                and np.array_equal(self.section_offsets, other.section_offsets)
+                and np.array_equal(self.section_vertices, other.section_vertices)
+                and np.array_equal(self.offsets, other.offsets)
+                and np.array_equal(self.vertices, other.vertices))
+
+    def __eq__(self, other):
+        if not isinstance(other, CameraLayout):
+            return NotImplemented
+        return (self.same_geometry(other) and np.array_equal(self.occupied, other.occupied)
+                and [section.extra for section in self.sections] == [section.extra for section in other.sections]
+                and (self.area_extras or None) == (other.area_extras or None))
+
+    def geometry_key(self):
+        """
+        Builds a hashable key identifying the geometry of the layout, used to detect layout changes.
+
+        Returns:
+        tuple: The section IDs and the raw bytes of the geometry arrays.
+        """
+        return (tuple(section.id for section in self.sections), self.section_offsets.tobytes(), self.section_vertices.tobytes(),
+                self.offsets.tobytes(), self.vertices.tobytes())
+
+    def pixel_geometry(self, frame_size):
+        """
+        Returns the geometry scaled to pixel coordinates of a frame size, computed once per frame size.
+
+        Parameters:
+        frame_size (tuple): The (width, height) of the frames being processed.
+
+        Returns:
+        tuple: int32 section polygons, int32 spot polygons (lists of (K, 2) arrays), and the int (N, 4)
+               (x1, y1, x2, y2) bounding boxes of the spot polygons.
+        """
+        frame_size = tuple(frame_size)
+        pixels = self._pixels.get(frame_size)
+        if pixels is None:
+            scale = np.array(frame_size, dtype=np.float64)
+            section_vertices = np.rint(self.section_vertices * scale).astype(np.int32)
+            vertices = np.rint(self.vertices * scale).astype(np.int32)
+            if self.spot_count:
+                starts = self.offsets[:-1]
+                boxes = np.column_stack([np.minimum.reduceat(vertices, starts), np.maximum.reduceat(vertices, starts)])
+            else:
+                boxes = np.zeros((0, 4), dtype=np.int32)
+            pixels = (_unpack(section_vertices, self.section_offsets), _unpack(vertices, self.offsets), boxes)
+            self._pixels[frame_size] = pixels
+        return pixels
+
+    def scaled_sections(self, frame_size):
+        """
+        Converts the layout to sections with pixel coordinates, as used for drawing.
+
+        Parameters:
+        frame_size (tuple): The (width, height) of the frames being processed.
+
+        Returns:
+        list: Sections with 'id', 'coordinates' and 'parking_areas' in pixel coordinates.
+        """
+        section_polygons, spot_polygons, _ = self.pixel_geometry(frame_size)
+        return [{
+            'id': section.id,
+            'coordinates': section_polygons[section.index].tolist(),
+            'parking_areas': [{'coordinates': spot_polygons[spot].tolist()} for spot in range(section.spots.start, section.spots.stop)]
+        } for section in self.sections]
@@ -1,32 +1,59 @@
-import cv2
-import threading
-from module import camera_thread
+import startup
+
+with startup.phase("imports"):
+    import cv2
+    import signal
+    from stream import start_stream_server
+    from supervisor import FleetSupervisor
+    from profiler import enable_profiling
 
 def main():
     """
-    Main function to initialize the model, read class lists, set up video sources,
-    and create threads for processing each video source concurrently.
+    Main function to start the camera fleet: one pipeline per camera listed in the fleet configuration,
+    supervised so failed sources reconnect and changes to the configuration apply without a restart.
     """
     try:
-        # Define your video sources here. Replace with actual sources as needed.
-        camera_sources = ["parking.mp4"]  
-        # Example: ["0", "http://example.com/stream", "localvideo.mp4"]
-        
+        # Cameras are listed in JSON/fleet.json (or the file named by PARKING_FLEET_FILE). Each camera has an "id" and
+        # a "source" (a file path, a URL, or a webcam index), and can select its processing resolution, detector backend
+        # and how often the detector runs, e.g.
+        # {"id": 2, "source": "rtsp://...", "frame_size": [1280, 720], "detect_every": 3,
+        #  "detector": {"backend": "onnxruntime", "weights": "yolov8s.onnx", "input_size": 416, "quantized": True}}
+        # When the file changes (or on SIGHUP), added cameras are started, removed ones stopped and edited ones
+        # restarted; the other cameras keep running. Each camera's health is served at http://localhost:8080/health.
+
         # Flag to control whether to display the processed video frames.
         display = True
-        
-        # Container for threads.
-        threads = []
-        
-        # Create and start a thread for each video source.
-        for index, source in enumerate(camera_sources):
-            camera_id = index + 1
-            t = threading.Thread(target=camera_thread, args=(source, display, camera_id))
-            t.start()
-            threads.append(t)
-
-        for t in threads:
-            t.join()
+
+        # Frames per second processed across all cameras together, a fixed CPU budget that adding cameras does not raise;
+        # cameras with recent occupancy changes get a larger share, and no camera goes unprocessed for longer than
+        # max_staleness seconds while the budget allows it.
+        fps_budget = 2.0
+        max_staleness = 10.0
+
+        # Path of a detection trace to record every frame's raw detections to, or None (replay it with traces.py).
+        trace_file = None
+
+        # Flag to control whether annotated frames, health and scheduler stats are served over HTTP (see stream.py for
+        # the address, port and quality). The server listens on localhost only unless STREAM_HOST is changed.
+        stream = True
+        if stream:
+            try:
+                start_stream_server()
+            except OSError as e:
+                print(f"Failed to start the stream server, continuing without it: {e}")
+
+        # Sample the stacks of all threads for profile_duration seconds when PARKING_PROFILE is set or on SIGUSR1,
+        # writing flamegraph-compatible collapsed stacks per camera to profiles/ (see profiler.py).
+        profile_duration = 30.0
+        enable_profiling(profile_duration)
+
+        supervisor = FleetSupervisor(display=display, trace_path=trace_file, fps_budget=fps_budget, max_staleness=max_staleness)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: supervisor.request_reload())
+        supervisor.run()
+
+    except KeyboardInterrupt:
+        print("Stopping cameras")
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -2,25 +2,24 @@ import os
 import cv2
 import time
 import numpy as np
-import pandas as pd
-from ultralytics import YOLO
 from urllib.parse import urlparse
-from tkinter import Tk, simpledialog, messagebox as msgbox
+from startup import phase, report_once
+from detectors import load_detector
+from overlay import get_overlay
+from stream import get_broadcaster
+from traces import get_trace_writer, release_trace_writer
+from scheduler import get_scheduler
+from tracker import VehicleTracker
 from util import read_parking_areas, insert_parking_area, delete_parking_area, save_parking_occupancy, add_section, delete_section
-from utils import read_class_list
+from utils import read_class_list, scale_sections, normalize_points
+from layout import CameraLayout
 
 drawing = False  # Global variable to keep track of drawing state
 points = []  # Global list to keep track of points drawn on the frame
 mode = "spot"  # Default mode
 
-def initialize_yolo_model():
-    """
-    Initializes the YOLO model for object detection.
-
-    Returns:
-    YOLO: The initialized YOLO model.
-    """
-    return YOLO('yolov8s.pt')
+DEFAULT_FRAME_SIZE = (1020, 500)  # Default processing resolution (width, height); layouts scale to any size
+IOU_THRESHOLD = 0.25  # IoU above which a vehicle occupies a spot its center is not in
 
 def initialize_video_capture(source):
     """
@@ -50,19 +49,22 @@ def initialize_video_capture(source):
     
     return cap
 
-def make_draw_function(camera_id, root):
+def make_draw_function(camera_id, root, frame_size=DEFAULT_FRAME_SIZE):
     """
     Creates a drawing function for interactive annotation on the video frame.
+    Clicked points are in pixels of the displayed frame and are stored normalized.
 
     Parameters:
     camera_id (int): The ID of the camera.
     root (Tk): The Tkinter root window for displaying dialogs.
+    frame_size (tuple): The (width, height) of the displayed frame.
 
     Returns:
     function: The drawing function to be used with OpenCV's setMouseCallback.
     """
     def draw(events, x, y, flags, param):
         global points, drawing, mode
+        from tkinter import simpledialog, messagebox as msgbox
         if events == cv2.EVENT_LBUTTONDOWN:
             if not drawing:
                 drawing = True
@@ -75,19 +77,19 @@ def make_draw_function(camera_id, root):
                     polygon = np.array(points, dtype=np.int32)
                     if mode == "section":
                         polygon = np.array(points, dtype=np.int32)
-                        if not check_overlap_with_existing_sections(polygon, camera_id):
+                        if not check_overlap_with_existing_sections(polygon, camera_id, frame_size):
                             section_id = simpledialog.askstring("Input", "Enter ID for the new section", parent=root)
                             if section_id:
                                 try:
-                                    add_section(points.copy(), section_id, camera_id)
+                                    add_section(normalize_points(points, frame_size), section_id, camera_id)
                                 except ValueError as e:
                                     msgbox.showerror("Error", str(e))
                         else:
                             msgbox.showerror("Error", "Section overlaps with an existing one.")
                     else:
-                        section_id = detect_section(polygon, camera_id)
-                        if section_id and is_mostly_inside_section(polygon, section_id, camera_id):
-                            insert_parking_area(points.copy(), section_id, camera_id)
+                        section_id = detect_section(polygon, camera_id, frame_size)
+                        if section_id and is_mostly_inside_section(polygon, section_id, camera_id, frame_size):
+                            insert_parking_area(normalize_points(points, frame_size), section_id, camera_id)
                         else:
                             msgbox.showerror("Error", "Parking area must be within a section and at least 80% inside its section.")
                     points = []
@@ -95,9 +97,9 @@ def make_draw_function(camera_id, root):
 
         elif events == cv2.EVENT_RBUTTONDOWN:
             if mode == "section":
-                delete_section_by_point(x, y, camera_id, root)
+                delete_section_by_point(x, y, camera_id, root, frame_size)
             else:
-                delete_parking_area_by_point(x, y, camera_id)
+                delete_parking_area_by_point(x, y, camera_id, frame_size)
 
         elif events == cv2.EVENT_MBUTTONDOWN:
             mode = "section" if mode == "spot" else "spot"
@@ -107,7 +109,7 @@ def make_draw_function(camera_id, root):
 
     return draw
 
-def delete_parking_area_by_point(x, y, camera_id):
+def delete_parking_area_by_point(x, y, camera_id, frame_size=DEFAULT_FRAME_SIZE):
     """
     Deletes a parking area based on the point clicked by the user.
 
@@ -115,9 +117,10 @@ def delete_parking_area_by_point(x, y, camera_id):
     x (int): X-coordinate of the mouse click.
     y (int): Y-coordinate of the mouse click.
     camera_id (int): The ID of the camera.
+    frame_size (tuple): The (width, height) of the frame the coordinates refer to.
     """
     drawing = False
-    sections = read_parking_areas(camera_id)
+    sections = scale_sections(read_parking_areas(camera_id), frame_size)
     for section in sections:
         for i, area in enumerate(section['parking_areas']):
             if cv2.pointPolygonTest(np.array(area['coordinates'], dtype=np.int32), (x, y), False) >= 0:
@@ -126,7 +129,7 @@ def delete_parking_area_by_point(x, y, camera_id):
                 return
     print("No spot found at the clicked location.")
 
-def delete_section_by_point(x, y, camera_id, root):
+def delete_section_by_point(x, y, camera_id, root, frame_size=DEFAULT_FRAME_SIZE):
     """
     Deletes a section based on a point clicked by the user within that section's area.
 
@@ -135,8 +138,10 @@ def delete_section_by_point(x, y, camera_id, root):
     y (int): Y-coordinate of the mouse click.
     camera_id (int): The ID of the camera.
     root (Tk): The Tkinter root window for displaying dialogs.
+    frame_size (tuple): The (width, height) of the frame the coordinates refer to.
     """
-    sections = read_parking_areas(camera_id)
+    from tkinter import messagebox as msgbox
+    sections = scale_sections(read_parking_areas(camera_id), frame_size)
     for section in sections:
         section_polygon = np.array(section['coordinates'], dtype=np.int32)
         if cv2.pointPolygonTest(section_polygon, (x, y), False) >= 0:
@@ -148,18 +153,19 @@ def delete_section_by_point(x, y, camera_id, root):
                 return
     print("No section found at the clicked location.")
 
-def check_overlap_with_existing_sections(polygon, camera_id):
+def check_overlap_with_existing_sections(polygon, camera_id, frame_size=DEFAULT_FRAME_SIZE):
     """
     Checks if a given polygon overlaps with any existing sections.
 
     Parameters:
     polygon (list of tuples): The coordinates of the polygon to check.
     camera_id (int): The ID of the camera.
+    frame_size (tuple): The (width, height) of the frame the coordinates refer to.
 
     Returns:
     bool: True if the polygon overlaps with any existing sections, False otherwise.
     """
-    sections = read_parking_areas(camera_id)
+    sections = scale_sections(read_parking_areas(camera_id), frame_size)
     new_poly = np.array(polygon, dtype=np.int32)
     for section in sections:
         section_polygon = np.array(section['coordinates'], dtype=np.int32)
@@ -168,18 +174,19 @@ def check_overlap_with_existing_sections(polygon, camera_id):
             return True
     return False
 
-def detect_section(polygon, camera_id):
+def detect_section(polygon, camera_id, frame_size=DEFAULT_FRAME_SIZE):
     """
     Detects which section a given polygon belongs to based on its coordinates.
 
     Parameters:
     polygon (list of tuples): The coordinates of the polygon to check.
     camera_id (int): The ID of the camera.
+    frame_size (tuple): The (width, height) of the frame the coordinates refer to.
 
     Returns:
     str: The ID of the section if found, None otherwise.
     """
-    sections = read_parking_areas(camera_id)
+    sections = scale_sections(read_parking_areas(camera_id), frame_size)
     test_point = (int(polygon[0][0]), int(polygon[0][1]))
     for section in sections:
         section_polygon = np.array(section['coordinates'], dtype=np.int32).reshape((-1, 1, 2))
@@ -187,7 +194,7 @@ def detect_section(polygon, camera_id):
             return section['id']
     return None
 
-def is_mostly_inside_section(polygon, section_id, camera_id):
+def is_mostly_inside_section(polygon, section_id, camera_id, frame_size=DEFAULT_FRAME_SIZE):
     """
     Checks if a given polygon is mostly inside a specified section.
 
@@ -195,11 +202,12 @@ def is_mostly_inside_section(polygon, section_id, camera_id):
     polygon (list of tuples): The coordinates of the polygon to check.
     section_id (str): The ID of the section.
     camera_id (int): The ID of the camera.
+    frame_size (tuple): The (width, height) of the frame the coordinates refer to.
 
     Returns:
     bool: True if the polygon is at least 80% inside the section, False otherwise.
     """
-    sections = read_parking_areas(camera_id)
+    sections = scale_sections(read_parking_areas(camera_id), frame_size)
     new_poly = np.array(polygon, dtype=np.int32)
     for section in sections:
         if section['id'] == section_id:
@@ -251,128 +259,136 @@ def convert_polygon_to_bbox(polygon):
     ys = [point[1] for point in polygon]
     return min(xs), min(ys), max(xs), max(ys)
 
-def process_frame(frame, sections, class_list, model):
+def vehicle_class_ids(class_list):
+    """
+    Returns the class indices that count as vehicles (cars and trucks).
+
+    Parameters:
+    class_list (list of str): The list of class names the model can detect.
+
+    Returns:
+    list: The indices of the vehicle classes.
+    """
+    return [index for index, name in enumerate(class_list) if 'car' in name or 'truck' in name]
+
+def match_vehicles(layout, detections, class_list, frame_size, iou_threshold=IOU_THRESHOLD):
+    """
+    Matches detected vehicles to the spots of a layout. A spot is occupied by the first vehicle whose center lies
+    inside it or, failing that, whose box overlaps the spot's bounding box with an IoU above the threshold. All spots
+    are matched against all vehicles with array operations; the polygon test only runs where a center falls inside a
+    spot's bounding box. Needs no frame, so recorded detections can be re-matched without a model.
+
+    Parameters:
+    layout (CameraLayout): The compiled layout of the camera.
+    detections (Detections): The detections of one frame.
+    class_list (list of str): The list of class names the model can detect.
+    frame_size (tuple): The (width, height) of the frame the detections were made on.
+    iou_threshold (float): The IoU above which a vehicle occupies a spot its center is not in.
+
+    Returns:
+    tuple: The int (M, 4) vehicle boxes, int (M, 2) vehicle centers, and bool (N, M) arrays of spot/vehicle
+           matches and of which matches are by center point.
+    """
+    vehicles = np.flatnonzero(np.isin(detections.classes, vehicle_class_ids(class_list)))
+    vehicle_boxes = detections.boxes[vehicles].astype(int)
+    centers = (vehicle_boxes[:, :2] + vehicle_boxes[:, 2:]) // 2
+    _, spot_polygons, spot_boxes = layout.pixel_geometry(frame_size)
+    if not len(vehicle_boxes) or not layout.spot_count:
+        empty = np.zeros((layout.spot_count, len(vehicle_boxes)), dtype=bool)
+        return vehicle_boxes, centers, empty, empty
+
+    # Spots along the first axis, vehicles along the second
+    spots, cars = spot_boxes[:, None, :], vehicle_boxes[None, :, :]
+    width = np.minimum(spots[..., 2], cars[..., 2]) - np.maximum(spots[..., 0], cars[..., 0])
+    height = np.minimum(spots[..., 3], cars[..., 3]) - np.maximum(spots[..., 1], cars[..., 1])
+    intersection = np.where((width >= 0) & (height >= 0), width * height, 0)
+    spot_areas = (spot_boxes[:, 2] - spot_boxes[:, 0]) * (spot_boxes[:, 3] - spot_boxes[:, 1])
+    car_areas = (vehicle_boxes[:, 2] - vehicle_boxes[:, 0]) * (vehicle_boxes[:, 3] - vehicle_boxes[:, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overlap = intersection / (spot_areas[:, None] + car_areas[None, :] - intersection)
+
+    inside = np.zeros(intersection.shape, dtype=bool)
+    candidates = ((centers[None, :, 0] >= spot_boxes[:, None, 0]) & (centers[None, :, 0] <= spot_boxes[:, None, 2]) &
+                  (centers[None, :, 1] >= spot_boxes[:, None, 1]) & (centers[None, :, 1] <= spot_boxes[:, None, 3]))
+    for spot, car in zip(*np.nonzero(candidates)):
+        inside[spot, car] = cv2.pointPolygonTest(spot_polygons[spot], (int(centers[car, 0]), int(centers[car, 1])), False) >= 0
+
+    return vehicle_boxes, centers, inside | (overlap > iou_threshold), inside
+
+def process_frame(frame, layout, class_list, detector, draw=True, iou_threshold=IOU_THRESHOLD, detections=None, labels=None):
     """
     Processes each frame of the video to detect objects and determine their presence in predefined areas
-    within sections. Utilizes both center point and IoU methods sequentially.
+    within sections. Utilizes both center point and IoU methods (see match_vehicles).
 
     Parameters:
     frame (numpy.ndarray): The current video frame.
-    sections (list of dicts): Each dict represents a section containing multiple parking areas.
+    layout (CameraLayout): The compiled layout of the camera; its occupancy is updated.
     class_list (list of str): The list of class names the model can detect.
-    model (YOLO): The YOLO model instance used for detection.
+    detector (Detector): The detector used to find vehicles in the frame.
+    draw (bool): Whether to draw the matched detections onto the frame (disabled for headless batch runs).
+    iou_threshold (float): The IoU above which a vehicle occupies a spot its center is not in.
+    detections (Detections, optional): Detections already made (or tracked) for this frame; the detector is not called.
+    labels (list of str, optional): A label per detection, drawn above the vehicles that occupy a spot.
 
     Returns:
-    tuple: Processed frame, updated sections with occupancy details.
+    tuple: Processed frame, and the layout with updated occupancy.
     """
-    results = model.predict(frame, verbose=False)
-    detections = pd.DataFrame(results[0].boxes.data).astype("float")
+    if detections is None:
+        detections = detector.detect(frame)
+    vehicle_boxes, centers, matches, inside = match_vehicles(layout, detections, class_list, (frame.shape[1], frame.shape[0]), iou_threshold)
+    occupied = matches.any(axis=1)
+    layout.occupied = occupied
+
+    if draw:
+        for spot in np.flatnonzero(occupied):
+            car = int(matches[spot].argmax())  # The first matching vehicle, as in a sequential scan
+            x1, y1, x2, y2 = vehicle_boxes[car].tolist()
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            if inside[spot, car]:
+                cv2.circle(frame, (int(centers[car, 0]), int(centers[car, 1])), 3, (0, 0, 255), -1)
+            if labels is not None:
+                vehicles = np.flatnonzero(np.isin(detections.classes, vehicle_class_ids(class_list)))
+                cv2.putText(frame, labels[vehicles[car]], (x1, max(y1 - 4, 10)), cv2.FONT_HERSHEY_PLAIN, 1, (0, 255, 0), 1)
+
+    return frame, layout
+
+def annotate_frame(frame, layout, camera_id):
+    """
+    Draws parking space occupancy onto the video frame with labels at the bottom (or top) of each section and parking area.
 
-    for section in sections:
-        section['total'] = len(section['parking_areas'])
-        section['occupied'] = 0
-        section['free'] = section['total']
-        section['details'] = [0] * section['total']
+    Parameters:
+    frame (numpy.ndarray): The current video frame, annotated in place.
+    layout (CameraLayout): The compiled layout of the camera with its current occupancy.
+    camera_id (int): The identifier for the camera.
+    """
+    # Static outlines and labels are rendered once per layout; only the spot colors change per frame
+    get_overlay(camera_id, layout, frame.shape).apply(frame, layout.occupied)
+    free_spaces = layout.spot_count - int(np.count_nonzero(layout.occupied))
 
-        for i, area in enumerate(section['parking_areas']):
-            area['occupied'] = False
-            polygon = np.array(area['coordinates'], dtype=np.int32)
-
-            for _, row in detections.iterrows():
-                x1, y1, x2, y2, _, class_id = row.astype(int)
-                class_name = class_list[class_id]
-                if 'car' in class_name or 'truck' in class_name:
-                    car_bbox = (x1, y1, x2, y2)
-                    car_center = ((x1 + x2) // 2, (y1 + y2) // 2)
-
-                    # Check if the car center is inside the parking area polygon
-                    if cv2.pointPolygonTest(polygon, car_center, False) >= 0:
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        cv2.circle(frame, car_center, 3, (0, 0, 255), -1)
-                        area['occupied'] = True
-                        section['details'][i] = 1
-                        section['occupied'] += 1
-                        section['free'] -= 1
-                        break
-
-                    # If not found by center point, check by IoU
-                    if not area['occupied']:
-                        area_bbox = convert_polygon_to_bbox(area['coordinates'])
-                        if iou(car_bbox, area_bbox) > 0.25:
-                            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                            area['occupied'] = True
-                            section['details'][i] = 1
-                            section['occupied'] += 1
-                            section['free'] -= 1
-                            break
-
-    return frame, sections
-
-def display_parking_occupancy(frame, sections, camera_id, root):
+    # Display the total number of free spaces
+    cv2.putText(frame, f"Free spaces: {free_spaces}", (10, 30), cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+
+def display_parking_occupancy(frame, layout, camera_id, root):
     """
     Displays parking space occupancy on the video frame with labels at the bottom (or top) of each section and parking area.
 
     Parameters:
     frame (numpy.ndarray): The current video frame.
-    sections (list): List of sections including static and dynamic details.
+    layout (CameraLayout): The compiled layout of the camera with its current occupancy.
     camera_id (int): The identifier for the camera.
     root (Tk): The Tkinter root window for displaying dialogs.
     """
-    free_spaces = 0
-   
-    for section in sections:
-        section_polygon = np.array(section['coordinates'], np.int32)
-        cv2.polylines(frame, [section_polygon], True, (0, 165, 255), 3)  # Orange color for section boundary
-        
-        # Calculate position for section label
-        bottom_line = np.array(section['coordinates'][-2:])
-        bottom_center_x = int((bottom_line[0][0] + bottom_line[1][0]) / 2)
-        bottom_center_y = int(max(bottom_line[0][1], bottom_line[1][1]))
-        
-        section_text = f"{section['id']}"
-        (text_width, text_height), _ = cv2.getTextSize(section_text, cv2.FONT_HERSHEY_COMPLEX, 0.5, 1)
-        background_top_left = (bottom_center_x - text_width // 2 - 2, bottom_center_y - text_height - 2)
-        background_bottom_right = (bottom_center_x + text_width // 2 + 2, bottom_center_y + 2)
-        cv2.rectangle(frame, background_top_left, background_bottom_right, (0, 165, 255), -1)
-        
-        text_position = (bottom_center_x - text_width // 2, bottom_center_y - 2)
-        cv2.putText(frame, section_text, text_position, cv2.FONT_HERSHEY_COMPLEX, 0.5, (255, 255, 255), 1)
-
-        for area_index, area in enumerate(section['parking_areas']):
-            count = section['details'][area_index]
-            color = (0, 255, 0) if count == 0 else (0, 0, 255)  # Green if free, red if occupied
-
-            # Draw the polygon for each parking area
-            cv2.polylines(frame, [np.array(area['coordinates'], np.int32)], True, color, 2)
-
-            # Calculate label position for parking area
-            bottom_line = np.array(area['coordinates'][-2:])
-            bottom_center_x = int((bottom_line[0][0] + bottom_line[1][0]) / 2)
-            bottom_center_y = int(max(bottom_line[0][1], bottom_line[1][1]))
-            
-            text = f"{area_index+1}"
-            (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_COMPLEX, 0.5, 1)
-            background_top_left = (bottom_center_x - text_width // 2 - 2, bottom_center_y - text_height - 2)
-            background_bottom_right = (bottom_center_x + text_width // 2 + 2, bottom_center_y + 2)
-            cv2.rectangle(frame, background_top_left, background_bottom_right, color, -1)
-            
-            text_position = (bottom_center_x - text_width // 2, bottom_center_y - 2)
-            cv2.putText(frame, text, text_position, cv2.FONT_HERSHEY_COMPLEX, 0.5, (255, 255, 255), 1)
-
-            free_spaces += 1 if count == 0 else 0
-
-    # Display the total number of free spaces
-    cv2.putText(frame, f"Free spaces: {free_spaces}", (10, 30), cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+    annotate_frame(frame, layout, camera_id)
     
     # Show the frame with the occupancy information
     cv2.imshow(f"Camera {camera_id} - Parking Occupancy", frame)
     cv2.waitKey(1)  # Adjust the wait key as necessary
 
     # Set up mouse callback for interactive drawing and editing
-    draw_function = make_draw_function(camera_id, root)
+    draw_function = make_draw_function(camera_id, root, (frame.shape[1], frame.shape[0]))
     cv2.setMouseCallback(f"Camera {camera_id} - Parking Occupancy", draw_function)
 
-def camera_thread(camera_source, display, camera_id):
+def camera_thread(camera_source, display, camera_id, detector_config=None, frame_size=DEFAULT_FRAME_SIZE, trace_path=None, scheduler=None, detect_every=1, stop_event=None, on_frame=None):
     """
     Handles video capture from a specified source, processes each frame to detect and display parking occupancy,
     and manages the drawing functionality based on user interaction.
@@ -380,36 +396,117 @@ def camera_thread(camera_source, display, camera_id):
     Parameters:
     camera_source (str or int): The source of the video. Can be a filepath, a URL, or an integer representing a webcam ID.
     display (bool): Flag to control whether to display the processed video frames.
+                    Annotated frames are also published to MJPEG viewers (see stream.py) while any are connected.
     camera_id (int): An identifier for the camera source, used for window naming and storage purposes.
+    detector_config (dict, optional): The detector backend and its options for this camera (see detectors.create_detector).
+                                      Defaults to the ultralytics backend with yolov8s.pt.
+    frame_size (tuple): The (width, height) frames are resized to for processing. Layouts are stored normalized,
+                        so this can be tuned per camera without redrawing them.
+    trace_path (str, optional): A detection trace file to append every frame's raw detections to (see traces.py),
+                                so matching can later be replayed without the model.
+    scheduler (InferenceScheduler, optional): Decides when the camera may process its next frame. Defaults to the
+                                              scheduler shared by all cameras of the process (see scheduler.py).
+    detect_every (int): Run the detector on every Nth frame only. Vehicles are tracked (see tracker.py) and their
+                        boxes predicted on the frames in between, so occupancy is still updated every frame. Only
+                        detector runs count against the scheduler's budget; tracked frames are paced to the source's
+                        frame rate, so video files do not play at full decoding speed. Must be at least 1.
+    stop_event (threading.Event, optional): Ends the loop after the current frame once set (see supervisor.py).
+    on_frame (callable, optional): Called after each processed frame, e.g. to track the camera's health.
+
+    Raises:
+    ValueError: If detect_every is less than 1.
     """
-    model = initialize_yolo_model()
-    class_list = read_class_list()
-    cap = initialize_video_capture(camera_source)
+    if int(detect_every) != detect_every or detect_every < 1:
+        raise ValueError(f"detect_every must be a whole number of at least 1, got {detect_every!r}")
+    scheduler = scheduler or get_scheduler()
+    detector = load_detector(detector_config, camera_id, frame_size)
+    with phase("class list"):
+        class_list = read_class_list()
+    with phase("video capture"):
+        cap = initialize_video_capture(camera_source)
     window_name = f"Camera {camera_id} - Parking Occupancy"
-    root = Tk()  # Create a Tkinter root instance once for the application
-    root.withdraw()  # Hide the main window
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        time.sleep(0.5)  # Control frame rate for processing by adding a slight delay
-        frame = cv2.resize(frame, (1020, 500))  # Resize frame for processing
-
-        sections = read_parking_areas(camera_id)  # Read the current state of sections
-        processed_frame, updated_sections = process_frame(frame, sections, class_list, model)  # Process each frame
-
-        # Save occupancy updates immediately after processing
-        save_parking_occupancy(camera_id, updated_sections)
-
+    root = None
+    trace = get_trace_writer(trace_path) if trace_path else None
+    try:
         if display:
-            display_parking_occupancy(processed_frame, updated_sections, camera_id, root)
-
-        key = cv2.waitKey(1)
-        if key & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyWindow(window_name)  # Close only the window associated with this thread
-    root.destroy()  # Properly destroy the root window when done
+            with phase("tkinter"):
+                from tkinter import Tk
+                root = Tk()  # Create a Tkinter root instance once for the application
+                root.withdraw()  # Hide the main window
+        broadcaster = get_broadcaster(camera_id)
+        first_frame = True
+        frame_index = -1
+        previous_occupancy = None
+        tracker = VehicleTracker(vehicle_class_ids(class_list))
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / source_fps if source_fps > 0 else 0.0  # Pacing of tracked frames; 0 if the source reports no rate
+        next_frame = time.monotonic()
+        scheduler.register(camera_id)
+
+        while cap.isOpened() and not (stop_event is not None and stop_event.is_set()):
+            detect = (frame_index + 1) % detect_every == 0
+            if detect:
+                scheduler.acquire(camera_id)  # Wait for this camera's share of the inference budget
+            elif next_frame > time.monotonic():
+                if stop_event is not None:
+                    stop_event.wait(next_frame - time.monotonic())
+                else:
+                    time.sleep(max(next_frame - time.monotonic(), 0))
+            ret, frame = cap.read()
+            if not ret:
+                break
+            next_frame = time.monotonic() + frame_interval
+            frame_index += 1
+            frame = cv2.resize(frame, tuple(frame_size))  # Resize frame for processing
+
+            layout = CameraLayout.from_json(read_parking_areas(camera_id))  # Read the current state of sections
+            stream = broadcaster.wants_frame()  # Skip drawing and encoding entirely when nobody is watching the stream
+            now = time.monotonic()
+            if detect:
+                detections = detector.detect(frame)
+                if trace is not None:
+                    trace.write(camera_id, frame_index, time.time(), frame_size, detections)
+                detections, track_ids = tracker.update(detections, frame_index, now)
+            else:
+                detections, track_ids = tracker.predict(frame_index)  # Move the tracked vehicles instead of running the model
+            draw = display or stream
+            labels = None
+            if draw:
+                dwell = tracker.dwell_times(now)
+                labels = [f"#{track_id} {dwell[track_id]:.0f}s" for track_id in track_ids.tolist()]
+            processed_frame, layout = process_frame(frame, layout, class_list, detector, draw=draw, detections=detections, labels=labels)  # Process each frame
+
+            # Save occupancy updates immediately after processing
+            save_parking_occupancy(camera_id, layout)
+            scheduler.report(camera_id, previous_occupancy is not None and not np.array_equal(previous_occupancy, layout.occupied))
+            previous_occupancy = layout.occupied
+
+            if display:
+                display_parking_occupancy(processed_frame, layout, camera_id, root)
+            elif stream:
+                annotate_frame(processed_frame, layout, camera_id)
+            if stream:
+                broadcaster.publish(processed_frame)
+
+            if on_frame is not None:
+                on_frame()
+
+            if first_frame:
+                first_frame = False
+                report_once()
+
+            if display:
+                key = cv2.waitKey(1)
+                if key & 0xFF == ord('q'):
+                    if stop_event is not None:
+                        stop_event.set()  # A user quit stops a supervised camera instead of counting as a dropout
+                    break
+    finally:
+        # Release the capture and the window even if the source or a detector failed, so a restart starts clean
+        cap.release()
+        scheduler.unregister(camera_id)
+        if trace is not None:
+            release_trace_writer(trace_path)  # Closes the file once no camera records to it any more
+        if root is not None:
+            cv2.destroyWindow(window_name)  # Close only the window associated with this thread
+            root.destroy()  # Properly destroy the root window when done
@@ -0,0 +1,155 @@
+import cv2
+import threading
+import numpy as np
+
+SECTION_COLOR = (0, 165, 255)  # Orange
+TEXT_COLOR = (255, 255, 255)  # White
+FREE_COLOR = (0, 255, 0)  # Green
+OCCUPIED_COLOR = (0, 0, 255)  # Red
+LABEL_FONT = cv2.FONT_HERSHEY_COMPLEX
+
+# Values of the pixel map: nothing drawn, section color, then one value per spot starting at FIRST_SPOT.
+# Label text is kept separately as anti-aliased coverage blended over these colors.
+EMPTY, SECTION, FIRST_SPOT = 0, 1, 2
+_DRAWING = -1  # Temporary value used to find the pixels a shape covers
+
+_overlays = {}  # Cached overlays by camera ID
+_overlays_lock = threading.Lock()
+
+def label_geometry(coordinates, text):
+    """
+    Computes where the label of a polygon goes: centered on the bottom edge formed by its last two points.
+
+    Parameters:
+    coordinates (list): The pixel coordinates of the polygon.
+    text (str): The label text.
+
+    Returns:
+    tuple: The top-left and bottom-right corners of the label background, and the text origin.
+    """
+    bottom_line = np.array(coordinates[-2:])
+    bottom_center_x = int((bottom_line[0][0] + bottom_line[1][0]) / 2)
+    bottom_center_y = int(max(bottom_line[0][1], bottom_line[1][1]))
+    (text_width, text_height), _ = cv2.getTextSize(text, LABEL_FONT, 0.5, 1)
+    background_top_left = (bottom_center_x - text_width // 2 - 2, bottom_center_y - text_height - 2)
+    background_bottom_right = (bottom_center_x + text_width // 2 + 2, bottom_center_y + 2)
+    text_position = (bottom_center_x - text_width // 2, bottom_center_y - 2)
+    return background_top_left, background_bottom_right, text_position
+
+def _region(points, margin, shape):
+    """
+    Returns the slices of the bounding box of some points, grown by a margin and clipped to an image.
+    """
+    points = np.asarray(points).reshape(-1, 2)
+    left, top = np.maximum(points.min(axis=0) - margin, 0)
+    right, bottom = points.max(axis=0) + margin + 1
+    return slice(int(top), int(min(bottom, shape[0]))), slice(int(left), int(min(right, shape[1])))
+
+class OccupancyOverlay:
+    """
+    The section outlines, spot outlines and labels of one camera layout, rendered once into a cached layer
+    and mask. Per frame only the pixels of spots whose occupancy changed are recolored in the layer, and
+    the layer is composited onto the frame with a single masked copy.
+
+    Attributes:
+    key (tuple): The geometry key of the layout the overlay was rendered for.
+    frame_shape (tuple): The shape of the frames the overlay applies to.
+    spot_count (int): The number of spots in the layout.
+    """
+    def __init__(self, sections, frame_shape, key=None):
+        self.key = key
+        self.frame_shape = frame_shape
+        height, width = frame_shape[:2]
+        pixel_map = np.zeros((height, width), dtype=np.int32)
+        text_alpha = np.zeros((height, width), dtype=np.uint8)  # Anti-aliased text coverage over the pixel below
+
+        def draw(region, shape, value):
+            # Draw with a marker value so the covered pixels (and only those) take the shape's value
+            shape(pixel_map, _DRAWING)
+            covered = pixel_map[region] == _DRAWING
+            pixel_map[region][covered] = value
+            text_alpha[region][covered] = 0
+
+        def put_text(text, position):
+            # putText only draws on 8-bit images, and its edges blend with whatever is below
+            (text_width, text_height), baseline = cv2.getTextSize(text, LABEL_FONT, 0.5, 1)
+            region = _region([position, (position[0] + text_width, position[1] - text_height), (position[0], position[1] + baseline)], 2, frame_shape)
+            scratch = np.zeros((region[0].stop - region[0].start, region[1].stop - region[1].start), dtype=np.uint8)
+            cv2.putText(scratch, text, (position[0] - region[1].start, position[1] - region[0].start), LABEL_FONT, 0.5, 255, 1)
+            np.maximum(text_alpha[region], scratch, out=text_alpha[region])
+
+        def outline(points, value, thickness):
+            polygon = np.array(points, np.int32)
+            draw(_region(polygon, thickness, frame_shape), lambda image, v: cv2.polylines(image, [polygon], True, v, thickness), value)
+
+        def label(points, text, value):
+            top_left, bottom_right, text_position = label_geometry(points, text)
+            draw(_region([top_left, bottom_right], 1, frame_shape), lambda image, v: cv2.rectangle(image, top_left, bottom_right, v, -1), value)
+            put_text(text, text_position)
+
+        # Same drawing order as drawing directly on the frame, so later shapes cover earlier ones
+        spot = FIRST_SPOT
+        for section in sections:
+            outline(section['coordinates'], SECTION, 3)
+            label(section['coordinates'], f"{section['id']}", SECTION)
+            for area_index, area in enumerate(section['parking_areas']):
+                outline(area['coordinates'], spot, 2)
+                label(area['coordinates'], f"{area_index+1}", spot)
+                spot += 1
+        self.spot_count = spot - FIRST_SPOT
+
+        self.mask = (pixel_map != EMPTY).astype(np.uint8)  # Labels always sit on their background, so text needs no extra mask
+        self.layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self._text_alpha = text_alpha.ravel().astype(np.uint16)
+        flat_map = pixel_map.ravel()
+        self._spot_pixels = []  # Flat pixel indices of each spot's outline and label
+        order = np.argsort(flat_map, kind='stable')
+        bounds = np.searchsorted(flat_map[order], np.arange(FIRST_SPOT, FIRST_SPOT + self.spot_count + 1))
+        for spot in range(self.spot_count):
+            self._spot_pixels.append(order[bounds[spot]:bounds[spot + 1]])
+        self._fill(np.flatnonzero(flat_map == SECTION), SECTION_COLOR)
+        self._occupied = None
+
+    def _fill(self, pixels, colors):
+        """
+        Writes base colors into the layer and blends the labels' anti-aliased text over them.
+        """
+        colors = np.asarray(colors, dtype=np.uint16)
+        alpha = self._text_alpha[pixels][:, None]
+        white = np.asarray(TEXT_COLOR, dtype=np.uint16)
+        self.layer.reshape(-1, 3)[pixels] = (colors * (255 - alpha) + white * alpha + 127) // 255
+
+    def apply(self, frame, occupancy):
+        """
+        Composites the overlay onto a frame in place, coloring each spot by its occupancy.
+
+        Parameters:
+        frame (numpy.ndarray): The BGR frame to annotate.
+        occupancy (list or numpy.ndarray): One value per spot in layout order; non-zero means occupied.
+        """
+        occupied = np.asarray(occupancy, dtype=bool)
+        changed = np.arange(self.spot_count) if self._occupied is None else np.flatnonzero(occupied != self._occupied)
+        for spot in changed:
+            self._fill(self._spot_pixels[spot], OCCUPIED_COLOR if occupied[spot] else FREE_COLOR)
+        self._occupied = occupied
+        cv2.copyTo(self.layer, self.mask, frame)
+
+def get_overlay(camera_id, layout, frame_shape):
+    """
+    Returns the cached overlay of a camera, re-rendering it only when the layout or frame size changed.
+
+    Parameters:
+    camera_id (int): The ID of the camera.
+    layout (CameraLayout): The compiled layout of the camera.
+    frame_shape (tuple): The shape of the frames to annotate.
+
+    Returns:
+    OccupancyOverlay: The overlay for the current layout.
+    """
+    key = layout.geometry_key()
+    with _overlays_lock:
+        overlay = _overlays.get(camera_id)
+        if overlay is None or overlay.key != key or overlay.frame_shape != frame_shape:
+            overlay = OccupancyOverlay(layout.scaled_sections((frame_shape[1], frame_shape[0])), frame_shape, key)
+            _overlays[camera_id] = overlay
+    return overlay
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import signal
+import threading
+from collections import Counter
+
+PROFILE_ENV = 'PARKING_PROFILE'  # Set to 'on' (default window) or a number of seconds to profile from startup
+PROFILE_INTERVAL = 0.01  # Seconds between stack samples (100 Hz)
+PROFILE_DURATION = 30.0  # Seconds a profiling window lasts
+# Directory the collapsed stacks are written to, independent of the working directory (like utils.JSON_DIRECTORY)
+PROFILE_DIRECTORY = os.path.normpath(os.environ.get('PARKING_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'profiles')))
+
+_profiler = None  # The window currently being recorded, if any
+_profiler_lock = threading.Lock()
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the process's threads from a background thread at a fixed interval and counts
+    identical stacks per thread. Sampling only reads the current frames, so the profiled threads run
+    unchanged; the cost is one stack walk per thread per sample. At the end of the window the counts are
+    written in the collapsed format read by flamegraph.pl, speedscope and similar tools, one file per
+    thread (e.g. camera-1.folded, which includes the sends to the backend made by that camera).
+
+    Attributes:
+    interval (float): Seconds between samples.
+    duration (float): Seconds to sample for.
+    directory (str): The directory the stacks are written to.
+    samples (dict): A Counter of collapsed stacks per thread name.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL, duration=PROFILE_DURATION, directory=PROFILE_DIRECTORY):
+        self.interval = interval
+        self.duration = duration
+        self.directory = directory
+        self.samples = {}
+        self.started = None
+        self._labels = {}  # Frame labels by code object, so each function is formatted once
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self):
+        """
+        Records the current stack of every thread except the profiler's own.
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            name = names.get(ident, f'thread-{ident}')
+            self.samples.setdefault(name, Counter())[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        self.started = time.time()
+        deadline = time.monotonic() + self.duration
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_sample += self.interval
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            self._stop.wait(max(next_sample - now, 0))
+        self.write()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """
+        Ends the window early; the stacks sampled so far are written.
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def write(self):
+        """
+        Writes the collapsed stacks of each thread to '<directory>/<start time>/<thread name>.folded'.
+
+        Returns:
+        str: The directory of this window's files.
+        """
+        path = os.path.join(self.directory, time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started)))
+        os.makedirs(path, exist_ok=True)
+        for name, stacks in self.samples.items():
+            safe_name = ''.join(char if char.isalnum() or char in '-_.' else '_' for char in name)
+            with open(os.path.join(path, f"{safe_name}.folded"), 'w') as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+        total = sum(sum(stacks.values()) for stacks in self.samples.values())
+        print(f"Profile written to {path} ({total} samples from {len(self.samples)} threads)")
+        return path
+
+def start_profiling(duration=PROFILE_DURATION, interval=PROFILE_INTERVAL, directory=PROFILE_DIRECTORY):
+    """
+    Starts a profiling window unless one is already running.
+
+    Parameters:
+    duration (float): Seconds to sample for.
+    interval (float): Seconds between samples.
+    directory (str): The directory the stacks are written to.
+
+    Returns:
+    SamplingProfiler: The new window, or None if a window is already running.
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler is not None and _profiler._thread.is_alive():
+            print("Profiling is already running")
+            return None
+        _profiler = SamplingProfiler(interval, duration, directory)
+        _profiler.start()
+    print(f"Profiling all threads for {duration:g} s")
+    return _profiler
+
+def enable_profiling(duration=PROFILE_DURATION, interval=PROFILE_INTERVAL, directory=PROFILE_DIRECTORY):
+    """
+    Sets up opt-in profiling for the process: a window starts at once if PARKING_PROFILE is 'on' or a number
+    of seconds, and each SIGUSR1 (kill -USR1 <pid>) starts another one. Must be called from the main thread.
+
+    Parameters:
+    duration (float): Seconds each window lasts, unless PARKING_PROFILE gives a number of seconds.
+    interval (float): Seconds between samples.
+    directory (str): The directory the stacks are written to.
+    """
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(
+            target=start_profiling, args=(duration, interval, directory), daemon=True).start())
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if not value or value == 'off':
+        return
+    if value == 'on':
+        seconds = duration
+    else:
+        try:
+            seconds = float(value)
+        except ValueError:
+            print(f"Ignoring {PROFILE_ENV}={value!r}: expected 'on' or a number of seconds")
+            return
+    if seconds > 0:
+        start_profiling(seconds, interval, directory)
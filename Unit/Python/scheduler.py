@@ -0,0 +1,188 @@
+import time
+import threading
+
+FPS_BUDGET = 2.0  # Frames per second processed across all cameras together (the former 0.5 s delay of a single camera)
+MAX_STALENESS = 10.0  # Seconds after which an idle camera is processed ahead of busier ones
+ACTIVITY_WEIGHT = 4.0  # Extra share of the budget per recent occupancy change
+ACTIVITY_HALF_LIFE = 60.0  # Seconds for the effect of an occupancy change to halve
+RATE_HALF_LIFE = 10.0  # Seconds over which the reported rates and delays are averaged
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+class CameraSchedule:
+    """
+    The scheduling state of one camera.
+
+    Attributes:
+    last_grant (float): When the camera was last allowed to process a frame (monotonic seconds).
+    waiting_since (float): When the camera started waiting for its turn, or None if it is not waiting.
+    activity (float): Exponentially decaying count of recent frames with occupancy changes.
+    rate (float): Averaged frames per second granted to the camera.
+    queue_delay (float): Averaged seconds the camera waited for its turn.
+    """
+    __slots__ = ('registered', 'last_grant', 'waiting_since', 'activity', 'activity_time', 'rate', 'queue_delay')
+
+    def __init__(self, now):
+        self.registered = now
+        self.last_grant = now
+        self.waiting_since = None
+        self.activity = 0.0
+        self.activity_time = now
+        self.rate = 0.0
+        self.queue_delay = 0.0
+
+    def decayed_activity(self, now):
+        return self.activity * 0.5 ** ((now - self.activity_time) / ACTIVITY_HALF_LIFE)
+
+    def averaged(self, value):
+        # The averages start at zero; scale them up by the weight they have accumulated so far
+        coverage = 1.0 - 0.5 ** ((self.last_grant - self.registered) / RATE_HALF_LIFE)
+        return value / coverage if coverage > 0 else 0.0
+
+class InferenceScheduler:
+    """
+    Shares a global frames-per-second budget between camera threads. Frames are granted one at a time,
+    spaced to stay within the budget. A waiting camera that has not been processed for max_staleness seconds
+    goes first; otherwise the camera with the highest activity-weighted wait goes first, so cameras with
+    recent occupancy changes get a larger share and quiet cameras still progress.
+
+    Attributes:
+    fps_budget (float): The total frames per second across all cameras.
+    max_staleness (float): The longest an idle camera should go without being processed, budget permitting.
+    """
+    def __init__(self, fps_budget=FPS_BUDGET, max_staleness=MAX_STALENESS):
+        self.fps_budget = fps_budget
+        self.max_staleness = max_staleness
+        self._condition = threading.Condition()
+        self._cameras = {}
+        self._next_slot = 0.0
+
+    def register(self, camera_id):
+        """
+        Adds a camera to the schedule. Cameras are also registered on their first acquire.
+
+        Parameters:
+        camera_id (int): The ID of the camera.
+        """
+        with self._condition:
+            if camera_id not in self._cameras:
+                self._cameras[camera_id] = CameraSchedule(time.monotonic())
+
+    def unregister(self, camera_id):
+        """
+        Removes a camera from the schedule, e.g. when its thread ends.
+
+        Parameters:
+        camera_id (int): The ID of the camera.
+        """
+        with self._condition:
+            self._cameras.pop(camera_id, None)
+            self._condition.notify_all()
+
+    def _priority(self, camera, now):
+        staleness = now - camera.last_grant
+        if staleness >= self.max_staleness:
+            return (1, staleness)  # Overdue cameras first, the most overdue first
+        return (0, (1.0 + ACTIVITY_WEIGHT * camera.decayed_activity(now)) * staleness)
+
+    def acquire(self, camera_id):
+        """
+        Blocks until the camera may process its next frame.
+
+        Parameters:
+        camera_id (int): The ID of the camera.
+
+        Returns:
+        float: The seconds the camera waited.
+        """
+        with self._condition:
+            if camera_id not in self._cameras:
+                self._cameras[camera_id] = CameraSchedule(time.monotonic())
+            camera = self._cameras[camera_id]
+            camera.waiting_since = time.monotonic()
+            self._condition.notify_all()
+            while True:
+                now = time.monotonic()
+                if now >= self._next_slot:
+                    waiting = [other for other in self._cameras.values() if other.waiting_since is not None]
+                    if max(waiting, key=lambda other: self._priority(other, now)) is camera:
+                        break
+                    timeout = 0.1  # Another camera goes first; re-check when it is granted or leaves
+                else:
+                    timeout = self._next_slot - now
+                self._condition.wait(timeout)
+
+            self._next_slot = max(self._next_slot, now) + 1.0 / self.fps_budget
+            delay = now - camera.waiting_since
+            interval = now - camera.last_grant
+            weight = 1.0 - 0.5 ** (interval / RATE_HALF_LIFE)  # Average over time rather than over frames
+            camera.rate += weight * ((1.0 / interval if interval > 0 else camera.rate) - camera.rate)
+            camera.queue_delay += weight * (delay - camera.queue_delay)
+            camera.last_grant = now
+            camera.waiting_since = None
+            self._condition.notify_all()
+            return delay
+
+    def report(self, camera_id, changed):
+        """
+        Reports the outcome of a processed frame, raising the camera's priority if its occupancy changed.
+
+        Parameters:
+        camera_id (int): The ID of the camera.
+        changed (bool): Whether any spot changed status in the frame.
+        """
+        if not changed:
+            return
+        with self._condition:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                now = time.monotonic()
+                camera.activity = camera.decayed_activity(now) + 1.0
+                camera.activity_time = now
+
+    def stats(self):
+        """
+        Returns the current scheduling state of every camera.
+
+        Returns:
+        dict: Per camera ID: effective rate (frames/s), queue delay (s), staleness (s) and activity.
+        """
+        with self._condition:
+            now = time.monotonic()
+            return {camera_id: {
+                'rate': round(camera.averaged(camera.rate), 3),
+                'queue_delay': round(camera.averaged(camera.queue_delay), 3),
+                'staleness': round(now - camera.last_grant, 3),
+                'activity': round(camera.decayed_activity(now), 3),
+            } for camera_id, camera in sorted(self._cameras.items())}
+
+def configure_scheduler(fps_budget=FPS_BUDGET, max_staleness=MAX_STALENESS):
+    """
+    Sets the budget of the shared scheduler, creating it if needed.
+
+    Parameters:
+    fps_budget (float): The total frames per second across all cameras.
+    max_staleness (float): The longest an idle camera should go without being processed.
+
+    Returns:
+    InferenceScheduler: The shared scheduler.
+    """
+    scheduler = get_scheduler()
+    with scheduler._condition:
+        scheduler.fps_budget = fps_budget
+        scheduler.max_staleness = max_staleness
+    return scheduler
+
+def get_scheduler():
+    """
+    Returns the scheduler shared by all camera threads of the process, creating it on first use.
+
+    Returns:
+    InferenceScheduler: The shared scheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler()
+        return _scheduler
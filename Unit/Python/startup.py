@@ -0,0 +1,50 @@
+import time
+import threading
+from contextlib import contextmanager
+
+_process_start = time.perf_counter()  # Import this module first so the report covers the whole startup
+_phases = []
+_lock = threading.Lock()
+_reported = False
+
+@contextmanager
+def phase(name):
+    """
+    Times a startup phase and records it for the startup report.
+
+    Parameters:
+    name (str): The name of the phase (e.g., 'model load').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases.append((name, threading.current_thread().name, time.perf_counter() - start))
+
+def startup_report():
+    """
+    Builds a breakdown of the recorded startup phases.
+
+    Returns:
+    str: One line per phase with its thread and duration, followed by the elapsed time since the process started.
+    """
+    with _lock:
+        phases = list(_phases)
+    lines = ["Startup time by phase:"]
+    for name, thread_name, seconds in phases:
+        lines.append(f"  {name:<20} {thread_name:<20} {seconds * 1000:9.1f} ms")
+    lines.append(f"  {'total (wall clock)':<41} {(time.perf_counter() - _process_start) * 1000:9.1f} ms")
+    return "\n".join(lines)
+
+def report_once():
+    """
+    Prints the startup report the first time it is called; later calls do nothing.
+    Camera threads call this once their first frame is processed.
+    """
+    global _reported
+    with _lock:
+        if _reported:
+            return
+        _reported = True
+    print(startup_report())
@@ -0,0 +1,179 @@
+import re
+import json
+import cv2
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from scheduler import get_scheduler
+
+STREAM_HOST = '127.0.0.1'  # Interface the MJPEG server listens on; it has no authentication, so only bind others deliberately
+STREAM_PORT = 8080  # Port the MJPEG server listens on
+JPEG_QUALITY = 80  # JPEG quality of streamed frames (0-100)
+MAX_STREAM_FPS = 5.0  # Maximum rate at which frames are encoded per camera
+BOUNDARY = 'frame'
+
+_broadcasters = {}  # Broadcasters by camera ID
+_broadcasters_lock = threading.Lock()
+
+class FrameBroadcaster:
+    """
+    Shares the latest annotated frame of one camera with every connected viewer. A frame is encoded once
+    and the same JPEG bytes are sent to all viewers; when nobody is watching, nothing is drawn or encoded.
+
+    Attributes:
+    quality (int): The JPEG quality.
+    max_fps (float): The maximum rate at which frames are encoded.
+    """
+    def __init__(self, quality=JPEG_QUALITY, max_fps=MAX_STREAM_FPS):
+        self.quality = quality
+        self.max_fps = max_fps
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._sequence = 0
+        self._viewers = 0
+        self._last_publish = 0.0
+
+    @property
+    def viewers(self):
+        """
+        int: The number of connected viewers.
+        """
+        return self._viewers
+
+    def wants_frame(self):
+        """
+        Checks whether the camera should annotate and publish the current frame.
+
+        Returns:
+        bool: True if at least one viewer is connected and the rate limit allows a new frame.
+        """
+        return self._viewers > 0 and time.monotonic() - self._last_publish >= 1.0 / self.max_fps
+
+    def publish(self, frame):
+        """
+        Encodes an annotated frame and wakes up every viewer waiting for it.
+
+        Parameters:
+        frame (numpy.ndarray): The annotated BGR frame.
+        """
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._condition:
+            self._jpeg = jpeg.tobytes()
+            self._sequence += 1
+            self._last_publish = time.monotonic()
+            self._condition.notify_all()
+
+    def frames(self, timeout=10.0):
+        """
+        Yields each newly published frame for one viewer until the viewer disconnects.
+        Viewers that fall behind skip straight to the latest frame.
+
+        Parameters:
+        timeout (float): Seconds to wait for a frame before giving up on a stalled camera.
+
+        Yields:
+        bytes: The JPEG-encoded frame.
+        """
+        with self._condition:
+            self._viewers += 1
+        try:
+            seen = 0
+            while True:
+                with self._condition:
+                    if not self._condition.wait_for(lambda: self._sequence != seen, timeout):
+                        return
+                    seen, jpeg = self._sequence, self._jpeg
+                yield jpeg
+        finally:
+            with self._condition:
+                self._viewers -= 1
+
+def get_broadcaster(camera_id):
+    """
+    Returns the broadcaster of a camera, creating it on first use.
+
+    Parameters:
+    camera_id (int): The ID of the camera.
+
+    Returns:
+    FrameBroadcaster: The camera's broadcaster.
+    """
+    with _broadcasters_lock:
+        if camera_id not in _broadcasters:
+            _broadcasters[camera_id] = FrameBroadcaster()
+        return _broadcasters[camera_id]
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """
+    Serves /cameras/<id>.mjpg as a multipart MJPEG stream of a camera's annotated frames,
+    /scheduler with the cameras' processing rates and queueing delays, and /health with the
+    state of each supervised camera.
+    """
+    path_pattern = re.compile(r'^/cameras/(\d+)(?:\.mjpg)?$')
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/scheduler':
+            self.send_json(get_scheduler().stats())
+            return
+        if self.path.split('?')[0] == '/health':
+            from supervisor import fleet_health  # Imported here; the supervisor imports the camera pipeline, which imports this module
+            self.send_json(fleet_health())
+            return
+        match = self.path_pattern.match(self.path.split('?')[0])
+        if not match:
+            self.send_error(404, "Use /cameras/<camera id>.mjpg")
+            return
+        camera_id = int(match.group(1))
+        with _broadcasters_lock:
+            broadcaster = _broadcasters.get(camera_id)
+        if broadcaster is None:
+            self.send_error(404, f"Camera {camera_id} is not running")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for jpeg in broadcaster.frames():
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The viewer disconnected
+
+    def send_json(self, data):
+        """
+        Serves data as JSON, e.g. each camera's effective processing rate and queueing delay (see scheduler.py).
+        """
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the unit's console output for occupancy messages
+
+def start_stream_server(host=STREAM_HOST, port=STREAM_PORT):
+    """
+    Starts the MJPEG server in a background thread.
+
+    Parameters:
+    host (str): The interface to listen on.
+    port (int): The port to listen on.
+
+    Returns:
+    ThreadingHTTPServer: The running server; call shutdown() to stop it.
+
+    Raises:
+    OSError: If the address cannot be bound, e.g. because the port is in use.
+    """
+    server = ThreadingHTTPServer((host, port), StreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mjpeg-server', daemon=True).start()
+    print(f"Streaming annotated frames at http://{host}:{port}/cameras/<camera id>.mjpg")
+    return server
@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import threading
+from utils import resolve_path
+from scheduler import configure_scheduler, FPS_BUDGET, MAX_STALENESS
+from module import camera_thread, DEFAULT_FRAME_SIZE
+from detectors import unload_detector
+
+RELOAD_INTERVAL = 5.0  # Seconds between checks of fleet.json for changes
+RECONNECT_DELAY = 1.0  # Seconds before the first reconnect attempt of a failed camera
+MAX_RECONNECT_DELAY = 60.0  # Upper bound of the doubling reconnect delay
+STABLE_AFTER = 30.0  # Seconds a camera must run before its reconnect delay is reset
+STOP_TIMEOUT = 5.0  # Seconds to wait for each camera's thread when the supervisor stops
+DRAIN_INTERVAL = 0.5  # Seconds between checks for stopped cameras whose thread has exited
+
+_active = None  # The running supervisor, for health reporting
+
+def read_fleet_config(filename=None):
+    """
+    Reads the camera fleet configuration.
+
+    The file holds a list of cameras, each with a unique 'id' and a 'source', and optionally 'frame_size',
+    'detector' and 'detect_every' (see module.camera_thread), e.g.
+    {"cameras": [{"id": 1, "source": "rtsp://...", "frame_size": [1280, 720], "detect_every": 3}]}
+
+    Parameters:
+    filename (str): The path to the JSON file (defaults to the configured fleet.json).
+
+    Returns:
+    dict: The configuration of each camera, keyed by camera ID.
+
+    Raises:
+    ValueError: If the configuration is invalid.
+    """
+    filename = filename or resolve_path("fleet.json")
+    with open(filename, 'r') as file:
+        data = json.load(file)
+    if not isinstance(data, dict) or not isinstance(data.get('cameras', []), list):
+        raise ValueError("Expected an object with a list of 'cameras'")
+    cameras = {}
+    for camera in data.get('cameras', []):
+        if not isinstance(camera, dict) or 'id' not in camera or 'source' not in camera:
+            raise ValueError(f"Every camera needs an 'id' and a 'source': {camera!r}")
+        camera_id = camera['id']
+        if isinstance(camera_id, str) and camera_id.strip().isdigit():
+            camera_id = int(camera_id)
+        if isinstance(camera_id, bool) or not isinstance(camera_id, int):
+            raise ValueError(f"Camera IDs must be whole numbers, got {camera['id']!r}")
+        if camera_id in cameras:
+            raise ValueError(f"Duplicate camera ID {camera_id}")
+        detect_every = camera.get('detect_every', 1)
+        if isinstance(detect_every, bool) or not isinstance(detect_every, int) or detect_every < 1:
+            raise ValueError(f"Camera {camera_id}: 'detect_every' must be a whole number of at least 1, got {detect_every!r}")
+        cameras[camera_id] = camera
+    return cameras
+
+def is_file_source(source):
+    """
+    Checks whether a video source is a file, which ends instead of dropping out.
+    """
+    return isinstance(source, str) and not source.isdigit() and '://' not in source
+
+class CameraPipeline:
+    """
+    One supervised camera: runs camera_thread in its own thread, restarts it with a doubling delay
+    when the source fails or drops out, and records its health. A video file that plays to the end
+    is finished rather than failed.
+
+    Attributes:
+    camera_id (int): The ID of the camera.
+    config (dict): The camera's entry in the fleet configuration.
+    state (str): 'starting', 'running', 'reconnecting', 'finished' or 'stopped'.
+    frames (int): Frames processed since the pipeline was started.
+    failures (int): Consecutive failures without a stable run in between.
+    last_error (str): The most recent failure, or None.
+    """
+    def __init__(self, camera_id, config, display, trace_path):
+        self.camera_id = camera_id
+        self.config = config
+        self.display = display
+        self.trace_path = trace_path
+        self.state = 'starting'
+        self.frames = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_frame = None
+        self.retry_at = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'camera-{camera_id}', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        Asks the camera to stop after its current frame and waits for it up to a timeout.
+        """
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    def _frame(self):
+        self.frames += 1
+        self.last_frame = time.monotonic()
+        self.state = 'running'
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self.stop_event.is_set():
+            config = self.config
+            started = time.monotonic()
+            try:
+                camera_thread(config['source'], self.display, self.camera_id, config.get('detector'),
+                              tuple(config.get('frame_size', DEFAULT_FRAME_SIZE)), self.trace_path,
+                              detect_every=int(config.get('detect_every', 1)), stop_event=self.stop_event, on_frame=self._frame)
+                if self.stop_event.is_set():
+                    break
+                if is_file_source(config['source']):
+                    self.state = 'finished'
+                    print(f"Camera {self.camera_id}: end of {config['source']}")
+                    return
+                self.last_error = "stream ended"
+            except Exception as e:
+                self.last_error = str(e)
+            if time.monotonic() - started >= STABLE_AFTER:
+                delay, self.failures = RECONNECT_DELAY, 0  # It ran for a while; start backing off from scratch
+            self.failures += 1
+            self.state = 'reconnecting'
+            self.retry_at = time.monotonic() + delay
+            print(f"Camera {self.camera_id} failed ({self.last_error}); reconnecting in {delay:g} s")
+            if self.stop_event.wait(delay):
+                break
+            self.retry_at = None
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        self.state = 'stopped'
+
+    def health(self):
+        """
+        Returns the camera's health.
+
+        Returns:
+        dict: State, source, frames processed, seconds since the last frame, consecutive failures,
+              last error and seconds until the next reconnect attempt.
+        """
+        now = time.monotonic()
+        return {
+            'state': self.state,
+            'source': str(self.config['source']),
+            'frames': self.frames,
+            'last_frame_age': round(now - self.last_frame, 1) if self.last_frame is not None else None,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'retry_in': round(max(self.retry_at - now, 0), 1) if self.retry_at is not None else None,
+        }
+
+class FleetSupervisor:
+    """
+    Runs the cameras listed in fleet.json and keeps them in line with the file: when it changes, new
+    cameras are started, removed cameras are stopped, and cameras whose entry changed are restarted,
+    while all other cameras keep running. Each camera has its own cached detector (see
+    detectors.load_detector), so restarting a camera with an unchanged detector does not reload its model.
+
+    A stopped camera finishes its current frame, which can take a while if its source hangs. Its pipeline
+    is kept as draining until the thread has exited, and a replacement for the same camera ID is only
+    started after that, so two threads never run the same camera.
+
+    Attributes:
+    pipelines (dict): The running CameraPipeline of each camera ID.
+    """
+    def __init__(self, config_path=None, display=True, trace_path=None, fps_budget=FPS_BUDGET,
+                 max_staleness=MAX_STALENESS, reload_interval=RELOAD_INTERVAL):
+        self.config_path = config_path or resolve_path("fleet.json")
+        self.display = display
+        self.trace_path = trace_path
+        self.fps_budget = fps_budget
+        self.max_staleness = max_staleness
+        self.reload_interval = reload_interval
+        self.pipelines = {}
+        self._cameras = {}  # The configuration of each camera in the last valid fleet.json
+        self._draining = []  # Stopped pipelines whose thread has not exited yet
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._reload = threading.Event()
+        self._stop = threading.Event()
+
+    def reload(self):
+        """
+        Reads fleet.json and starts, stops or restarts cameras to match it. An invalid file is reported
+        and ignored, leaving the running cameras as they are.
+        """
+        try:
+            self._mtime = os.path.getmtime(self.config_path)
+            cameras = read_fleet_config(self.config_path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load fleet configuration {self.config_path}: {e}")
+            return
+        with self._lock:
+            self._cameras = cameras
+            for camera_id in list(self.pipelines):
+                pipeline = self.pipelines[camera_id]
+                if cameras.get(camera_id) != pipeline.config:
+                    pipeline.stop_event.set()  # Not joined here, so health requests never wait on a stopping camera
+                    self._draining.append(pipeline)
+                    del self.pipelines[camera_id]
+                    if camera_id not in cameras:
+                        print(f"Camera {camera_id} removed")
+            self._sync()
+
+    def _sync(self):
+        # Called with self._lock held. Forgets drained pipelines and starts every configured camera that
+        # is not running and has no draining pipeline left.
+        for pipeline in self._draining:
+            if pipeline.thread.is_alive():
+                continue
+            if pipeline.camera_id not in self._cameras or pipeline.config.get('detector') != self._cameras[pipeline.camera_id].get('detector'):
+                unload_detector(pipeline.config.get('detector'), pipeline.camera_id)  # The camera no longer uses this model
+        self._draining = [pipeline for pipeline in self._draining if pipeline.thread.is_alive()]
+        draining = {pipeline.camera_id for pipeline in self._draining}
+        for camera_id, config in self._cameras.items():
+            if camera_id in self.pipelines:
+                continue
+            if camera_id in draining:
+                continue  # Started on a later tick, once the previous thread has exited
+            pipeline = self.pipelines[camera_id] = CameraPipeline(camera_id, config, self.display, self.trace_path)
+            pipeline.start()
+            print(f"Camera {camera_id} started: {config['source']}")
+
+    def request_reload(self):
+        """
+        Makes the supervisor reload fleet.json now, e.g. from a signal handler.
+        """
+        self._reload.set()
+
+    def run(self):
+        """
+        Starts the configured cameras and supervises them until stop() is called (or the call is
+        interrupted), reloading the configuration whenever fleet.json changes or a reload is requested.
+        """
+        global _active
+        _active = self
+        configure_scheduler(self.fps_budget, self.max_staleness)  # Shared by however many cameras are configured
+        try:
+            self.reload()
+            while not self._stop.is_set():
+                self._reload.wait(DRAIN_INTERVAL if self._draining else self.reload_interval)
+                if self._stop.is_set():
+                    break
+                if self._draining:
+                    with self._lock:
+                        self._sync()
+                try:
+                    changed = os.path.getmtime(self.config_path) != self._mtime
+                except OSError:
+                    changed = False
+                if changed or self._reload.is_set():
+                    self._reload.clear()
+                    self.reload()
+        finally:
+            with self._lock:
+                pipelines = list(self.pipelines.values()) + self._draining
+                for pipeline in pipelines:
+                    pipeline.stop_event.set()
+            for pipeline in pipelines:  # Joined outside the lock, so health requests are answered meanwhile
+                pipeline.stop()
+            if _active is self:
+                _active = None
+
+    def stop(self):
+        """
+        Stops the supervisor and all cameras.
+        """
+        self._stop.set()
+        self._reload.set()
+
+    def health(self):
+        """
+        Returns the health of every supervised camera.
+
+        Returns:
+        dict: The health of each camera, keyed by camera ID (see CameraPipeline.health). A camera whose
+              previous pipeline is still stopping is reported as 'draining'.
+        """
+        with self._lock:
+            health = {pipeline.camera_id: dict(pipeline.health(), state='draining')
+                      for pipeline in self._draining if pipeline.thread.is_alive()}
+            health.update((camera_id, pipeline.health()) for camera_id, pipeline in self.pipelines.items())
+            return dict(sorted(health.items()))
+
+def fleet_health():
+    """
+    Returns the health of the cameras of the running supervisor.
+
+    Returns:
+    dict: The health of each camera, keyed by camera ID; empty if no supervisor is running.
+    """
+    supervisor = _active
+    return supervisor.health() if supervisor is not None else {}
@@ -0,0 +1,237 @@
+import os
+import mmap
+import time
+import struct
+import argparse
+import threading
+import numpy as np
+from collections import namedtuple
+from detectors import Detections
+
+MAGIC = b'PKTRACE1'  # First bytes of every trace file
+RECORD_HEADER = struct.Struct('<IIdHHI')  # Camera ID, frame index, timestamp, frame width, frame height, detection count
+DETECTION_DTYPE = np.dtype([('box', '<f4', (4,)), ('class', '<i2'), ('score', '<f4')])  # 22 bytes per detection, packed
+
+# One frame's raw detections; frame_size is the (width, height) of the frame the boxes refer to
+TraceRecord = namedtuple('TraceRecord', ['camera_id', 'frame_index', 'timestamp', 'frame_size', 'detections'])
+
+_writers = {}  # Open trace writers and their number of users by path, shared by all camera threads recording to the same file
+_writers_lock = threading.Lock()
+
+def encode_record(camera_id, frame_index, timestamp, frame_size, detections):
+    """
+    Encodes one frame's detections as a trace record.
+
+    Parameters:
+    camera_id (int): The ID of the camera.
+    frame_index (int): The index of the frame in the camera's stream.
+    timestamp (float): The time the frame was processed (seconds since the epoch, or into the video).
+    frame_size (tuple): The (width, height) of the frame the detections were made on.
+    detections (Detections): The raw detections of the frame.
+
+    Returns:
+    bytes: The encoded record.
+    """
+    packed = np.empty(len(detections.boxes), dtype=DETECTION_DTYPE)
+    packed['box'] = detections.boxes
+    packed['class'] = detections.classes
+    packed['score'] = detections.scores
+    return RECORD_HEADER.pack(camera_id, frame_index, timestamp, frame_size[0], frame_size[1], len(packed)) + packed.tobytes()
+
+class TraceWriter:
+    """
+    Appends detection records to a trace file. The file is unbuffered and each record is written with a single
+    write call under a lock, so several cameras can record to the same file, every record is in the file (and
+    visible to a replay) as soon as write returns, and a crash can at most cut off the last record.
+
+    Attributes:
+    path (str): The path of the trace file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, 'rb') as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Not a detection trace: {path}")
+        self._file = open(path, 'ab', buffering=0)
+        if new:
+            self._file.write(MAGIC)
+
+    def write(self, camera_id, frame_index, timestamp, frame_size, detections):
+        """
+        Appends one frame's detections to the trace (see encode_record for the parameters).
+        """
+        record = encode_record(camera_id, frame_index, timestamp, frame_size, detections)
+        with self._lock:
+            self._file.write(record)
+
+    def close(self):
+        """
+        Closes the trace file.
+        """
+        with self._lock:
+            self._file.close()
+
+def get_trace_writer(path):
+    """
+    Returns the writer of a trace file, opening it on first use. Every call must be paired with a call to
+    release_trace_writer once the caller stops recording.
+
+    Parameters:
+    path (str): The path of the trace file.
+
+    Returns:
+    TraceWriter: The shared writer for the file.
+    """
+    path = os.path.abspath(path)
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = [TraceWriter(path), 0]
+        _writers[path][1] += 1
+        return _writers[path][0]
+
+def release_trace_writer(path):
+    """
+    Releases a writer obtained with get_trace_writer, closing the file when its last user releases it.
+
+    Parameters:
+    path (str): The path of the trace file.
+    """
+    path = os.path.abspath(path)
+    with _writers_lock:
+        entry = _writers.get(path)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _writers[path]
+            entry[0].close()
+
+def read_trace(path, camera_id=None):
+    """
+    Reads the records of a trace file in the order they were written. The file is memory-mapped, so traces
+    larger than memory can be replayed. A record cut short by a crash while recording ends the trace.
+
+    Parameters:
+    path (str): The path of the trace file.
+    camera_id (int, optional): Only yield records of this camera.
+
+    Yields:
+    TraceRecord: The next record.
+
+    Raises:
+    ValueError: If the file is not a detection trace.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a detection trace: {path}")
+        if os.path.getsize(path) == len(MAGIC):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = len(MAGIC)
+            while offset + RECORD_HEADER.size <= len(data):
+                record_camera, frame_index, timestamp, width, height, count = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                offset = start + count * DETECTION_DTYPE.itemsize
+                if offset > len(data):
+                    return
+                if camera_id is not None and record_camera != camera_id:
+                    continue
+                packed = np.frombuffer(data, dtype=DETECTION_DTYPE, count=count, offset=start)
+                detections = Detections(packed['box'].astype(np.float32), packed['class'].astype(np.int32), packed['score'].astype(np.float32))
+                del packed  # Release the view so the map can be closed
+                yield TraceRecord(record_camera, frame_index, timestamp, (width, height), detections)
+
+def merge_traces(path, parts):
+    """
+    Appends trace files to another trace file in the given order and deletes them.
+
+    Parameters:
+    path (str): The trace file to append to (created if missing).
+    parts (list): The trace files to append.
+    """
+    writer = TraceWriter(path)
+    writer.close()
+    with open(path, 'ab') as output:
+        for part in parts:
+            with open(part, 'rb') as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Not a detection trace: {part}")
+                while True:
+                    chunk = file.read(1 << 20)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+            os.remove(part)
+
+def replay_trace(path, camera_id, sections, class_list, iou_threshold=None, upload=False):
+    """
+    Replays a camera's recorded detections through spot matching, without a model or video.
+
+    Parameters:
+    path (str): The path of the trace file.
+    camera_id (int): The camera whose records are replayed.
+    sections (list): The layout of the camera, as stored in parking_info.json.
+    class_list (list of str): The list of class names the model can detect.
+    iou_threshold (float, optional): The IoU threshold for matching (defaults to module.IOU_THRESHOLD).
+    upload (bool): Whether to save each frame's occupancy to parking_info.json, which sends changes to the backend.
+
+    Returns:
+    list: One row per replayed frame: [timestamp, frame index, occupancy of each spot (0 or 1)].
+    """
+    from module import match_vehicles, IOU_THRESHOLD
+    from layout import CameraLayout
+    from util import save_parking_occupancy
+
+    layout = CameraLayout.from_json(sections)
+    iou_threshold = IOU_THRESHOLD if iou_threshold is None else iou_threshold
+    rows = []
+    for record in read_trace(path, camera_id):
+        _, _, matches, _ = match_vehicles(layout, record.detections, class_list, record.frame_size, iou_threshold)
+        layout.occupied = matches.any(axis=1)
+        if upload:
+            save_parking_occupancy(camera_id, layout)
+        rows.append([record.timestamp, record.frame_index] + layout.occupied.astype(int).tolist())
+    return rows
+
+def main():
+    """
+    Command-line entry point for replaying a detection trace, optionally sweeping several IoU thresholds.
+    Without --upload the camera layout is only read and the backend is never contacted.
+    """
+    from module import IOU_THRESHOLD
+    from utils import read_class_list, fetch_parking_occupancy
+
+    parser = argparse.ArgumentParser(description="Replay recorded detections through spot matching without running the model.")
+    parser.add_argument('trace', help="Path to the detection trace.")
+    parser.add_argument('--camera-id', type=int, default=1, help="Camera whose records and layout are used (default: 1).")
+    parser.add_argument('--iou-threshold', type=float, nargs='+', default=[IOU_THRESHOLD], help=f"IoU threshold(s) to evaluate (default: {IOU_THRESHOLD}).")
+    parser.add_argument('--output', default=None, help="Write the occupancy timeline of the last threshold to this .csv or .parquet file.")
+    parser.add_argument('--upload', action='store_true', help="Save occupancy to parking_info.json and send changes to the backend, like a live camera.")
+    args = parser.parse_args()
+
+    sections = fetch_parking_occupancy(args.camera_id)
+    if not sections:
+        parser.error(f"No layout found for camera {args.camera_id}")
+    class_list = read_class_list()
+
+    for iou_threshold in args.iou_threshold:
+        start = time.perf_counter()
+        rows = replay_trace(args.trace, args.camera_id, sections, class_list, iou_threshold, args.upload)
+        elapsed = time.perf_counter() - start
+        occupancy = np.array([row[2:] for row in rows], dtype=np.uint8).reshape(len(rows), -1)
+        changes = int(np.count_nonzero(np.diff(occupancy, axis=0))) if len(rows) > 1 else 0
+        print(f"IoU {iou_threshold:g}: {len(rows)} frames in {elapsed:.2f} s ({len(rows) / max(elapsed, 1e-9):.0f} frames/s), "
+              f"mean occupied {occupancy.sum(axis=1).mean() if len(rows) else 0:.2f} spots, {changes} spot changes")
+
+    if args.output:
+        import pandas as pd
+        from batch import write_timeline
+        spot_keys = [f"{section['id']}/{i + 1}" for section in sections for i in range(len(section['parking_areas']))]
+        write_timeline(pd.DataFrame(rows, columns=['timestamp', 'frame'] + spot_keys).astype({key: 'uint8' for key in spot_keys}), args.output)
+        print(f"Wrote {len(rows)} samples for {len(spot_keys)} spots to {args.output}")
+
+if __name__ == "__main__":
+    main()
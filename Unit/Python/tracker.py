@@ -0,0 +1,190 @@
+import itertools
+import numpy as np
+from detectors import Detections
+
+MATCH_IOU = 0.3  # Minimum IoU between a track's predicted box and a detection to continue the track
+MAX_MISSES = 3  # Detector runs a track may go unmatched before it is dropped
+VELOCITY_GAIN = 0.5  # Weight of the newest measurement in the velocity estimate (0-1)
+
+def box_iou(boxes1, boxes2):
+    """
+    Computes the IoU of every pair of boxes.
+
+    Parameters:
+    boxes1 (numpy.ndarray): (N, 4) boxes as (x1, y1, x2, y2).
+    boxes2 (numpy.ndarray): (M, 4) boxes as (x1, y1, x2, y2).
+
+    Returns:
+    numpy.ndarray: The (N, M) IoU matrix.
+    """
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    areas1 = np.prod(boxes1[:, 2:] - boxes1[:, :2], axis=1)
+    areas2 = np.prod(boxes2[:, 2:] - boxes2[:, :2], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nan_to_num(intersection / (areas1[:, None] + areas2[None, :] - intersection))
+
+class Track:
+    """
+    One tracked vehicle, moved between detector runs with a constant-velocity model.
+
+    Attributes:
+    id (int): The track ID, unique within the tracker.
+    box (numpy.ndarray): The current (x1, y1, x2, y2) box.
+    velocity (numpy.ndarray): The change of the box per frame.
+    class_id (int): The class index of the last matched detection.
+    score (float): The score of the last matched detection.
+    first_seen (float): When the vehicle was first detected.
+    last_seen (float): When the vehicle was last detected.
+    misses (int): Consecutive detector runs without a matching detection.
+    frame (int): The frame the box refers to.
+    """
+    __slots__ = ('id', 'box', 'velocity', 'class_id', 'score', 'first_seen', 'last_seen', 'misses', 'frame')
+
+    def __init__(self, track_id, box, class_id, score, timestamp, frame):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.class_id = int(class_id)
+        self.score = float(score)
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.misses = 0
+        self.frame = frame
+
+    def predicted(self, frame):
+        """
+        Returns the box predicted for a later frame.
+        """
+        return self.box + self.velocity * (frame - self.frame)
+
+    def dwell(self, now):
+        """
+        Returns how long the vehicle has been tracked, in seconds.
+        """
+        return now - self.first_seen
+
+class VehicleTracker:
+    """
+    A lightweight IoU tracker that lets the detector run only every few frames. On frames where the detector ran,
+    update() associates its detections with the tracks and returns them unchanged, together with the predicted
+    boxes of live tracks the detector missed; on the frames in between, predict() moves every track along its
+    estimated velocity. Both return every live track, so a vehicle the detector misses for a run or two keeps its
+    spot occupied instead of flickering. Track IDs stay stable while a vehicle is visible, which gives per-vehicle
+    dwell times.
+
+    Attributes:
+    classes (numpy.ndarray): The class indices that are tracked, or None to track every class.
+    tracks (list): The live tracks.
+    """
+    def __init__(self, classes=None, match_iou=MATCH_IOU, max_misses=MAX_MISSES, velocity_gain=VELOCITY_GAIN):
+        self.classes = None if classes is None else np.asarray(classes, dtype=np.int32)
+        self.match_iou = match_iou
+        self.max_misses = max_misses
+        self.velocity_gain = velocity_gain
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections, frame, timestamp):
+        """
+        Associates a detector run with the tracks: matched tracks snap to their detection, unmatched detections
+        start new tracks, and tracks unmatched for more than max_misses runs are dropped. Detections of classes
+        that are not tracked are discarded. Tracks that went unmatched but are still live are returned at their
+        predicted boxes, like predict() does.
+
+        Parameters:
+        detections (Detections): The detections of the frame.
+        frame (int): The index of the frame.
+        timestamp (float): The time of the frame in seconds.
+
+        Returns:
+        tuple: The detections of tracked classes, unchanged, followed by the predicted boxes of the unmatched live
+               tracks, and an int (M,) array of the track ID of each.
+        """
+        if self.classes is not None:
+            keep = np.isin(detections.classes, self.classes)
+            detections = Detections(detections.boxes[keep], detections.classes[keep], detections.scores[keep])
+        boxes = detections.boxes
+        predicted = np.array([track.predicted(frame) for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        overlaps = box_iou(predicted, boxes)
+        if len(self.tracks) and len(boxes):
+            overlaps[np.array([track.class_id for track in self.tracks])[:, None] != detections.classes[None, :]] = 0
+
+        # Greedy association, best overlap first
+        ids = np.zeros(len(boxes), dtype=np.int64)
+        matched_tracks = set()
+        for flat in np.argsort(overlaps, axis=None)[::-1]:
+            track_index, detection = np.unravel_index(flat, overlaps.shape)
+            if overlaps[track_index, detection] < self.match_iou:
+                break
+            if track_index in matched_tracks or ids[detection]:
+                continue
+            track = self.tracks[track_index]
+            elapsed = max(frame - track.frame, 1)
+            measured = (boxes[detection] - track.box) / elapsed
+            track.velocity += self.velocity_gain * (measured - track.velocity)
+            track.box = boxes[detection].astype(np.float32)
+            track.frame = frame
+            track.class_id = int(detections.classes[detection])
+            track.score = float(detections.scores[detection])
+            track.last_seen = timestamp
+            track.misses = 0
+            matched_tracks.add(track_index)
+            ids[detection] = track.id
+
+        live, coasting = [], []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+                coasting.append(track)
+            live.append(track)
+        for detection in np.flatnonzero(ids == 0):
+            track = Track(next(self._ids), boxes[detection], detections.classes[detection], detections.scores[detection], timestamp, frame)
+            live.append(track)
+            ids[detection] = track.id
+        self.tracks = live
+        if coasting:
+            predicted, coasting_ids = self._predicted(coasting, frame)
+            detections = Detections(np.concatenate([detections.boxes, predicted.boxes]), np.concatenate([detections.classes, predicted.classes]),
+                                    np.concatenate([detections.scores, predicted.scores]))
+            ids = np.concatenate([ids, coasting_ids])
+        return detections, ids
+
+    def predict(self, frame):
+        """
+        Moves every track to a frame the detector did not run on.
+
+        Parameters:
+        frame (int): The index of the frame.
+
+        Returns:
+        tuple: Detections built from the predicted boxes, and an int (M,) array of their track IDs.
+        """
+        return self._predicted(self.tracks, frame)
+
+    @staticmethod
+    def _predicted(tracks, frame):
+        """
+        Builds detections from the boxes of tracks predicted for a frame, and the array of their track IDs.
+        """
+        if not tracks:
+            return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32)), np.zeros(0, dtype=np.int64)
+        boxes = np.array([track.predicted(frame) for track in tracks], dtype=np.float32)
+        classes = np.array([track.class_id for track in tracks], dtype=np.int32)
+        scores = np.array([track.score for track in tracks], dtype=np.float32)
+        return Detections(boxes, classes, scores), np.array([track.id for track in tracks], dtype=np.int64)
+
+    def dwell_times(self, now):
+        """
+        Returns how long each live vehicle has been tracked.
+
+        Parameters:
+        now (float): The current time in seconds, on the same clock as the frame timestamps.
+
+        Returns:
+        dict: Seconds tracked, by track ID.
+        """
+        return {track.id: track.dwell(now) for track in self.tracks}
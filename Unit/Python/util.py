@@ -1,30 +1,40 @@
 import json
-from utils import read_parking_areas, find_file
+from utils import read_parking_areas, resolve_path, normalize_layout_data
 from data_sender import send_parking_info
+from layout import CameraLayout
 
-info = find_file("parking_info.json")
+previously_written = False
 
-def write_parking_areas(camera_id, sections, filename=info):
+def write_parking_areas(camera_id, sections, filename=None, occupancy_only=False):
     """
     Writes the parking sections data to the JSON file. If there are changes, it triggers an update.
+    Changes are detected by comparing the compiled layouts' arrays rather than the JSON documents.
 
     Parameters:
     camera_id (int): The ID of the camera.
-    sections (list): The list of sections to write to the file.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    sections (list or CameraLayout): The sections to write to the file, with normalized coordinates.
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
+    occupancy_only (bool): If True, only occupancy is being updated: nothing is written if the stored layout
+                           was edited since the sections were read, so the edit is not overwritten.
 
     Raises:
     Exception: If there is an error writing to the file.
     """
+    filename = filename or resolve_path("parking_info.json")
     global previously_written
+    layout = sections if isinstance(sections, CameraLayout) else CameraLayout.from_json(sections)
     try:
         with open(filename, 'r+') as file:
             data = json.load(file)
+            normalize_layout_data(data)
             camera_key = f"camera_{camera_id}"
             if camera_key not in data['cameras']:
                 data['cameras'][camera_key] = {"sections": []}
-            if data['cameras'][camera_key]['sections'] != sections:
-                data['cameras'][camera_key]['sections'] = sections
+            stored = CameraLayout.from_json(data['cameras'][camera_key]['sections'])
+            if occupancy_only and not stored.same_geometry(layout):
+                return  # The layout was edited while the frame was processed; the next frame picks it up
+            if stored != layout:
+                data['cameras'][camera_key]['sections'] = layout.to_json()
                 file.seek(0)
                 json.dump(data, file, indent=4)
                 file.truncate()
@@ -38,19 +48,20 @@ def write_parking_areas(camera_id, sections, filename=info):
     except Exception as e:
         print(f"Failed to write to file {filename}: {e}")
 
-def add_section(new_area, section_id, camera_id, filename=info):
+def add_section(new_area, section_id, camera_id, filename=None):
     """
     Adds a new section to the parking areas for a specified camera.
 
     Parameters:
-    new_area (list): The coordinates of the new area.
+    new_area (list): The normalized coordinates of the new area.
     section_id (int): The ID of the new section.
     camera_id (int): The ID of the camera.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
 
     Raises:
     ValueError: If a section with the specified ID already exists.
     """
+    filename = filename or resolve_path("parking_info.json")
     sections = read_parking_areas(camera_id, filename)
     if any(sec['id'] == f"section_{section_id}" for sec in sections):
         raise ValueError(f"Section with ID '{section_id}' already exists.")
@@ -68,18 +79,19 @@ def add_section(new_area, section_id, camera_id, filename=info):
     write_parking_areas(camera_id, sections, filename)
     print(f"New section '{section_id}' added successfully: {new_area}")
 
-def delete_section(section_id, camera_id, filename=info):
+def delete_section(section_id, camera_id, filename=None):
     """
     Deletes a section from the parking areas for a specified camera.
 
     Parameters:
     section_id (str): The ID of the section to delete.
     camera_id (int): The ID of the camera.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
 
     Returns:
     None
     """
+    filename = filename or resolve_path("parking_info.json")
     sections = read_parking_areas(camera_id, filename)
     filtered_sections = [sec for sec in sections if sec['id'] != section_id]
     if len(filtered_sections) != len(sections):
@@ -88,19 +100,20 @@ def delete_section(section_id, camera_id, filename=info):
     else:
         print(f"No section with ID '{section_id}' found. Unable to delete.")
 
-def insert_parking_area(new_area, section_id, camera_id, filename=info):
+def insert_parking_area(new_area, section_id, camera_id, filename=None):
     """
     Inserts a new parking area into a specified section for a specified camera.
 
     Parameters:
-    new_area (list): The coordinates of the new parking area.
+    new_area (list): The normalized coordinates of the new parking area.
     section_id (str): The ID of the section to insert the parking area into.
     camera_id (int): The ID of the camera.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
 
     Returns:
     None
     """
+    filename = filename or resolve_path("parking_info.json")
     sections = read_parking_areas(camera_id, filename)
     found = False
     for section in sections:
@@ -118,7 +131,7 @@ def insert_parking_area(new_area, section_id, camera_id, filename=info):
     if not found:
         print(f"No section with ID '{section_id}' found. Unable to add parking area.")
 
-def delete_parking_area(section_id, index, camera_id, filename=info):
+def delete_parking_area(section_id, index, camera_id, filename=None):
     """
     Deletes a parking area from a specified section for a specified camera.
 
@@ -126,11 +139,12 @@ def delete_parking_area(section_id, index, camera_id, filename=info):
     section_id (str): The ID of the section to delete the parking area from.
     index (int): The index of the parking area to delete.
     camera_id (int): The ID of the camera.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
 
     Returns:
     None
     """
+    filename = filename or resolve_path("parking_info.json")
     sections = read_parking_areas(camera_id, filename)
     for section in sections:
         if section['id'] == section_id:
@@ -144,23 +158,16 @@ def delete_parking_area(section_id, index, camera_id, filename=info):
                 return
     print("Section ID not found for deletion.")
 
-def save_parking_occupancy(camera_id, updated_sections, filename=info):
+def save_parking_occupancy(camera_id, layout, filename=None):
     """
     Saves the updated parking occupancy information for a specified camera.
 
     Parameters:
     camera_id (int): The ID of the camera.
-    updated_sections (list): The updated list of sections.
-    filename (str): The path to the JSON file (default is the global 'info' variable).
+    layout (CameraLayout): The compiled layout with the updated occupancy.
+    filename (str): The path to the JSON file (defaults to the configured parking_info.json).
 
     Returns:
     None
     """
-    current_sections = read_parking_areas(camera_id, filename)
-    for section in updated_sections:
-        index = next((i for i, s in enumerate(current_sections) if s['id'] == section['id']), None)
-        if index is not None:
-            current_sections[index] = section
-        else:
-            current_sections.append(section)
-    write_parking_areas(camera_id, current_sections, filename)
+    write_parking_areas(camera_id, layout, filename, occupancy_only=True)
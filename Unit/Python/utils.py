@@ -1,52 +1,130 @@
 import json
 import os
-
-def find_file(filename):
+from functools import lru_cache
+
+# Directory holding coco.json, parking_info.json and fleet.json. Override with PARKING_JSON_DIR, or point
+# at individual files with PARKING_CLASS_LIST / PARKING_INFO_FILE / PARKING_FLEET_FILE.
+JSON_DIRECTORY = os.environ.get('PARKING_JSON_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'JSON'))
+PATH_OVERRIDES = {
+    "coco.json": 'PARKING_CLASS_LIST',
+    "parking_info.json": 'PARKING_INFO_FILE',
+    "fleet.json": 'PARKING_FLEET_FILE',
+}
+COORDINATE_SPACE = "normalized"  # Layout coordinates are stored as fractions of the frame width and height
+LEGACY_FRAME_SIZE = (1020, 500)  # Width and height of the frames layouts were drawn on before they were normalized
+
+@lru_cache(maxsize=None)
+def resolve_path(filename):
     """
-    Searches for a file with the specified filename in the current directory and all subdirectories.
+    Resolves the path of a configuration file without touching the filesystem.
+    The result is cached, so every caller after the first gets the path for free.
 
     Parameters:
-    filename (str): The name of the file to search for.
+    filename (str): The name of the file (e.g., 'coco.json' or 'parking_info.json').
 
     Returns:
-    str: The full path to the file if found.
-
-    Raises:
-    FileNotFoundError: If the file is not found in the directory tree.
+    str: The environment override for the file if set, otherwise its path in JSON_DIRECTORY.
     """
-    for root, dirs, files in os.walk('.'):
-        if filename in files:
-            return os.path.join(root, filename)
-    raise FileNotFoundError(f"File '{filename}' not found")
-
-coco = find_file("coco.json")
-info = find_file("parking_info.json")
-previously_written = False
+    override = os.environ.get(PATH_OVERRIDES.get(filename, ''), '')
+    if override:
+        return override
+    return os.path.normpath(os.path.join(JSON_DIRECTORY, filename))
 
-def read_class_list(class_list_path=coco):
+def read_class_list(class_list_path=None):
     """
     Reads a JSON file containing class information and returns a list of class names.
 
     Parameters:
-    class_list_path (str): The path to the JSON file containing class information.
+    class_list_path (str, optional): The path to the JSON file containing class information (defaults to the configured coco.json).
 
     Returns:
     list: A list of class names.
     """
+    class_list_path = class_list_path or resolve_path("coco.json")
     with open(class_list_path, 'r') as file:
         data = json.load(file)
     return [item["name"] for item in data["classes"]]
 
-def initialize_file(camera_id, filename=info):
+def normalize_points(points, frame_size):
+    """
+    Converts pixel coordinates to coordinates relative to the frame size.
+
+    Parameters:
+    points (list): A list of (x, y) pixel coordinates.
+    frame_size (tuple): The (width, height) of the frame the points were taken on.
+
+    Returns:
+    list: A list of [x, y] coordinates in the range [0, 1].
+    """
+    width, height = frame_size
+    return [[round(x / width, 6), round(y / height, 6)] for x, y in points]
+
+def scale_points(points, frame_size):
+    """
+    Converts normalized coordinates to pixel coordinates for a given frame size.
+
+    Parameters:
+    points (list): A list of normalized [x, y] coordinates.
+    frame_size (tuple): The (width, height) of the target frame.
+
+    Returns:
+    list: A list of [x, y] integer pixel coordinates.
+    """
+    width, height = frame_size
+    return [[int(round(x * width)), int(round(y * height))] for x, y in points]
+
+def scale_sections(sections, frame_size):
+    """
+    Creates a copy of a camera's sections with all geometry scaled to pixel coordinates of a given frame size.
+    The stored (normalized) sections are left untouched.
+
+    Parameters:
+    sections (list): The sections as stored in parking_info.json.
+    frame_size (tuple): The (width, height) of the frames being processed.
+
+    Returns:
+    list: The sections with pixel coordinates.
+    """
+    scaled = []
+    for section in sections:
+        scaled_section = dict(section)
+        scaled_section['coordinates'] = scale_points(section['coordinates'], frame_size)
+        scaled_section['parking_areas'] = [dict(area, coordinates=scale_points(area['coordinates'], frame_size)) for area in section['parking_areas']]
+        scaled.append(scaled_section)
+    return scaled
+
+def normalize_layout_data(data, frame_size=LEGACY_FRAME_SIZE):
+    """
+    Migrates the contents of a parking_info.json file with pixel coordinates to normalized coordinates in place.
+
+    Parameters:
+    data (dict): The parsed contents of parking_info.json.
+    frame_size (tuple): The (width, height) the pixel coordinates were drawn on.
+
+    Returns:
+    bool: True if the data was migrated, False if it already used normalized coordinates.
+    """
+    if data.get('coordinate_space') == COORDINATE_SPACE:
+        return False
+    for camera in data['cameras'].values():
+        for section in camera.get('sections', []):
+            section['coordinates'] = normalize_points(section['coordinates'], frame_size)
+            for area in section.get('parking_areas', []):
+                area['coordinates'] = normalize_points(area['coordinates'], frame_size)
+    data['coordinate_space'] = COORDINATE_SPACE
+    return True
+
+def initialize_file(camera_id, filename=None):
     """
     Initializes a JSON file for storing camera information. If the file does not exist, it creates it.
 
     Parameters:
     camera_id (int): The ID of the camera to initialize in the file.
-    filename (str): The path to the JSON file to initialize (default is the global 'info' variable).
+    filename (str): The path to the JSON file to initialize (defaults to the configured parking_info.json).
     """
+    filename = filename or resolve_path("parking_info.json")
     if not os.path.exists(filename):
-        data = {"cameras": {}}
+        data = {"coordinate_space": COORDINATE_SPACE, "cameras": {}}
     else:
         with open(filename, 'r') as file:
             data = json.load(file)
@@ -58,21 +136,22 @@ def initialize_file(camera_id, filename=info):
     with open(filename, 'w') as file:
         json.dump(data, file, indent=4)
 
-def read_parking_areas(camera_id, filename=info):
+def read_parking_areas(camera_id, filename=None):
     """
     Reads the parking areas for a specified camera from a JSON file.
 
     Parameters:
     camera_id (int): The ID of the camera to read parking areas for.
-    filename (str): The path to the JSON file to read from (default is the global 'info' variable).
+    filename (str): The path to the JSON file to read from (defaults to the configured parking_info.json).
 
     Returns:
-    list: A list of sections for the specified camera. Returns an empty list if the camera is not found.
+    list: A list of sections for the specified camera, with normalized coordinates. Returns an empty list if the camera is not found.
 
     Raises:
     FileNotFoundError: If the file is not found.
     json.JSONDecodeError: If there is an error decoding the JSON file.
     """
+    filename = filename or resolve_path("parking_info.json")
     camera_key = f"camera_{camera_id}"
     try:
         if not os.path.exists(filename):
@@ -80,6 +159,11 @@ def read_parking_areas(camera_id, filename=info):
         with open(filename, 'r') as file:
             data = json.load(file)
 
+        if normalize_layout_data(data):
+            with open(filename, 'w') as file:
+                json.dump(data, file, indent=4)
+            print(f"Migrated layouts in {filename} to normalized coordinates")
+
         if camera_key not in data['cameras']:
             initialize_file(camera_id, filename)
             with open(filename, 'r') as file:
@@ -94,18 +178,21 @@ def read_parking_areas(camera_id, filename=info):
         print(f"Error decoding JSON from file: {filename}")
         return []
 
-def fetch_parking_occupancy(camera_id=None, filename=info):
+def fetch_parking_occupancy(camera_id=None, filename=None):
     """
     Fetches the parking occupancy information for a specified camera or all cameras from a JSON file.
+    The file is never modified; layouts that still use pixel coordinates are normalized in memory.
 
     Parameters:
     camera_id (int, optional): The ID of the camera to fetch parking occupancy for. If None, fetches for all cameras.
-    filename (str): The path to the JSON file to read from (default is the global 'info' variable).
+    filename (str): The path to the JSON file to read from (defaults to the configured parking_info.json).
 
     Returns:
     dict or list: If camera_id is specified, returns a list of sections for the specified camera. 
                   If camera_id is None, returns a dictionary with occupancy information for all cameras.
     """
+    filename = filename or resolve_path("parking_info.json")
     with open(filename, 'r') as file:
         data = json.load(file)
+    normalize_layout_data(data)
     return data['cameras'].get(f"camera_{camera_id}", {}).get('sections', []) if camera_id else data
@@ -0,0 +1,25 @@
+import pytest
+from batch import plan_chunks, build_timeline
+
+def test_chunks_start_on_sampled_frames():
+    step, chunks = plan_chunks(frame_count=300, fps=25, interval=1.0, workers=4)
+    assert step == 25
+    assert chunks == [(0, 75), (75, 150), (150, 225), (225, 300)]
+
+def test_chunks_cover_every_sample_once():
+    step, chunks = plan_chunks(frame_count=301, fps=30, interval=0.5, workers=3)
+    samples = [frame for start, stop in chunks for frame in range(start, stop, step)]
+    assert samples == list(range(0, 301, step))
+    assert all(start % step == 0 for start, stop in chunks)
+
+def test_more_workers_than_samples():
+    step, chunks = plan_chunks(frame_count=10, fps=10, interval=0.5, workers=8)
+    assert step == 5
+    assert chunks == [(0, 5), (5, 10)]
+
+def test_step_is_at_least_one_frame():
+    assert plan_chunks(frame_count=4, fps=10, interval=0.01, workers=1) == (1, [(0, 4)])
+
+def test_missing_video_is_rejected(tmp_path):
+    with pytest.raises(OSError):
+        build_timeline(str(tmp_path / 'missing.mp4'), sections=[])
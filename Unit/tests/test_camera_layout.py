@@ -0,0 +1,105 @@
+import copy
+import numpy as np
+from layout import CameraLayout
+
+def stored_sections():
+    return [{
+        'id': 'section_A',
+        'coordinates': [[0.0, 0.0], [0.5, 0.0], [0.5, 1.0], [0.0, 1.0]],
+        'total': 2,
+        'occupied': 1,
+        'free': 1,
+        'details': [1, 0],
+        'parking_areas': [
+            {'coordinates': [[0.1, 0.1], [0.2, 0.1], [0.2, 0.3], [0.1, 0.3]], 'occupied': True, 'spot_number': 1},
+            {'coordinates': [[0.3, 0.1], [0.4, 0.1], [0.4, 0.3]], 'occupied': False},
+        ],
+        'label': 'North row',
+    }, {
+        'id': 'section_B',
+        'coordinates': [[0.5, 0.0], [1.0, 0.0], [1.0, 1.0], [0.5, 1.0]],
+        'total': 0,
+        'occupied': 0,
+        'free': 0,
+        'details': [],
+        'parking_areas': [],
+    }, {
+        'id': 'section_C',
+        'coordinates': [[0.0, 0.5], [1.0, 0.5], [1.0, 1.0]],
+        'total': 1,
+        'occupied': 0,
+        'free': 1,
+        'details': [0],
+        'parking_areas': [{'coordinates': [[0.6, 0.6], [0.9, 0.6], [0.9, 0.9], [0.6, 0.9]], 'occupied': False}],
+    }]
+
+def test_round_trip_keeps_extra_keys_and_empty_sections():
+    sections = stored_sections()
+    layout = CameraLayout.from_json(copy.deepcopy(sections))
+    assert layout.spot_count == 3
+    assert layout.spot_section.tolist() == [0, 0, 2]
+    assert layout.to_json() == sections
+    assert CameraLayout.from_json(layout.to_json()) == layout
+
+def test_counters_are_derived_from_the_occupancy():
+    sections = stored_sections()
+    sections[0]['total'], sections[0]['occupied'], sections[0]['free'], sections[0]['details'] = 9, 9, 0, [1] * 9
+    layout = CameraLayout.from_json(sections)
+    layout.occupied[:] = [False, True, True]
+    section_a, section_b, section_c = layout.to_json()
+    assert (section_a['total'], section_a['occupied'], section_a['free'], section_a['details']) == (2, 1, 1, [0, 1])
+    assert (section_b['total'], section_b['occupied'], section_b['free'], section_b['details']) == (0, 0, 0, [])
+    assert (section_c['total'], section_c['occupied'], section_c['free'], section_c['details']) == (1, 1, 0, [1])
+    assert [area['occupied'] for area in section_a['parking_areas']] == [False, True]
+
+def test_equality_compares_occupancy_and_extras():
+    layout = CameraLayout.from_json(stored_sections())
+    other = CameraLayout.from_json(stored_sections())
+    assert layout == other
+    assert layout != 'section_A'
+
+    other.occupied[1] = True
+    assert layout != other
+    assert layout.same_geometry(other)
+
+    sections = stored_sections()
+    sections[0]['label'] = 'South row'
+    assert layout != CameraLayout.from_json(sections)
+    sections = stored_sections()
+    del sections[0]['parking_areas'][0]['spot_number']
+    assert layout != CameraLayout.from_json(sections)
+    assert layout.same_geometry(CameraLayout.from_json(sections))
+
+def test_same_geometry_detects_moved_or_renamed_polygons():
+    layout = CameraLayout.from_json(stored_sections())
+    sections = stored_sections()
+    sections[2]['parking_areas'][0]['coordinates'][0] = [0.61, 0.6]
+    assert not layout.same_geometry(CameraLayout.from_json(sections))
+    sections = stored_sections()
+    sections[1]['id'] = 'section_D'
+    assert not layout.same_geometry(CameraLayout.from_json(sections))
+    sections = stored_sections()
+    sections[2]['parking_areas'].append({'coordinates': [[0.7, 0.7], [0.8, 0.7], [0.8, 0.8]], 'occupied': False})
+    moved = CameraLayout.from_json(sections)
+    assert not layout.same_geometry(moved)
+    assert layout.geometry_key() != moved.geometry_key()
+    assert layout.geometry_key() == CameraLayout.from_json(stored_sections()).geometry_key()
+
+def test_pixel_geometry_scales_to_the_frame_size():
+    layout = CameraLayout.from_json(stored_sections())
+    section_polygons, spot_polygons, boxes = layout.pixel_geometry((1000, 500))
+    assert [polygon.tolist() for polygon in section_polygons] == [
+        [[0, 0], [500, 0], [500, 500], [0, 500]],
+        [[500, 0], [1000, 0], [1000, 500], [500, 500]],
+        [[0, 250], [1000, 250], [1000, 500]]]
+    assert spot_polygons[1].tolist() == [[300, 50], [400, 50], [400, 150]]
+    assert spot_polygons[0].dtype == np.int32
+    assert boxes.tolist() == [[100, 50, 200, 150], [300, 50, 400, 150], [600, 300, 900, 450]]
+    assert layout.pixel_geometry([1000, 500]) is layout.pixel_geometry((1000, 500))
+    assert layout.pixel_geometry((200, 100))[2].tolist() == [[20, 10, 40, 30], [60, 10, 80, 30], [120, 60, 180, 90]]
+
+def test_pixel_geometry_of_a_layout_without_spots():
+    layout = CameraLayout.from_json([dict(stored_sections()[1])])
+    section_polygons, spot_polygons, boxes = layout.pixel_geometry((1000, 500))
+    assert len(section_polygons) == 1 and spot_polygons == []
+    assert boxes.shape == (0, 4)
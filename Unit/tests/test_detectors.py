@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import detectors
+from detectors import FakeDetector, create_detector, load_detector, unload_detector
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+
+def test_fake_detector_cycles_through_its_script():
+    detector = FakeDetector(script=[([[0, 0, 10, 10]], [2], [0.9]), ([], [], [])])
+    first, second, third = (detector.detect(FRAME) for _ in range(3))
+    assert first.boxes.shape == (1, 4) and first.classes.tolist() == [2]
+    assert len(second.boxes) == 0
+    np.testing.assert_array_equal(third.boxes, first.boxes)
+    assert detector.calls == 3
+
+def test_fake_detector_without_script_detects_nothing():
+    detections = FakeDetector().detect(FRAME)
+    assert detections.boxes.shape == (0, 4)
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_detector('nope')
+
+def test_opencv_backend_rejects_quantized_models():
+    with pytest.raises(ValueError):
+        create_detector('opencv', quantized=True)
+
+def test_each_camera_gets_its_own_detector():
+    config = {'backend': 'fake'}
+    first = load_detector(config, camera_id=1)
+    assert load_detector(config, camera_id=1) is first
+    assert load_detector(config, camera_id=2) is not first
+    assert first.calls == 0  # The script is empty, so warming up does not advance it
+
+    unload_detector(config, camera_id=1)
+    assert load_detector(config, camera_id=1) is not first
+    unload_detector(config, camera_id=1)
+    unload_detector(config, camera_id=2)
+    assert not any(key[0] in (1, 2) for key in detectors._detectors)
+
+class SharedFakeDetector(FakeDetector):
+    thread_safe = True
+
+    def _detect(self, frame):
+        self.shape = frame.shape
+        return super()._detect(frame)
+
+def test_thread_safe_detectors_are_shared_until_unused(monkeypatch):
+    monkeypatch.setitem(detectors.BACKENDS, 'shared', SharedFakeDetector)
+    config = {'backend': 'shared'}
+    first = load_detector(config, camera_id=1, frame_size=(1280, 720))
+    assert load_detector(config, camera_id=2) is first
+    assert first.shape == (720, 1280, 3)  # Warmed up at the first camera's frame size
+
+    unload_detector(config, camera_id=1)
+    assert load_detector(config, camera_id=3) is first  # Camera 2 still uses it
+    unload_detector(config, camera_id=2)
+    unload_detector(config, camera_id=3)
+    assert load_detector(config, camera_id=1) is not first
+    unload_detector(config, camera_id=1)
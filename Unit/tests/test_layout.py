@@ -0,0 +1,45 @@
+import json
+from utils import normalize_layout_data, normalize_points, scale_points, scale_sections, read_parking_areas
+
+def legacy_layout():
+    return {'cameras': {'camera_1': {'sections': [{
+        'section_name': 'A',
+        'coordinates': [[0, 0], [1020, 0], [1020, 500], [0, 500]],
+        'parking_areas': [{'spot_number': 1, 'coordinates': [[510, 250], [765, 250], [765, 375], [510, 375]]}],
+    }]}}}
+
+def test_legacy_layout_is_normalized():
+    data = legacy_layout()
+    assert normalize_layout_data(data)
+    assert data['coordinate_space'] == 'normalized'
+    section = data['cameras']['camera_1']['sections'][0]
+    assert section['coordinates'] == [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]]
+    assert section['parking_areas'][0]['coordinates'] == [[0.5, 0.5], [0.75, 0.5], [0.75, 0.75], [0.5, 0.75]]
+
+def test_normalized_layout_is_left_alone():
+    data = legacy_layout()
+    normalize_layout_data(data)
+    migrated = json.loads(json.dumps(data))
+    assert not normalize_layout_data(data)
+    assert data == migrated
+
+def test_points_round_trip_at_any_resolution():
+    points = [[102, 50], [510, 250]]
+    normalized = normalize_points(points, (1020, 500))
+    assert scale_points(normalized, (1020, 500)) == points
+    assert scale_points(normalized, (1920, 1080)) == [[192, 108], [960, 540]]
+
+def test_scaled_sections_do_not_change_the_layout():
+    data = legacy_layout()
+    normalize_layout_data(data)
+    sections = data['cameras']['camera_1']['sections']
+    scaled = scale_sections(sections, (200, 100))
+    assert scaled[0]['parking_areas'][0]['coordinates'] == [[100, 50], [150, 50], [150, 75], [100, 75]]
+    assert sections[0]['parking_areas'][0]['coordinates'][0] == [0.5, 0.5]
+
+def test_reading_migrates_the_file(tmp_path):
+    path = tmp_path / 'parking_info.json'
+    path.write_text(json.dumps(legacy_layout()))
+    sections = read_parking_areas(1, str(path))
+    assert sections[0]['coordinates'][2] == [1.0, 1.0]
+    assert json.loads(path.read_text())['coordinate_space'] == 'normalized'
@@ -0,0 +1,54 @@
+import time
+import threading
+from scheduler import InferenceScheduler, configure_scheduler, get_scheduler
+
+def test_frames_are_spaced_by_the_budget():
+    scheduler = InferenceScheduler(fps_budget=20.0)
+    started = time.monotonic()
+    for _ in range(5):
+        scheduler.acquire(1)
+    assert 0.19 <= time.monotonic() - started < 1.0
+
+def test_cameras_share_the_budget():
+    scheduler = InferenceScheduler(fps_budget=20.0)
+    threads = [threading.Thread(target=lambda camera_id=camera_id: [scheduler.acquire(camera_id) for _ in range(5)]) for camera_id in (1, 2)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= 0.44  # Ten frames at 20 per second
+    assert set(scheduler.stats()) == {1, 2}
+
+def test_active_cameras_go_first_and_overdue_cameras_before_them():
+    scheduler = InferenceScheduler(max_staleness=10.0)
+    for camera_id in (1, 2, 3):
+        scheduler.register(camera_id)
+    now = time.monotonic()
+    quiet, active, idle = (scheduler._cameras[camera_id] for camera_id in (1, 2, 3))
+    quiet.last_grant = active.last_grant = now - 1.0
+    scheduler.report(2, True)
+    scheduler.report(1, False)
+    assert scheduler._priority(active, now) > scheduler._priority(quiet, now)
+
+    idle.last_grant = now - 11.0
+    assert scheduler._priority(idle, now) > scheduler._priority(active, now)
+
+def test_stats_and_unregister():
+    scheduler = InferenceScheduler(fps_budget=100.0)
+    scheduler.acquire(7)
+    scheduler.report(7, True)
+    stats = scheduler.stats()
+    assert set(stats[7]) == {'rate', 'queue_delay', 'staleness', 'activity'}
+    assert stats[7]['activity'] > 0.9
+    scheduler.unregister(7)
+    assert scheduler.stats() == {}
+
+def test_configure_updates_the_shared_scheduler():
+    scheduler = get_scheduler()
+    budget, staleness = scheduler.fps_budget, scheduler.max_staleness
+    try:
+        assert configure_scheduler(8.0, 3.0) is scheduler
+        assert (scheduler.fps_budget, scheduler.max_staleness) == (8.0, 3.0)
+    finally:
+        configure_scheduler(budget, staleness)
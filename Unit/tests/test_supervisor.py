@@ -0,0 +1,134 @@
+import json
+import time
+import types
+import threading
+import pytest
+import supervisor
+from supervisor import FleetSupervisor, read_fleet_config, is_file_source
+
+def write_fleet(tmp_path, cameras):
+    path = tmp_path / 'fleet.json'
+    path.write_text(json.dumps({'cameras': cameras}))
+    return str(path)
+
+def test_cameras_are_keyed_by_id(tmp_path):
+    cameras = read_fleet_config(write_fleet(tmp_path, [{'id': 1, 'source': 'a.mp4'}, {'id': '2', 'source': '0', 'detect_every': 3}]))
+    assert sorted(cameras) == [1, 2]
+    assert cameras[2]['detect_every'] == 3
+
+@pytest.mark.parametrize('cameras', [
+    [{'id': 1}],
+    [{'source': 'a.mp4'}],
+    [{'id': 1, 'source': 'a.mp4'}, {'id': 1, 'source': 'b.mp4'}],
+    [{'id': 1, 'source': 'a.mp4', 'detect_every': 0}],
+    [{'id': 1, 'source': 'a.mp4', 'detect_every': 2.5}],
+    [{'id': 1, 'source': 'a.mp4', 'detect_every': '3'}],
+    [{'id': 1, 'source': 'a.mp4', 'detect_every': True}],
+    [{'id': None, 'source': 'a.mp4'}],
+    [{'id': 1.5, 'source': 'a.mp4'}],
+    [{'id': 'one', 'source': 'a.mp4'}],
+    {'id': 1, 'source': 'a.mp4'},
+])
+def test_invalid_configurations_are_rejected(tmp_path, cameras):
+    with pytest.raises(ValueError):
+        read_fleet_config(write_fleet(tmp_path, cameras))
+
+def test_file_sources():
+    assert is_file_source('videos/lot.mp4')
+    assert not is_file_source('0')
+    assert not is_file_source('rtsp://camera/stream')
+    assert not is_file_source(0)
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    """
+    A running supervisor whose cameras are stubs: 'ok' sources run until stopped, 'slow' sources take a while
+    to finish their current frame after being stopped, and 'broken' sources fail at once.
+    """
+    starts = []
+    unloads = []
+    exits = {}
+
+    def camera_thread(source, display, camera_id, detector_config, frame_size, trace_path, detect_every=1, stop_event=None, on_frame=None):
+        starts.append((camera_id, source, time.monotonic()))
+        if source == 'broken':
+            raise OSError("Failed to open video source")
+        while not stop_event.wait(0.01):
+            on_frame()
+        if source == 'slow':
+            time.sleep(0.3)
+        exits[camera_id] = time.monotonic()
+
+    monkeypatch.setattr(supervisor, 'camera_thread', camera_thread)
+    monkeypatch.setattr(supervisor, 'unload_detector', lambda config, camera_id: unloads.append((camera_id, config)))
+    monkeypatch.setattr(supervisor, 'DRAIN_INTERVAL', 0.02)
+    monkeypatch.setattr(supervisor, 'RECONNECT_DELAY', 0.05)
+    monkeypatch.setattr(supervisor, 'MAX_RECONNECT_DELAY', 0.2)
+    path = tmp_path / 'fleet.json'
+    fleet_supervisor = FleetSupervisor(config_path=str(path), display=False, reload_interval=10.0)
+
+    def write(cameras):
+        path.write_text(json.dumps({'cameras': cameras}))
+        fleet_supervisor.request_reload()
+
+    def running(camera_id):
+        pipeline = fleet_supervisor.pipelines.get(camera_id)
+        return pipeline is not None and pipeline.state == 'running'
+
+    thread = threading.Thread(target=fleet_supervisor.run, daemon=True)
+    yield types.SimpleNamespace(supervisor=fleet_supervisor, write=write, running=running, thread=thread,
+                                starts=starts, unloads=unloads, exits=exits)
+    fleet_supervisor.stop()
+    thread.join(5)
+
+def test_cameras_follow_the_fleet_file(fleet):
+    fleet.write([{'id': 1, 'source': 'ok'}, {'id': 2, 'source': 'ok'}, {'id': 3, 'source': 'ok'}])
+    fleet.thread.start()
+    wait_until(lambda: all(fleet.running(camera_id) for camera_id in (1, 2, 3)))
+    unchanged = fleet.supervisor.pipelines[3]
+
+    fleet.write([{'id': 2, 'source': 'ok', 'detect_every': 2}, {'id': 3, 'source': 'ok'}, {'id': 4, 'source': 'ok'}])
+    wait_until(lambda: fleet.running(4) and fleet.running(2) and 1 not in fleet.supervisor.health())
+    assert fleet.supervisor.pipelines[3] is unchanged and unchanged.thread.is_alive()
+    assert fleet.supervisor.pipelines[2].config['detect_every'] == 2
+    assert sorted(camera_id for camera_id, _, _ in fleet.starts) == [1, 2, 2, 3, 4]
+    wait_until(lambda: not fleet.supervisor._draining)
+    assert fleet.unloads == [(1, None)]  # The removed camera's model is released; the edited camera keeps its detector
+
+def test_invalid_file_keeps_the_cameras_running(fleet):
+    fleet.write([{'id': 1, 'source': 'ok'}])
+    fleet.thread.start()
+    wait_until(lambda: fleet.running(1))
+    pipeline = fleet.supervisor.pipelines[1]
+    fleet.write([{'id': None, 'source': 'ok'}])
+    time.sleep(0.1)
+    assert fleet.supervisor.pipelines[1] is pipeline and pipeline.thread.is_alive()
+    assert fleet.thread.is_alive()
+
+def test_restart_waits_for_the_stopped_camera_to_drain(fleet):
+    fleet.write([{'id': 1, 'source': 'slow'}])
+    fleet.thread.start()
+    wait_until(lambda: fleet.running(1))
+    fleet.write([{'id': 1, 'source': 'slow', 'detect_every': 3}])
+    wait_until(lambda: fleet.supervisor.health().get(1, {}).get('state') == 'draining')
+    assert len(fleet.starts) == 1
+    wait_until(lambda: len(fleet.starts) == 2)
+    assert fleet.starts[1][2] >= fleet.exits[1]  # Never two threads for one camera
+
+def test_failing_camera_backs_off(fleet):
+    fleet.write([{'id': 1, 'source': 'broken'}, {'id': 2, 'source': 'ok'}])
+    fleet.thread.start()
+    wait_until(lambda: sum(1 for camera_id, _, _ in fleet.starts if camera_id == 1) >= 4)
+    times = [started for camera_id, _, started in fleet.starts if camera_id == 1]
+    intervals = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert intervals[0] >= 0.05 and intervals[1] >= 0.1 and intervals[2] >= 0.2
+    health = fleet.supervisor.health()
+    assert health[1]['state'] == 'reconnecting' and health[1]['failures'] >= 3
+    assert health[1]['last_error'] == "Failed to open video source"
+    assert health[2]['state'] == 'running'
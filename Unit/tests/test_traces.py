@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pytest
+from detectors import Detections
+from traces import MAGIC, TraceWriter, get_trace_writer, release_trace_writer, read_trace, merge_traces
+
+def detections(*boxes):
+    return Detections(np.array(boxes, np.float32).reshape(-1, 4), np.arange(len(boxes), dtype=np.int32) + 2,
+                      np.full(len(boxes), 0.5, np.float32))
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    writer = TraceWriter(path)
+    writer.write(1, 0, 0.0, (1280, 720), detections([10, 20, 30, 40], [50, 60, 70, 80]))
+    writer.write(2, 0, 0.5, (640, 480), detections())
+    writer.write(1, 5, 1.0, (1280, 720), detections([11, 21, 31, 41]))
+    writer.close()
+
+    records = list(read_trace(path))
+    assert [(record.camera_id, record.frame_index, record.timestamp, record.frame_size) for record in records] == [
+        (1, 0, 0.0, (1280, 720)), (2, 0, 0.5, (640, 480)), (1, 5, 1.0, (1280, 720))]
+    np.testing.assert_array_equal(records[0].detections.boxes, [[10, 20, 30, 40], [50, 60, 70, 80]])
+    assert records[0].detections.classes.tolist() == [2, 3]
+    assert records[1].detections.boxes.shape == (0, 4)
+    assert [record.frame_index for record in read_trace(path, camera_id=1)] == [0, 5]
+
+def test_torn_last_record_ends_the_trace(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    writer = TraceWriter(path)
+    writer.write(1, 0, 0.0, (1280, 720), detections([10, 20, 30, 40]))
+    writer.write(1, 1, 0.1, (1280, 720), detections([10, 20, 30, 40]))
+    writer.close()
+    os.truncate(path, os.path.getsize(path) - 3)
+    assert [record.frame_index for record in read_trace(path)] == [0]
+
+def test_records_are_readable_while_the_writer_is_open(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    writer = TraceWriter(path)
+    try:
+        writer.write(1, 0, 0.0, (1280, 720), detections([10, 20, 30, 40]))
+        assert [record.frame_index for record in read_trace(path)] == [0]
+    finally:
+        writer.close()
+
+def test_shared_writer_closes_after_its_last_user(tmp_path):
+    path = str(tmp_path / 'run.trace')
+    first = get_trace_writer(path)
+    second = get_trace_writer(path)
+    assert first is second
+    release_trace_writer(path)
+    first.write(1, 0, 0.0, (1280, 720), detections())
+    release_trace_writer(path)
+    with pytest.raises(ValueError):
+        first.write(1, 1, 0.1, (1280, 720), detections())
+    reopened = get_trace_writer(path)
+    assert reopened is not first
+    release_trace_writer(path)
+    assert [record.frame_index for record in read_trace(path)] == [0]
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'other.trace'
+    path.write_bytes(b'not a trace')
+    with pytest.raises(ValueError):
+        list(read_trace(str(path)))
+    with pytest.raises(ValueError):
+        TraceWriter(str(path))
+
+def test_merge_appends_parts_in_order(tmp_path):
+    parts = []
+    for index in range(2):
+        part = str(tmp_path / f'part{index}.trace')
+        writer = TraceWriter(part)
+        writer.write(1, index, float(index), (100, 100), detections([index, 0, 10, 10]))
+        writer.close()
+        parts.append(part)
+    path = str(tmp_path / 'merged.trace')
+    merge_traces(path, parts)
+    assert [record.frame_index for record in read_trace(path)] == [0, 1]
+    with open(path, 'rb') as file:
+        assert file.read().count(MAGIC) == 1
+    assert not any((tmp_path / f'part{index}.trace').exists() for index in range(2))
@@ -0,0 +1,70 @@
+import numpy as np
+from detectors import Detections
+from tracker import VehicleTracker, box_iou
+
+def detections(boxes, classes=None):
+    boxes = np.array(boxes, np.float32).reshape(-1, 4)
+    classes = np.full(len(boxes), 2, np.int32) if classes is None else np.array(classes, np.int32)
+    return Detections(boxes, classes, np.full(len(boxes), 0.8, np.float32))
+
+def test_box_iou():
+    iou = box_iou(np.array([[0, 0, 10, 10]], np.float32), np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32))
+    np.testing.assert_allclose(iou, [[1.0, 1 / 3, 0.0]], rtol=1e-6)
+
+def test_ids_are_stable_while_vehicles_move():
+    tracker = VehicleTracker()
+    _, first = tracker.update(detections([[0, 0, 10, 10], [100, 0, 110, 10]]), frame=0, timestamp=0.0)
+    _, second = tracker.update(detections([[102, 0, 112, 10], [2, 0, 12, 10]]), frame=3, timestamp=0.1)
+    assert first.tolist() == [1, 2]
+    assert second.tolist() == [2, 1]
+
+def test_predict_moves_tracks_along_their_velocity():
+    tracker = VehicleTracker(velocity_gain=1.0)
+    tracker.update(detections([[0, 0, 10, 10]]), frame=0, timestamp=0.0)
+    tracker.update(detections([[4, 0, 14, 10]]), frame=2, timestamp=0.1)  # 2 pixels per frame
+    predicted, ids = tracker.predict(frame=5)
+    np.testing.assert_allclose(predicted.boxes, [[10, 0, 20, 10]])
+    assert ids.tolist() == [1]
+    assert predicted.classes.tolist() == [2]
+
+def test_tracks_are_dropped_after_max_misses():
+    tracker = VehicleTracker(max_misses=2)
+    tracker.update(detections([[0, 0, 10, 10]]), frame=0, timestamp=0.0)
+    for frame in (1, 2):
+        tracker.update(detections([]), frame=frame, timestamp=float(frame))
+        assert len(tracker.tracks) == 1
+    tracker.update(detections([]), frame=3, timestamp=3.0)
+    assert tracker.tracks == []
+    assert tracker.predict(frame=4)[0].boxes.shape == (0, 4)
+
+def test_only_tracked_classes_are_kept():
+    tracker = VehicleTracker(classes=[2, 7])
+    kept, ids = tracker.update(detections([[0, 0, 10, 10], [20, 0, 30, 10], [40, 0, 50, 10]], classes=[2, 0, 7]), frame=0, timestamp=0.0)
+    assert kept.classes.tolist() == [2, 7]
+    assert ids.tolist() == [1, 2]
+
+def test_different_classes_do_not_match():
+    tracker = VehicleTracker()
+    tracker.update(detections([[0, 0, 10, 10]], classes=[2]), frame=0, timestamp=0.0)
+    _, ids = tracker.update(detections([[0, 0, 10, 10]], classes=[7]), frame=1, timestamp=0.1)
+    assert ids.tolist() == [2, 1]
+    assert len(tracker.tracks) == 2
+
+def test_missed_tracks_are_reported_until_dropped():
+    tracker = VehicleTracker(max_misses=1, velocity_gain=1.0)
+    tracker.update(detections([[0, 0, 10, 10], [100, 0, 110, 10]]), frame=0, timestamp=0.0)
+    tracker.update(detections([[2, 0, 12, 10], [100, 0, 110, 10]]), frame=1, timestamp=0.1)
+    kept, ids = tracker.update(detections([[100, 0, 110, 10]]), frame=3, timestamp=0.2)
+    assert ids.tolist() == [2, 1]
+    np.testing.assert_allclose(kept.boxes, [[100, 0, 110, 10], [6, 0, 16, 10]])
+    assert kept.classes.tolist() == [2, 2]
+    predicted, predicted_ids = tracker.predict(frame=3)
+    assert sorted(predicted_ids.tolist()) == sorted(ids.tolist())
+    _, ids = tracker.update(detections([[100, 0, 110, 10]]), frame=4, timestamp=0.3)
+    assert ids.tolist() == [2]
+
+def test_dwell_times():
+    tracker = VehicleTracker()
+    tracker.update(detections([[0, 0, 10, 10]]), frame=0, timestamp=100.0)
+    tracker.update(detections([[0, 0, 10, 10], [50, 0, 60, 10]]), frame=25, timestamp=101.0)
+    assert tracker.dwell_times(now=105.0) == {1: 5.0, 2: 4.0}